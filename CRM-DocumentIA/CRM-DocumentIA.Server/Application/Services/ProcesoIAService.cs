@@ -177,6 +177,7 @@ namespace CRM_DocumentIA.Server.Application.Services
                 content.Add(fileContent, "file", nombreArchivo);
                 content.Add(new StringContent("openai"), "provider");
                 content.Add(new StringContent("upload"), "source_name");
+                content.Add(new StringContent("true"), "wait");
 
                 var response = await _httpClient.PostAsync(endpoint, content);
                 
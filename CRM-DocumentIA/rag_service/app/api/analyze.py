@@ -1,44 +1,40 @@
 # app/api/analyze.py
 
 from fastapi import APIRouter, UploadFile, File
-from pathlib import Path
-import shutil
+from fastapi.concurrency import run_in_threadpool
 
-from app.utils.text_extract import extract_text
-from app.rag.ingestion import detect_document_type
+from app.core.config import settings
+from app.utils.text_extract import extract_preview
+from app.rag.doc_classifier import classify_document
+from app.rag.upload_store import get_upload_store
 
 router = APIRouter(prefix="/analyze", tags=["Análisis"])
 
-ANALYZE_DIR = Path("storages/analyze")
-ANALYZE_DIR.mkdir(parents=True, exist_ok=True)
-
 @router.post("/")
 async def analyze_document(file: UploadFile = File(...)):
     """
+    Vista previa rápida: solo se lee el inicio del archivo (ver
+    extract_preview), así la latencia no depende del tamaño del documento.
     Devuelve:
-      - preview texto (limpio)
-      - tipo de documento
-      - tamaño
+      - preview texto (limpio, PREVIEW_CHARS caracteres)
+      - tipo de documento (detectado sobre la muestra leída) con confianza y puntajes
+      - length: caracteres de la muestra leída
+      - truncated: True si el documento tiene más contenido del leído
     """
-    dest = ANALYZE_DIR / file.filename
-    with open(dest, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-
-    # extract_text devuelve dict
-    result = extract_text(str(dest))
-
-    cleaned = result.get("cleaned_text", "")
-    raw = result.get("raw_text", "")
-
-    # preview basado en texto limpio
-    preview = cleaned[:1200] if cleaned else raw[:1200]
+    # Mismo store direccionado por contenido que /ingest
+    upload = await run_in_threadpool(get_upload_store().save, file.file, file.filename)
 
-    # detectar tipo basado en cleaned text
-    doc_type = detect_document_type(cleaned)
+    # extract_preview devuelve {"text", "truncated"}
+    sample = await run_in_threadpool(extract_preview, str(upload["path"]))
+    text = sample["text"]
+    classified = classify_document(text)
 
     return {
         "filename": file.filename,
-        "length": len(cleaned),
-        "preview": preview,
-        "doc_type": doc_type,
+        "length": len(text),
+        "preview": text[:settings.PREVIEW_CHARS],
+        "doc_type": classified["doc_type"],
+        "doc_type_confidence": classified["confidence"],
+        "doc_type_scores": classified["scores"],
+        "truncated": sample["truncated"],
     }
@@ -1,15 +1,13 @@
 # app/api/feedback.py
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from pathlib import Path
-import json
-import time
+from typing import Literal
 
-router = APIRouter(prefix="/feedback", tags=["Feedback"])
+from app.rag.feedback_store import get_feedback_store
 
-FEEDBACK_LOG = Path("storages/feedback_log.json")
-FEEDBACK_LOG.parent.mkdir(parents=True, exist_ok=True)
+router = APIRouter(prefix="/feedback", tags=["Feedback"])
 
 class Feedback(BaseModel):
     question: str
@@ -17,21 +15,26 @@ class Feedback(BaseModel):
     correct: bool
     comment: str | None = None
     doc_type: str | None = None
+    provider: str | None = None
 
 @router.post("/")
 async def save_feedback(data: Feedback):
-    """Guarda feedback en un archivo JSON para futuras mejoras."""
-    entry = data.dict()
-    entry["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
-
-    previous = []
-    if FEEDBACK_LOG.exists():
-        try:
-            previous = json.loads(FEEDBACK_LOG.read_text())
-        except:
-            previous = []
-
-    previous.append(entry)
-    FEEDBACK_LOG.write_text(json.dumps(previous, indent=2, ensure_ascii=False))
-
-    return {"status": "feedback_saved", "count": len(previous)}
+    """Guarda feedback (append-only en SQLite) para futuras mejoras."""
+    count = await run_in_threadpool(get_feedback_store().add, **data.dict())
+    return {"status": "feedback_saved", "count": count}
+
+
+@router.get("/stats")
+async def feedback_stats(
+    days: float | None = Query(30, gt=0, description="Ventana para desgloses y serie (vacío = todo)"),
+    bucket: Literal["hour", "day", "week"] | None = "day",
+    doc_type: str | None = None,
+    provider: str | None = None,
+):
+    """Exactitud por ventana de tiempo, doc_type, provider y serie temporal."""
+    try:
+        return await run_in_threadpool(
+            get_feedback_store().stats, days=days, bucket=bucket, doc_type=doc_type, provider=provider
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,53 +1,223 @@
 # app/api/ingest.py
 
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from pathlib import Path
+import hashlib
 import shutil
 import time
+import uuid
 
+from app.core.config import settings
 from app.core.logger import logger
-from app.rag.ingestion import ingest_file_to_pinecone
+from app.rag import bulk_ingest, ingest_jobs
+from app.rag.upload_store import get_upload_store
 
 router = APIRouter(prefix="/ingest", tags=["Ingesta"])
 
-UPLOAD_DIR = Path("storages/uploads")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+def _save_upload(file: UploadFile, dest: Path) -> str:
+    """Copia el archivo subido a `dest` y devuelve el SHA-256 del contenido."""
+    h = hashlib.sha256()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with open(dest, "wb") as f:
+        for block in iter(lambda: file.file.read(1 << 20), b""):
+            h.update(block)
+            f.write(block)
+    return h.hexdigest()
+
 
 @router.post("/")
 async def ingest_document(
     file: UploadFile = File(...),
     provider: str = Form("hf"),               # <--- NUEVO: HF o OpenAI
-    source_name: str = Form("upload")
+    source_name: str = Form("upload"),
+    wait: bool = Form(False),                 # True → espera el resultado (compatibilidad)
+    include_text: bool = Form(False),         # True → incluye el texto completo en el resultado
+    external_id: str | None = Form(None)      # id estable del documento en el cliente (p. ej. CRM)
 ):
     """
-    Sube un archivo y lo procesa:
+    Sube un archivo y encola su procesamiento:
       - extrae texto
       - detecta tipo
       - chunk + embeddings con HF u OpenAI
       - analiza imágenes si es PDF
       - sube a Pinecone
-      - devuelve metadata para el backend .NET
+
+    Devuelve de inmediato un job_id (consultar GET /ingest/jobs/{job_id}).
+    Con wait=true espera al job sin bloquear el event loop y devuelve
+    la metadata completa para el backend .NET. El texto extraído
+    ("contenido_extraido") solo se devuelve con include_text=true.
+
+    Sin external_id cada subida es un documento nuevo (dos archivos con
+    el mismo nombre no se pisan). Con external_id la subida reemplaza a la
+    versión anterior de ese documento, re-embebiendo solo lo que cambió.
+
+    El archivo se guarda direccionado por su SHA-256. Si el mismo
+    contenido ya se ingestó con el mismo provider, origen y external_id,
+    se responde con el resultado de ese job (deduplicated=true) sin
+    volver a procesarlo.
     """
 
     start = time.time()
 
-    dest = UPLOAD_DIR / file.filename
-    with open(dest, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    upload = await run_in_threadpool(get_upload_store().save, file.file, file.filename)
+
+    logger.info(f"Archivo recibido: {file.filename} ({upload['sha256'][:12]}, {upload['size']} bytes) "
+                f"usando proveedor '{provider}'")
 
-    logger.info(f"Archivo recibido: {dest} usando proveedor '{provider}'")
+    if settings.INGEST_DEDUP and upload["duplicate"]:
+        cached = await run_in_threadpool(
+            ingest_jobs.find_cached_ingest, upload["sha256"], provider, source_name, include_text,
+            external_id
+        )
+        if cached is not None:
+            logger.info(f"♻️ {file.filename}: contenido ya ingestado (job {cached['job_id']})")
+            return {
+                "status": "ok",
+                "job_id": cached["job_id"],
+                "deduplicated": True,
+                "elapsed_seconds": round(time.time() - start, 2),
+                "filename": file.filename,
+                "status_url": f"/ingest/jobs/{cached['job_id']}",
+                "result": cached["result"]
+            }
 
-    # 🔥 Pasamos el provider hacia la pipeline RAG
-    result = ingest_file_to_pinecone(
-        str(dest),
+    job_id = ingest_jobs.submit_ingest_job(
+        str(upload["path"]),
+        filename=file.filename,
+        provider=provider,
         source_name=source_name,
-        provider=provider
+        include_text=include_text,
+        file_hash=upload["sha256"],
+        external_id=external_id
     )
 
+    if not wait:
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "queued",
+                "job_id": job_id,
+                "filename": file.filename,
+                "status_url": f"/ingest/jobs/{job_id}"
+            }
+        )
+
+    job = await ingest_jobs.wait_for_job(job_id)
+
     elapsed = round(time.time() - start, 2)
     return {
-        "status": "ok",
+        "status": "ok" if job["status"] == ingest_jobs.DONE else "error",
+        "job_id": job_id,
         "elapsed_seconds": elapsed,
         "filename": file.filename,
-        "result": result
+        "result": job["result"] or {"status": "error", "error": job["error"]}
     }
+
+
+@router.post("/bulk")
+async def ingest_bulk(
+    files: list[UploadFile] | None = File(None),
+    path: str | None = Form(None),            # directorio o zip del servidor (bajo BULK_INGEST_ROOT)
+    provider: str = Form("hf"),
+    source_name: str = Form("bulk"),
+    run_id: str | None = Form(None),          # reanuda una ejecución previa (mismo checkpoint)
+    summarize: bool = Form(False),
+    workers: int | None = Form(None)
+):
+    """
+    Ingesta masiva de varios archivos, zips o un directorio del servidor.
+    Corre en segundo plano con lotes globales de embeddings/upsert y
+    checkpoint; el progreso y el throughput se consultan en
+    GET /ingest/bulk/{run_id}.
+
+    run_id: letras, dígitos, '-' y '_' (máx. 64). Los archivos subidos se
+    copian a STORAGE_DIR/bulk/uploads/ y se borran al terminar la
+    ejecución; para reanudar se vuelven a enviar con el mismo run_id.
+    """
+    if run_id is not None and not bulk_ingest.is_valid_run_id(run_id):
+        raise HTTPException(status_code=422, detail="run_id inválido: solo letras, dígitos, '-' y '_'")
+    run_id = run_id or str(uuid.uuid4())
+    inputs = []
+    upload_dir = None
+
+    if path:
+        root = settings.BULK_INGEST_ROOT
+        target = Path(path).resolve()
+        if root is None or not target.is_relative_to(Path(root).resolve()):
+            raise HTTPException(status_code=403, detail="Ruta fuera de BULK_INGEST_ROOT")
+        if not target.exists():
+            raise HTTPException(status_code=404, detail="Ruta no encontrada")
+        inputs.append(str(target))
+
+    if files:
+        names = [Path(f.filename or "").name for f in files]
+        if any(name in ("", ".", "..") for name in names):
+            raise HTTPException(status_code=400, detail="Todos los archivos deben tener nombre")
+
+        # Un directorio por pedido (un reintento con el mismo run_id no toca
+        # los archivos de una ejecución en curso) y una subcarpeta por
+        # archivo: dos archivos con el mismo nombre no se pisan
+        upload_dir = settings.STORAGE_DIR / "bulk" / "uploads" / uuid.uuid4().hex
+        try:
+            for n, (f, name) in enumerate(zip(files, names)):
+                dest = upload_dir / f"{n:05d}" / name
+                sha256 = await run_in_threadpool(_save_upload, f, dest)
+                inputs.append({"path": str(dest), "name": name, "identity": f"upload:{sha256}"})
+        except Exception:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise
+
+    if not inputs:
+        raise HTTPException(status_code=400, detail="Indique archivos o una ruta")
+
+    try:
+        run = bulk_ingest.start_bulk_ingest(
+            inputs,
+            run_id=run_id,
+            provider=provider,
+            source_name=source_name,
+            summarize=summarize,
+            workers=workers,
+            cpu_executor=ingest_jobs.get_cpu_executor(),
+            upload_dir=upload_dir
+        )
+    except RuntimeError as e:
+        if upload_dir is not None:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "queued",
+            "run_id": run.run_id,
+            "status_url": f"/ingest/bulk/{run.run_id}"
+        }
+    )
+
+
+@router.get("/bulk/{run_id}")
+async def get_bulk(run_id: str):
+    """Progreso de una ingesta masiva: documentos, chunks, docs/s, chunks/s."""
+    run = bulk_ingest.get_bulk_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Ingesta masiva no encontrada")
+    return run.progress()
+
+
+@router.get("/jobs")
+async def list_jobs(status: str | None = None, limit: int = 50):
+    """Lista los jobs de ingesta más recientes (sin el resultado completo)."""
+    return {"jobs": ingest_jobs.get_job_store().list_jobs(status=status, limit=min(limit, 500))}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Estado de un job: etapa actual, tiempos por etapa y resultado."""
+    job = ingest_jobs.get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job
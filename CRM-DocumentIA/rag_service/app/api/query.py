@@ -1,10 +1,12 @@
 # app/api/query.py
 
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import json
 import time
 
-from app.rag.pipeline import answer_question
+from app.rag.pipeline import answer_question_async, stream_answer_question
 
 router = APIRouter(prefix="/query", tags=["Consulta RAG"])
 
@@ -18,8 +20,8 @@ async def query_rag(q: QueryRequest):
 
     start = time.time()
 
-    # Llamada correcta al pipeline (usa question=)
-    result = answer_question(
+    # Camino async completo: no ocupa hilos mientras espera a los proveedores
+    result = await answer_question_async(
         question=q.query,       # <-- CORRECTO
         top_k=15,
         doc_type=q.doc_type,
@@ -37,3 +39,35 @@ async def query_rag(q: QueryRequest):
         "compressed_context": result["compressed_context"],
         "elapsed_seconds": elapsed
     }
+
+
+@router.post("/stream")
+def query_rag_stream(q: QueryRequest, format: str = "sse"):
+    """
+    Respuesta en streaming: primero las fuentes, luego los tokens del LLM.
+      - format=sse    → text/event-stream  (event: sources|token|done)
+      - format=ndjson → application/x-ndjson (una línea JSON por evento)
+
+    El generador es síncrono: Starlette lo itera en el threadpool,
+    así retrieval y LLM no bloquean el event loop.
+    """
+    events = stream_answer_question(
+        question=q.query,
+        top_k=15,
+        doc_type=q.doc_type,
+        provider=q.provider
+    )
+
+    if format == "ndjson":
+        body = (json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+        return StreamingResponse(body, media_type="application/x-ndjson")
+
+    body = (
+        f"event: {e['event']}\ndata: {json.dumps(e['data'], ensure_ascii=False)}\n\n"
+        for e in events
+    )
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,101 @@
+# app/core/batching.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Sequence
+
+
+class MicroBatcher:
+    """
+    Junta pedidos pequeños de varios hilos en lotes de hasta `max_items`.
+
+    Un lote sale cuando se llena o cuando su primer pedido lleva `max_wait`
+    segundos esperando. `fn(items)` recibe los ítems concatenados y
+    devuelve algo indexable por posición (lista o array) o None; cada
+    pedido recibe su tramo. Si `fn` falla, todos los pedidos del lote
+    reciben la excepción.
+    """
+
+    def __init__(self, fn: Callable[[list], object], max_items: int, max_wait: float = 0.05,
+                 workers: int = 1, name: str = "batcher"):
+        self.fn = fn
+        self.max_items = max(1, max_items)
+        self.max_wait = max_wait
+
+        self.batches = 0
+        self.items = 0
+        self._stats_lock = threading.Lock()
+
+        self._queue: "queue.Queue[tuple[list, Future] | None]" = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, items: Sequence) -> Future:
+        fut: Future = Future()
+        if not items:
+            fut.set_result([])
+        else:
+            self._queue.put((list(items), fut))
+        return fut
+
+    def __call__(self, items: Sequence):
+        """Encola y espera el resultado (uso desde hilos de trabajo)."""
+        return self.submit(items).result()
+
+    def close(self):
+        """Procesa lo pendiente y detiene los hilos."""
+        self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+    # ---------- hilos de trabajo ----------
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.put(None)   # el resto de los hilos también debe salir
+                return
+
+            pending = [first]
+            size = len(first[0])
+            deadline = time.monotonic() + self.max_wait
+
+            while size < self.max_items:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    req = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if req is None:
+                    self._queue.put(None)
+                    break
+                pending.append(req)
+                size += len(req[0])
+
+            self._run(pending)
+
+    def _run(self, pending: list):
+        items = [x for req, _ in pending for x in req]
+        try:
+            out = self.fn(items)
+        except Exception as e:
+            for _, fut in pending:
+                fut.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(items)
+
+        pos = 0
+        for req, fut in pending:
+            fut.set_result(None if out is None else out[pos:pos + len(req)])
+            pos += len(req)
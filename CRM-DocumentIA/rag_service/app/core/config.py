@@ -14,6 +14,23 @@ class Settings(BaseSettings):
     PORT: int = Field(8000, env="PORT")
     ENV: str = Field("development", env="ENV")
 
+    # ============================
+    # 🔹 VECTOR STORE
+    # ============================
+    # Valores: "pinecone" | "local" (memmap NumPy en proceso)
+    VECTOR_BACKEND: str = Field("pinecone", env="VECTOR_BACKEND")
+    LOCAL_VECTOR_DIR: Path | None = Field(None, env="LOCAL_VECTOR_DIR")  # None → STORAGE_DIR/vector_index
+    # Compactación: fracción del log que ya no describe vectores vivos (0 → nunca)
+    LOCAL_COMPACT_RATIO: float = Field(0.3, env="LOCAL_COMPACT_RATIO")
+    LOCAL_COMPACT_MIN_ENTRIES: int = Field(10_000, env="LOCAL_COMPACT_MIN_ENTRIES")
+
+    # Índice aproximado del backend local: "none" (exacto) | "ivf"
+    LOCAL_ANN: str = Field("none", env="LOCAL_ANN")
+    LOCAL_IVF_NLIST: int = Field(0, env="LOCAL_IVF_NLIST")            # 0 → 4·√n al entrenar
+    LOCAL_IVF_NPROBE: int = Field(8, env="LOCAL_IVF_NPROBE")          # más listas = más recall
+    LOCAL_IVF_MIN_TRAIN: int = Field(10_000, env="LOCAL_IVF_MIN_TRAIN")
+    LOCAL_IVF_TRAIN_SAMPLE: int = Field(100_000, env="LOCAL_IVF_TRAIN_SAMPLE")  # tope de la muestra de k-means
+
     # ============================
     # 🔹 PINECONE
     # ============================
@@ -22,6 +39,12 @@ class Settings(BaseSettings):
     PINECONE_ENV: str = Field("us-east-1", env="PINECONE_ENV")
     PINECONE_CLOUD: str = Field("aws", env="PINECONE_CLOUD")
 
+    # Upsert por lotes (límites de Pinecone: 1000 vectores / 2MB por request)
+    PINECONE_UPSERT_BATCH_SIZE: int = Field(200, env="PINECONE_UPSERT_BATCH_SIZE")
+    PINECONE_UPSERT_MAX_BYTES: int = Field(1_800_000, env="PINECONE_UPSERT_MAX_BYTES")
+    PINECONE_UPSERT_CONCURRENCY: int = Field(4, env="PINECONE_UPSERT_CONCURRENCY")
+    PINECONE_UPSERT_MAX_RETRIES: int = Field(3, env="PINECONE_UPSERT_MAX_RETRIES")
+
     # ============================
     # 🔹 EMBEDDINGS
     # ============================
@@ -40,6 +63,100 @@ class Settings(BaseSettings):
         env="OPENAI_EMB_MODEL"
     )
 
+    # ============================
+    # 🔹 EMBEDDINGS — BATCHING
+    # ============================
+    # Máximo de textos por lote según proveedor
+    EMB_BATCH_SIZE_LOCAL: int = Field(64, env="EMB_BATCH_SIZE_LOCAL")
+    EMB_BATCH_SIZE_HF: int = Field(32, env="EMB_BATCH_SIZE_HF")
+    EMB_BATCH_SIZE_OPENAI: int = Field(256, env="EMB_BATCH_SIZE_OPENAI")
+
+    # Máximo de tokens (aprox.) por lote según proveedor
+    EMB_BATCH_TOKENS_HF: int = Field(16000, env="EMB_BATCH_TOKENS_HF")
+    EMB_BATCH_TOKENS_OPENAI: int = Field(250000, env="EMB_BATCH_TOKENS_OPENAI")
+
+    # Lotes remotos en paralelo y reintentos por lote
+    EMB_MAX_WORKERS: int = Field(4, env="EMB_MAX_WORKERS")
+    EMB_MAX_RETRIES: int = Field(3, env="EMB_MAX_RETRIES")
+    EMB_RETRY_BACKOFF: float = Field(1.0, env="EMB_RETRY_BACKOFF")
+
+    # ============================
+    # 🔹 EMBEDDINGS — CACHE
+    # ============================
+    EMB_CACHE_ENABLED: bool = Field(True, env="EMB_CACHE_ENABLED")
+    EMB_CACHE_PATH: Path | None = Field(None, env="EMB_CACHE_PATH")   # None → STORAGE_DIR/embedding_cache.sqlite3
+    EMB_CACHE_MAX_ENTRIES: int = Field(500_000, env="EMB_CACHE_MAX_ENTRIES")
+    EMB_CACHE_MEMORY_ENTRIES: int = Field(20_000, env="EMB_CACHE_MEMORY_ENTRIES")
+    EMB_CACHE_DTYPE: str = Field("float32", env="EMB_CACHE_DTYPE")   # float32 | float16 (mitad de disco)
+
+    # ============================
+    # 🔹 CACHÉ DE CONSULTAS (TTL + LRU)
+    # ============================
+    QUERY_CACHE_ENABLED: bool = Field(True, env="QUERY_CACHE_ENABLED")
+    QUERY_CACHE_TTL_SECONDS: float = Field(300.0, env="QUERY_CACHE_TTL_SECONDS")
+    QUERY_CACHE_MAX_ENTRIES: int = Field(2048, env="QUERY_CACHE_MAX_ENTRIES")
+
+    # ============================
+    # 🔹 RECUPERACIÓN HÍBRIDA (BM25 + vectores)
+    # ============================
+    HYBRID_SEARCH: bool = Field(True, env="HYBRID_SEARCH")
+    BM25_INDEX_DB: Path | None = Field(None, env="BM25_INDEX_DB")  # None → STORAGE_DIR/bm25.sqlite3
+    BM25_K1: float = Field(1.2, env="BM25_K1")
+    BM25_B: float = Field(0.75, env="BM25_B")
+    BM25_MAX_SEGMENTS: int = Field(8, env="BM25_MAX_SEGMENTS")   # segmentos por término antes de fusionar
+    HYBRID_POOL_K: int = Field(30, env="HYBRID_POOL_K")          # candidatos por recuperador (mín.)
+    HYBRID_RRF_K: int = Field(60, env="HYBRID_RRF_K")            # constante de reciprocal rank fusion
+
+    # ============================
+    # 🔹 RERANK (cross-encoder compartido)
+    # ============================
+    RERANK_WORKERS: int = Field(2, env="RERANK_WORKERS")                      # hilos del micro-batcher
+    RERANK_MAX_BATCH_PAIRS: int = Field(256, env="RERANK_MAX_BATCH_PAIRS")    # pares por llamada (varias consultas)
+    RERANK_BATCH_WAIT: float = Field(0.005, env="RERANK_BATCH_WAIT")          # espera máx. para juntar consultas
+    RERANK_BATCH_SIZE: int = Field(32, env="RERANK_BATCH_SIZE")               # pares por forward, ordenados por longitud
+    RERANK_MAX_LENGTH: int = Field(256, env="RERANK_MAX_LENGTH")              # tokens por par (truncado)
+    RERANK_CACHE_MAX_ENTRIES: int = Field(50_000, env="RERANK_CACHE_MAX_ENTRIES")
+    RERANK_CACHE_TTL_SECONDS: float = Field(3600.0, env="RERANK_CACHE_TTL_SECONDS")
+
+    # ============================
+    # 🔹 COLA DE INGESTA
+    # ============================
+    INGEST_WORKERS: int = Field(2, env="INGEST_WORKERS")          # jobs simultáneos
+    INGEST_CPU_WORKERS: int = Field(2, env="INGEST_CPU_WORKERS")  # procesos para extracción
+    INGEST_JOBS_DB: Path | None = Field(None, env="INGEST_JOBS_DB")  # None → STORAGE_DIR/ingest_jobs.sqlite3
+
+    # Pipeline de ingesta en streaming
+    INGEST_EMBED_BATCH: int = Field(256, env="INGEST_EMBED_BATCH")        # chunks por lote de embeddings
+    INGEST_PIPELINE_DEPTH: int = Field(2, env="INGEST_PIPELINE_DEPTH")    # lotes de upsert en vuelo
+    INGEST_PREFIX_CHARS: int = Field(20000, env="INGEST_PREFIX_CHARS")    # texto para tipo y resumen
+    DOC_TYPE_WINDOW_CHARS: int = Field(20000, env="DOC_TYPE_WINDOW_CHARS")  # tipo de documento: solo el inicio
+
+    # Re-ingesta incremental (documentos con external_id): ids de chunk por contenido, solo se embeben los cambios
+    INGEST_INCREMENTAL: bool = Field(True, env="INGEST_INCREMENTAL")
+    DOC_REGISTRY_DB: Path | None = Field(None, env="DOC_REGISTRY_DB")  # None → STORAGE_DIR/documents.sqlite3
+
+    # Ingesta masiva (directorios, zips, listas de archivos)
+    BULK_INGEST_WORKERS: int = Field(4, env="BULK_INGEST_WORKERS")          # archivos en paralelo
+    BULK_BATCH_WAIT: float = Field(0.05, env="BULK_BATCH_WAIT")             # espera máx. para llenar un lote global
+    BULK_INGEST_ROOT: Path | None = Field(None, env="BULK_INGEST_ROOT")     # rutas del servidor aceptadas por la API
+
+    # Extracción de PDF por páginas en paralelo
+    PDF_PARALLEL_MIN_PAGES: int = Field(64, env="PDF_PARALLEL_MIN_PAGES")  # debajo → serial
+    PDF_PARALLEL_WORKERS: int = Field(0, env="PDF_PARALLEL_WORKERS")       # 0 → núcleos disponibles
+    PDF_PAGES_PER_TASK: int = Field(32, env="PDF_PAGES_PER_TASK")
+
+    # Hojas de cálculo (XLSX) en streaming; 0 → sin límite
+    XLSX_MAX_ROWS_PER_SHEET: int = Field(200_000, env="XLSX_MAX_ROWS_PER_SHEET")
+    XLSX_MAX_CELLS_PER_ROW: int = Field(200, env="XLSX_MAX_CELLS_PER_ROW")
+
+    # Vista previa de /analyze: lectura acotada por formato (costo constante)
+    PREVIEW_CHARS: int = Field(1200, env="PREVIEW_CHARS")                  # texto devuelto
+    PREVIEW_SAMPLE_CHARS: int = Field(8000, env="PREVIEW_SAMPLE_CHARS")    # texto leído (tipo de documento)
+    PREVIEW_MAX_PAGES: int = Field(3, env="PREVIEW_MAX_PAGES")             # PDF
+    PREVIEW_MAX_PARAGRAPHS: int = Field(200, env="PREVIEW_MAX_PARAGRAPHS") # DOCX
+    PREVIEW_MAX_ROWS: int = Field(200, env="PREVIEW_MAX_ROWS")             # XLSX (todas las hojas)
+    PREVIEW_MAX_BYTES: int = Field(256 * 1024, env="PREVIEW_MAX_BYTES")    # TXT / EML
+
     # ============================
     # 🔹 LLM
     # ============================
@@ -54,6 +171,20 @@ class Settings(BaseSettings):
     # OpenAI LLM (solo si cambias provider)
     OPENAI_API_KEY: str | None = Field(None, env="OPENAI_API_KEY")
     OPENAI_MODEL: str = Field("gpt-4o-mini", env="OPENAI_MODEL")  # AHORA SÍ EXISTE
+    OPENAI_BASE_URL: str | None = Field(None, env="OPENAI_BASE_URL")  # proxy / servidor compatible
+
+    # ============================
+    # 🔹 CLIENTES HTTP (pool compartido)
+    # ============================
+    HTTP_TIMEOUT: float = Field(120.0, env="HTTP_TIMEOUT")
+    HTTP_CONNECT_TIMEOUT: float = Field(10.0, env="HTTP_CONNECT_TIMEOUT")
+    HTTP_POOL_SIZE: int = Field(32, env="HTTP_POOL_SIZE")
+    HTTP_MAX_RETRIES: int = Field(3, env="HTTP_MAX_RETRIES")
+    HTTP_BACKOFF_BASE: float = Field(0.5, env="HTTP_BACKOFF_BASE")
+    HTTP_BACKOFF_MAX: float = Field(20.0, env="HTTP_BACKOFF_MAX")
+    # Requests simultáneos por proveedor (sync + async)
+    HF_MAX_CONCURRENCY: int = Field(8, env="HF_MAX_CONCURRENCY")
+    OPENAI_MAX_CONCURRENCY: int = Field(16, env="OPENAI_MAX_CONCURRENCY")
 
     # ============================
     # 🔹 RE-RANKER / SUMMARIZER
@@ -62,6 +193,12 @@ class Settings(BaseSettings):
         "cross-encoder/ms-marco-MiniLM-L-6-v2",
         env="CROSS_ENCODER_MODEL"
     )
+    # Inferencia local (embeddings ST y cross-encoder): "torch" | "onnx" | "int8"
+    LOCAL_INFERENCE_BACKEND: str = Field("torch", env="LOCAL_INFERENCE_BACKEND")
+    LOCAL_INFERENCE_THREADS: int = Field(0, env="LOCAL_INFERENCE_THREADS")   # 0 → valor por defecto del runtime
+    # Arranque: precarga en segundo plano de modelos / vector store (ver /ready)
+    STARTUP_PRELOAD: bool = Field(True, env="STARTUP_PRELOAD")
+    STARTUP_WARMUP: bool = Field(True, env="STARTUP_WARMUP")   # inferencia de prueba tras cargar
     USE_LOCAL_SUMMARIZER: bool = Field(False, env="USE_LOCAL_SUMMARIZER")
     SUMMARIZER_MODEL: str = Field("google/pegasus-xsum", env="SUMMARIZER_MODEL")
 
@@ -73,6 +210,18 @@ class Settings(BaseSettings):
         BASE_DIR / "data" / "uploads",
         env="UPLOAD_DIR"
     )
+    # Cachés, índices locales y bases SQLite del servicio
+    STORAGE_DIR: Path = Field(
+        BASE_DIR / "storages",
+        env="STORAGE_DIR"
+    )
+    # Uploads direccionados por contenido (sha256); None → STORAGE_DIR/uploads
+    UPLOAD_STORE_DIR: Path | None = Field(None, env="UPLOAD_STORE_DIR")
+    UPLOAD_CHUNK_SIZE: int = Field(1 << 20, env="UPLOAD_CHUNK_SIZE")   # bytes por lectura al guardar
+    # Mismo archivo + provider + origen ya ingestado → se devuelve el resultado anterior
+    INGEST_DEDUP: bool = Field(True, env="INGEST_DEDUP")
+    # Feedback de usuarios (SQLite WAL); importa storages/feedback_log.json si existe
+    FEEDBACK_DB: Path | None = Field(None, env="FEEDBACK_DB")   # None → STORAGE_DIR/feedback.sqlite3
 
     # ============================
     # 🔹 MISC
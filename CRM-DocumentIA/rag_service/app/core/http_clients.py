@@ -0,0 +1,281 @@
+# app/core/http_clients.py
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Códigos que justifican reintento (rate limit / errores transitorios)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# ============================================================
+# Límites de concurrencia por proveedor
+# ============================================================
+def _max_concurrency(provider: str) -> int:
+    if provider == "openai":
+        return settings.OPENAI_MAX_CONCURRENCY
+    return settings.HF_MAX_CONCURRENCY
+
+
+_sync_limits: dict[str, threading.BoundedSemaphore] = {}
+_async_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+@contextmanager
+def limit(provider: str):
+    """Limita los requests simultáneos (hilos) hacia un proveedor."""
+    with _lock:
+        sem = _sync_limits.get(provider)
+        if sem is None:
+            sem = _sync_limits[provider] = threading.BoundedSemaphore(_max_concurrency(provider))
+    with sem:
+        yield
+
+
+@asynccontextmanager
+async def alimit(provider: str):
+    """Igual que `limit` para corrutinas (un semáforo por event loop)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_limits.setdefault(loop, {})
+        sem = per_loop.get(provider)
+        if sem is None:
+            sem = per_loop[provider] = asyncio.Semaphore(_max_concurrency(provider))
+    async with sem:
+        yield
+
+
+# ============================================================
+# Backoff con jitter
+# ============================================================
+def backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """
+    "Full jitter": espera aleatoria en [0, base·2^intento], acotada.
+    Si el servidor envía Retry-After (segundos) se respeta como mínimo.
+    """
+    delay = random.uniform(0, min(settings.HTTP_BACKOFF_MAX, settings.HTTP_BACKOFF_BASE * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return min(delay, settings.HTTP_BACKOFF_MAX)
+
+
+# ============================================================
+# Cliente síncrono (requests + keep-alive)
+# ============================================================
+_sessions: dict[str, requests.Session] = {}
+
+
+def get_session(provider: str) -> requests.Session:
+    """Session por proveedor con pool de conexiones persistentes."""
+    with _lock:
+        session = _sessions.get(provider)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=settings.HTTP_POOL_SIZE
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[provider] = session
+    return session
+
+
+def _timeout(timeout: float | None):
+    return (settings.HTTP_CONNECT_TIMEOUT, timeout or settings.HTTP_TIMEOUT)
+
+
+def request_with_retry(provider: str, method: str, url: str, timeout: float | None = None,
+                       retries: int | None = None, **kwargs) -> requests.Response:
+    """
+    Request con sesión compartida, límite de concurrencia y reintentos
+    (429/5xx y errores de conexión). Devuelve la última respuesta;
+    el manejo de status no reintentables queda en el llamador.
+    retries: reintentos (None → HTTP_MAX_RETRIES; 0 si el llamador ya reintenta).
+    """
+    session = get_session(provider)
+    attempts = max(1, (settings.HTTP_MAX_RETRIES if retries is None else retries) + 1)
+
+    for attempt in range(attempts):
+        try:
+            with limit(provider):
+                resp = session.request(method, url, timeout=_timeout(timeout), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"⚠️ {provider}: error de conexión ({e}). Reintento en {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        if resp.status_code in RETRY_STATUS and attempt < attempts - 1:
+            delay = backoff_delay(attempt, resp.headers.get("Retry-After"))
+            logger.warning(f"⚠️ {provider}: HTTP {resp.status_code}. Reintento en {delay:.1f}s")
+            resp.close()
+            time.sleep(delay)
+            continue
+
+        return resp
+
+
+@contextmanager
+def stream_with_retry(provider: str, method: str, url: str, timeout: float | None = None, **kwargs):
+    """
+    Como request_with_retry pero con stream=True; el cupo de concurrencia
+    se mantiene hasta terminar de leer la respuesta.
+    """
+    session = get_session(provider)
+    attempts = max(1, settings.HTTP_MAX_RETRIES + 1)
+
+    with limit(provider):
+        for attempt in range(attempts):
+            try:
+                resp = session.request(method, url, timeout=_timeout(timeout), stream=True, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            if resp.status_code in RETRY_STATUS and attempt < attempts - 1:
+                resp.close()
+                time.sleep(backoff_delay(attempt, resp.headers.get("Retry-After")))
+                continue
+            break
+
+        try:
+            yield resp
+        finally:
+            resp.close()
+
+
+# ============================================================
+# Cliente asíncrono (httpx.AsyncClient por event loop)
+# ============================================================
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def _httpx_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_POOL_SIZE,
+        max_keepalive_connections=settings.HTTP_POOL_SIZE
+    )
+
+
+def _httpx_timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+
+
+def get_async_client(provider: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+        client = per_loop.get(provider)
+        if client is None:
+            client = per_loop[provider] = httpx.AsyncClient(
+                limits=_httpx_limits(),
+                timeout=_httpx_timeout()
+            )
+    return client
+
+
+async def arequest_with_retry(provider: str, method: str, url: str, retries: int | None = None,
+                             **kwargs) -> httpx.Response:
+    """Versión async de request_with_retry."""
+    client = get_async_client(provider)
+    attempts = max(1, (settings.HTTP_MAX_RETRIES if retries is None else retries) + 1)
+
+    for attempt in range(attempts):
+        try:
+            async with alimit(provider):
+                resp = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"⚠️ {provider}: error de conexión ({e}). Reintento en {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        if resp.status_code in RETRY_STATUS and attempt < attempts - 1:
+            delay = backoff_delay(attempt, resp.headers.get("Retry-After"))
+            logger.warning(f"⚠️ {provider}: HTTP {resp.status_code}. Reintento en {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        return resp
+
+
+# ============================================================
+# Clientes OpenAI compartidos
+# ============================================================
+_openai_client = None
+_async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+def get_openai_client():
+    """
+    Cliente OpenAI único (pool httpx propio). El SDK ya reintenta 429/5xx
+    con backoff y jitter; se configura con HTTP_MAX_RETRIES.
+    """
+    global _openai_client
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY no definido.")
+
+    with _lock:
+        if _openai_client is None:
+            from openai import OpenAI
+            _openai_client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                max_retries=settings.HTTP_MAX_RETRIES,
+                timeout=_httpx_timeout(),
+                http_client=httpx.Client(limits=_httpx_limits(), timeout=_httpx_timeout())
+            )
+    return _openai_client
+
+
+def get_async_openai_client():
+    """Cliente AsyncOpenAI por event loop."""
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY no definido.")
+
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_openai_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = _async_openai_clients[loop] = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                max_retries=settings.HTTP_MAX_RETRIES,
+                timeout=_httpx_timeout(),
+                http_client=httpx.AsyncClient(limits=_httpx_limits(), timeout=_httpx_timeout())
+            )
+    return client
+
+
+def reset_clients():
+    """Descarta clientes cacheados (p. ej. tras cambiar settings en tests)."""
+    global _openai_client
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _openai_client = None
+        _async_clients.clear()
+        _async_openai_clients.clear()
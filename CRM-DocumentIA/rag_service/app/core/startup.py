@@ -0,0 +1,171 @@
+# app/core/startup.py
+
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Estado del arranque:
+#   "starting" → proceso importado, precarga sin lanzar
+#   "warming"  → cargando / calentando modelos en segundo plano
+#   "ready"    → listo para atender consultas sin pagar cargas en frío
+#   "failed"   → no se pudo cargar un componente imprescindible
+_state = {"status": "starting", "started_at": time.time(), "ready_at": None}
+_timings: dict[str, float] = {}
+_errors: dict[str, str] = {}
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+# Extractores con imports pesados (se difieren hasta la primera ingesta)
+_EXTRACTOR_MODULES = ("pymupdf", "docx", "openpyxl", "extract_msg", "langchain_text_splitters")
+
+
+@contextmanager
+def timed(name: str):
+    """Registra la duración (segundos) de un paso del arranque."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _timings[name] = round(time.perf_counter() - t0, 3)
+
+
+def record_timing(name: str, seconds: float):
+    with _lock:
+        _timings[name] = round(seconds, 3)
+
+
+def _set_status(status: str):
+    with _lock:
+        _state["status"] = status
+        if status in ("ready", "failed"):
+            _state["ready_at"] = time.time()
+
+
+# ============================
+# PASOS DE PRECARGA
+# ============================
+def _preload_embeddings():
+    """Modelo local de embeddings (solo si el proveedor es local)."""
+    if settings.EMB_PROVIDER != "sentence_transformers":
+        return
+    from app.rag import embeddings
+
+    with timed("embeddings_load"):
+        if embeddings._load_local_model() is None:
+            raise RuntimeError("Modelo local de embeddings no disponible")
+    if settings.STARTUP_WARMUP:
+        # Primer encode: inicializa kernels y buffers del runtime
+        with timed("embeddings_warmup"):
+            embeddings._compute_embeddings(["warm-up"], "sentence_transformers")
+
+
+def _preload_reranker():
+    from app.rag.rerank_service import get_rerank_service
+
+    service = get_rerank_service()
+    with timed("rerank_load"):
+        available = service.available
+    if available and settings.STARTUP_WARMUP:
+        with timed("rerank_warmup"):
+            service._predict([("warm-up", "warm-up")])
+
+
+def _preload_vector_store():
+    from app.vectorstore.store import get_backend
+
+    with timed("vector_store"):
+        backend = get_backend()
+        if settings.VECTOR_BACKEND == "local":
+            # Abre el índice existente (memmap + replay del log de metadata)
+            if (backend._index_dir(settings.PINECONE_INDEX) / "header.json").exists():
+                backend.get_index(settings.PINECONE_INDEX)
+        else:
+            backend.get_client()
+
+    from app.vectorstore.bm25_index import get_lexical_index
+
+    with timed("bm25_index"):
+        get_lexical_index()
+
+
+def _preload_extractors():
+    with timed("extractors"):
+        for name in _EXTRACTOR_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+
+# (nombre, función, imprescindible)
+_STEPS = (
+    ("embeddings", _preload_embeddings, True),
+    ("rerank", _preload_reranker, False),
+    ("vector_store", _preload_vector_store, False),
+)
+
+
+def _run_preload():
+    t0 = time.perf_counter()
+    failed = False
+
+    for name, step, required in _STEPS:
+        try:
+            step()
+        except Exception as e:
+            logger.error(f"❌ Precarga '{name}' falló: {e}")
+            with _lock:
+                _errors[name] = str(e)
+            failed = failed or required
+
+    record_timing("preload_total", time.perf_counter() - t0)
+    _set_status("failed" if failed else "ready")
+    logger.info(f"🚀 Servicio {_state['status']} en {_timings['preload_total']}s (precarga: {dict(_timings)})")
+
+    # Los extractores no bloquean la disponibilidad para consultas
+    _preload_extractors()
+
+
+def start_preload() -> Optional[threading.Thread]:
+    """
+    Lanza la precarga en un hilo de fondo (una sola vez). Con
+    STARTUP_PRELOAD desactivado el servicio queda listo de inmediato
+    y los modelos se cargan en la primera consulta que los necesite.
+    """
+    global _thread
+
+    with _lock:
+        if _thread is not None or _state["status"] != "starting":
+            return _thread
+        if not settings.STARTUP_PRELOAD:
+            _state["status"] = "ready"
+            _state["ready_at"] = time.time()
+            return None
+        _state["status"] = "warming"
+        _thread = threading.Thread(target=_run_preload, name="startup-preload", daemon=True)
+
+    _thread.start()
+    return _thread
+
+
+def readiness() -> dict:
+    from app.rag import local_models
+
+    with _lock:
+        ready_at = _state["ready_at"]
+        return {
+            "status": _state["status"],
+            "ready": _state["status"] == "ready",
+            "uptime_seconds": round(time.time() - _state["started_at"], 2),
+            "startup_seconds": round(ready_at - _state["started_at"], 3) if ready_at else None,
+            "timings": dict(_timings),
+            "errors": dict(_errors),
+            # Backend de inferencia efectivo por modelo local (fallback=True → se pidió otro)
+            "inference_backends": local_models.backend_report(),
+        }
@@ -1,11 +1,18 @@
 # app/main.py
 
+import time
+
+_import_t0 = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.core import startup
 from app.api import ingest, query, analyze, feedback
+from app.rag import ingest_jobs
 
 app = FastAPI(
     title="CRM RAG Service",
@@ -28,9 +35,28 @@ app.include_router(query.router)
 app.include_router(analyze.router)
 app.include_router(feedback.router)
 
+# ------------ Ciclo de vida ------------
+@app.on_event("startup")
+async def on_startup():
+    ingest_jobs.resume_pending_jobs()
+    startup.start_preload()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    ingest_jobs.shutdown()
+
 # ------------ Healthcheck ------------
 @app.get("/health")
 async def health():
     return {"status": "ok", "service": "CRM RAG"}
 
+
+# ------------ Readiness (modelos precargados) ------------
+@app.get("/ready")
+async def ready():
+    state = startup.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+startup.record_timing("import_app", time.perf_counter() - _import_t0)
 logger.info("🔥 CRM RAG Service iniciado correctamente.")
@@ -0,0 +1,365 @@
+# app/rag/bulk_ingest.py
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.core.batching import MicroBatcher
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.embeddings import embed_array
+from app.rag.ingestion import ingest_file_to_pinecone
+from app.utils.text_extract import TEXT_EXTENSIONS
+from app.vectorstore.store import upsert_vectors
+
+
+# run_id nombra el checkpoint en STORAGE_DIR/bulk: nada de separadores ni ".."
+_RUN_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def is_valid_run_id(run_id: str) -> bool:
+    return bool(_RUN_ID.fullmatch(run_id))
+
+
+# ================================================================
+# 📂 FUENTES: directorios, zips y listas de archivos
+# ================================================================
+def iter_sources(inputs: list) -> Iterator[dict]:
+    """
+    Recorre las entradas de forma perezosa y genera un ítem por documento:
+      {"name": nombre lógico, "key": identidad para el checkpoint,
+       "path": archivo en disco} o, para miembros de un zip,
+      {"name", "key", "zip": ruta del zip, "member": nombre interno}.
+
+    Una entrada es una ruta (archivo, zip o directorio) o un archivo ya
+    resuelto {"path", "name", "identity"}, p. ej. una copia subida por la
+    API: su identidad (hash del contenido) no depende de dónde se guardó.
+
+    Los directorios se recorren en orden (recursivo, incluidos los zips
+    que contengan); se ignoran los formatos sin extracción de texto.
+    """
+    for raw in inputs:
+        if isinstance(raw, dict):
+            yield from _file_items(Path(raw["path"]), raw["name"], raw.get("identity"))
+            continue
+        path = Path(raw)
+        if path.is_dir():
+            for child in sorted(p for p in path.rglob("*") if p.is_file()):
+                yield from _file_items(child, child.relative_to(path).as_posix())
+        elif path.is_file():
+            yield from _file_items(path, path.name)
+        else:
+            logger.warning(f"⚠️ Entrada de ingesta masiva inexistente: {raw}")
+
+
+def _file_items(path: Path, name: str, identity: Optional[str] = None) -> Iterator[dict]:
+    """identity: identidad estable del archivo (por defecto ruta, tamaño y mtime)."""
+    suffix = path.suffix.lower()
+    if suffix == ".zip":
+        yield from _zip_items(path, identity)
+    elif suffix in TEXT_EXTENSIONS:
+        if identity is None:
+            st = path.stat()
+            identity = f"{path.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+        yield {"name": name, "key": identity, "path": str(path)}
+
+
+def _zip_items(path: Path, identity: Optional[str] = None) -> Iterator[dict]:
+    try:
+        with zipfile.ZipFile(path) as zf:
+            infos = zf.infolist()
+    except zipfile.BadZipFile:
+        logger.warning(f"⚠️ Zip inválido en ingesta masiva: {path}")
+        return
+
+    # CRC + tamaño identifican el contenido sin descomprimir
+    for info in infos:
+        if info.is_dir() or Path(info.filename).suffix.lower() not in TEXT_EXTENSIONS:
+            continue
+        yield {
+            "name": info.filename,
+            "key": f"{identity or path.resolve()}!{info.filename}:{info.CRC:08x}:{info.file_size}",
+            "zip": str(path),
+            "member": info.filename,
+        }
+
+
+# ================================================================
+# 📝 CHECKPOINT (JSONL append-only)
+# ================================================================
+class Checkpoint:
+    """
+    Una línea por documento terminado: {key, name, status, ...}.
+    Al reanudar se saltan los documentos con status "ok"; los que
+    fallaron se reintentan.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.done: set[str] = set()
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue   # última línea truncada por un corte
+                    if entry.get("status") == "ok":
+                        self.done.add(entry["key"])
+
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, entry: dict):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            if entry.get("status") == "ok":
+                self.done.add(entry["key"])
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# ================================================================
+# 🚚 EJECUCIÓN
+# ================================================================
+def _upsert(items: list):
+    upsert_vectors(settings.PINECONE_INDEX, items)   # sin resultado por pedido
+
+
+class BulkIngest:
+    """
+    Ingesta masiva con el pipeline de ingest_file_to_pinecone por archivo:
+      - `workers` archivos en paralelo (extracción y chunking),
+      - lotes de embeddings y de upsert GLOBALES: los chunks de varios
+        archivos se agrupan en un MicroBatcher, así miles de correos de
+        uno o dos chunks no generan miles de requests pequeños,
+      - checkpoint JSONL para reanudar,
+      - métricas de throughput (docs/s, chunks/s).
+
+    upload_dir: copias de archivos subidos por la API; se borran al
+    terminar la ejecución (con éxito o no). Para reanudar, el cliente
+    vuelve a enviar los archivos con el mismo run_id: su identidad es el
+    hash del contenido, así el checkpoint salta los que ya terminaron.
+    """
+
+    def __init__(self, inputs: list, provider: Optional[str] = None, source_name: str = "bulk",
+                 checkpoint: Optional[Path] = None, workers: Optional[int] = None,
+                 chunk_size: int = 500, summarize: bool = False, cpu_executor=None,
+                 run_id: Optional[str] = None, upload_dir: Optional[Path] = None):
+        self.run_id = run_id or str(uuid.uuid4())
+        if not is_valid_run_id(self.run_id):
+            raise ValueError(f"run_id inválido: {self.run_id!r} (solo letras, dígitos, '-' y '_')")
+        self.upload_dir = Path(upload_dir) if upload_dir else None
+        self.inputs = [i if isinstance(i, dict) else str(i) for i in inputs]
+        self.provider = provider or settings.EMB_PROVIDER
+        self.source_name = source_name
+        self.workers = max(1, workers or settings.BULK_INGEST_WORKERS)
+        self.chunk_size = chunk_size
+        self.summarize = summarize
+        self.cpu_executor = cpu_executor
+        self.checkpoint_path = Path(checkpoint or settings.STORAGE_DIR / "bulk" / f"{self.run_id}.jsonl")
+
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.docs = 0
+        self.chunks = 0
+        self.new_chunks = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._zip_lock = threading.Lock()
+        self._zips: dict[str, zipfile.ZipFile] = {}
+        self._embedder: Optional[MicroBatcher] = None
+
+    # ---------- métricas ----------
+    def progress(self) -> dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            embedder = self._embedder
+            return {
+                "run_id": self.run_id,
+                "status": self.status,
+                "error": self.error,
+                "docs": self.docs,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "chunks": self.chunks,
+                "chunks_embedded": self.new_chunks,
+                "embed_batches": embedder.batches if embedder else 0,
+                "elapsed_seconds": round(elapsed, 2),
+                "docs_per_s": round(self.docs / elapsed, 2) if elapsed else 0.0,
+                "chunks_per_s": round(self.chunks / elapsed, 1) if elapsed else 0.0,
+                "checkpoint": str(self.checkpoint_path),
+            }
+
+    # ---------- ejecución ----------
+    def run(self) -> dict:
+        self.status = "running"
+        self.started_at = time.time()
+        checkpoint = Checkpoint(self.checkpoint_path)
+
+        provider = self.provider
+        self._embedder = MicroBatcher(
+            lambda texts: embed_array(texts, provider=provider),
+            max_items=settings.INGEST_EMBED_BATCH,
+            max_wait=settings.BULK_BATCH_WAIT,
+            name="bulk-embed",
+        )
+        upserter = MicroBatcher(
+            _upsert,
+            max_items=settings.PINECONE_UPSERT_BATCH_SIZE * max(1, settings.PINECONE_UPSERT_CONCURRENCY),
+            max_wait=settings.BULK_BATCH_WAIT,
+            name="bulk-upsert",
+        )
+
+        logger.info(f"📦 Ingesta masiva {self.run_id}: {self.inputs} (workers={self.workers})")
+        last_log = time.time()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-ingest") as pool:
+                in_flight = set()
+                for item in iter_sources(self.inputs):
+                    if item["key"] in checkpoint.done:
+                        with self._lock:
+                            self.skipped += 1
+                        continue
+
+                    # Ventana acotada: las fuentes se recorren a medida que avanza la ingesta
+                    if len(in_flight) >= self.workers * 2:
+                        _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    in_flight.add(pool.submit(self._ingest_one, item, checkpoint, upserter))
+
+                    if time.time() - last_log >= 10:
+                        last_log = time.time()
+                        p = self.progress()
+                        logger.info(
+                            f"📦 {self.run_id}: {p['docs']} docs, {p['chunks']} chunks "
+                            f"({p['docs_per_s']} docs/s, {p['chunks_per_s']} chunks/s)"
+                        )
+
+                wait(in_flight)
+            self.status = "done"
+
+        except Exception as e:
+            logger.error(f"❌ Ingesta masiva {self.run_id} falló: {e}")
+            self.status = "failed"
+            self.error = str(e)
+            raise
+
+        finally:
+            self._embedder.close()
+            upserter.close()
+            checkpoint.close()
+            for zf in self._zips.values():
+                zf.close()
+            if self.upload_dir is not None:
+                shutil.rmtree(self.upload_dir, ignore_errors=True)
+            self.finished_at = time.time()
+
+        stats = self.progress()
+        logger.info(
+            f"🏁 Ingesta masiva {self.run_id}: {stats['docs']} docs, {stats['chunks']} chunks en "
+            f"{stats['elapsed_seconds']}s ({stats['docs_per_s']} docs/s, {stats['chunks_per_s']} chunks/s)"
+        )
+        return stats
+
+    def _ingest_one(self, item: dict, checkpoint: Checkpoint, upserter: MicroBatcher):
+        embedder = self._embedder
+        tmp_dir = None
+        try:
+            if "zip" in item:
+                tmp_dir = tempfile.mkdtemp(prefix="bulk-")
+                path = self._extract_member(item, tmp_dir)
+            else:
+                path = item["path"]
+
+            result = ingest_file_to_pinecone(
+                path,
+                source_name=self.source_name,
+                chunk_size=self.chunk_size,
+                provider=self.provider,
+                cpu_executor=self.cpu_executor,
+                filename=item["name"],
+                summarize=self.summarize,
+                embed=lambda texts, provider=None: embedder(texts),
+                upsert=upserter,
+            )
+        except Exception as e:
+            logger.error(f"❌ Ingesta masiva: {item['name']} falló: {e}")
+            result = {"status": "error", "error": str(e)}
+        finally:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        entry = {"key": item["key"], "name": item["name"], "status": result.get("status")}
+        with self._lock:
+            if result.get("status") == "ok":
+                meta = result["archivo_metadata_json"]
+                changes = result.get("cambios", {})
+                self.docs += 1
+                self.chunks += meta["chunks"]
+                self.new_chunks += changes.get("chunks_nuevos", meta["chunks"])
+                entry.update(document_id=result["document_id"], chunks=meta["chunks"])
+            else:
+                self.failed += 1
+                entry["error"] = result.get("error")
+        checkpoint.record(entry)
+
+    def _extract_member(self, item: dict, tmp_dir: str) -> str:
+        """Descomprime un miembro del zip a un archivo temporal (mismo sufijo)."""
+        dest = os.path.join(tmp_dir, "doc" + Path(item["member"]).suffix.lower())
+        with self._zip_lock:
+            zf = self._zips.get(item["zip"])
+            if zf is None:
+                zf = self._zips[item["zip"]] = zipfile.ZipFile(item["zip"])
+            with zf.open(item["member"]) as src, open(dest, "wb") as out:
+                shutil.copyfileobj(src, out)
+        return dest
+
+
+# ================================================================
+# 🔌 EJECUCIONES EN SEGUNDO PLANO (API)
+# ================================================================
+_runs: dict[str, BulkIngest] = {}
+_runs_lock = threading.Lock()
+
+
+def start_bulk_ingest(inputs: list, **kwargs) -> BulkIngest:
+    """Lanza la ingesta masiva en un hilo y la registra por run_id."""
+    run = BulkIngest(inputs, **kwargs)
+    with _runs_lock:
+        current = _runs.get(run.run_id)
+        if current is not None and current.status in ("pending", "running"):
+            raise RuntimeError(f"La ingesta masiva {run.run_id} ya está en curso")
+        _runs[run.run_id] = run
+
+    def target():
+        try:
+            run.run()
+        except Exception:
+            pass   # el error queda en run.error
+
+    threading.Thread(target=target, name=f"bulk-{run.run_id[:8]}", daemon=True).start()
+    return run
+
+
+def get_bulk_run(run_id: str) -> Optional[BulkIngest]:
+    with _runs_lock:
+        return _runs.get(run_id)
@@ -0,0 +1,124 @@
+# app/rag/doc_classifier.py
+
+import re
+from typing import Optional
+
+from app.core.config import settings
+
+# ------------------------------
+# Patrones de detección de tipo
+# ------------------------------
+DOC_PATTERNS = {
+    "contrato": ["contrato", "contratante", "contratista", "cláusula", "clausula", "honorarios"],
+    "correo": ["asunto:", "estimado", "saludos", "atentamente", "from:", "para:"],
+    "factura": ["factura", "subtotal", "iva", "valor total", "nit", "número de factura"],
+    "propuesta": ["propuesta", "cotización", "alcance", "entregables"],
+    "pqr": ["petición", "queja", "reclamo", "pqrs"],
+    "acta": ["acta", "reunión", "acuerdos", "asistentes", "orden del día"]
+}
+
+# Tipo implícito en una pregunta (solo tipos con prompt propio)
+QUERY_PATTERNS = {
+    "contrato": ["contrato", "cláusula"],
+    "factura": ["factura"],
+    "correo": ["correo", "email"],
+}
+
+
+def _trie_pattern(words) -> str:
+    """
+    Regex con las palabras factorizadas por prefijo común
+    (p. ej. contrat(?:ante|ista|o)): en cada posición el motor sigue una
+    sola rama en vez de probar todas las alternativas.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        optional = "" in node
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 and not optional else "(?:" + "|".join(alts) + ")"
+        return body + "?" if optional else body    # greedy: prefiere la palabra más larga
+
+    return build(trie)
+
+
+class KeywordClassifier:
+    """
+    Clasificador por palabras clave en una sola pasada: todas las palabras
+    de todos los tipos se compilan en una única regex (trie) que recorre el
+    texto una vez; el puntaje de cada tipo es el número de palabras
+    distintas encontradas.
+
+    Las palabras deben empezar en inicio de palabra ("iva" no cuenta dentro
+    de "archivada") pero admiten sufijos ("contratos", "facturas").
+    """
+
+    def __init__(self, patterns: dict, default: Optional[str] = None):
+        self.patterns = {k: [w.lower() for w in kws] for k, kws in patterns.items()}
+        self.default = default
+
+        self._types_for: dict[str, set] = {}
+        for doc_type, kws in self.patterns.items():
+            for kw in kws:
+                self._types_for.setdefault(kw, set()).add(doc_type)
+
+        words = sorted(self._types_for)
+        self._regex = re.compile(r"\b" + _trie_pattern(words))
+        # Coincidencias sin solapamiento: "número de factura" también implica "factura"
+        self._implies = {
+            kw: {other for other in words if re.search(r"\b" + re.escape(other), kw)}
+            for kw in words
+        }
+
+    def scores(self, text: str, window: Optional[int] = None) -> dict:
+        """Palabras distintas encontradas por tipo (solo los primeros `window` caracteres)."""
+        if window:
+            text = text[:window]
+        found = set()
+        for kw in set(self._regex.findall(text.lower())):
+            found |= self._implies[kw]
+
+        scores = dict.fromkeys(self.patterns, 0)
+        for kw in found:
+            for doc_type in self._types_for[kw]:
+                scores[doc_type] += 1
+        return scores
+
+    def classify(self, text: str, window: Optional[int] = None) -> dict:
+        """
+        Devuelve {"doc_type", "confidence", "scores"}:
+          - doc_type   → tipo con más palabras; `default` si no hay ninguna o hay empate
+          - confidence → fracción de las coincidencias que apoyan a ese tipo (0..1)
+        """
+        scores = self.scores(text, window)
+        best = max(scores, key=scores.get)
+        total = sum(scores.values())
+
+        if scores[best] == 0 or list(scores.values()).count(scores[best]) > 1:
+            return {"doc_type": self.default, "confidence": 0.0, "scores": scores}
+        return {"doc_type": best, "confidence": round(scores[best] / total, 4), "scores": scores}
+
+
+DOCUMENT_CLASSIFIER = KeywordClassifier(DOC_PATTERNS, default="documento")
+QUERY_CLASSIFIER = KeywordClassifier(QUERY_PATTERNS, default=None)
+
+
+def classify_document(text: str) -> dict:
+    """Tipo de documento con puntajes, sobre los primeros DOC_TYPE_WINDOW_CHARS caracteres."""
+    return DOCUMENT_CLASSIFIER.classify(text, window=settings.DOC_TYPE_WINDOW_CHARS)
+
+
+def detect_document_type(text: str) -> str:
+    return classify_document(text)["doc_type"]
+
+
+def detect_query_doc_type(question: str) -> Optional[str]:
+    """Auto-detección del tipo de documento a partir de la pregunta (None si no hay o es ambiguo)."""
+    return QUERY_CLASSIFIER.classify(question)["doc_type"]
@@ -0,0 +1,171 @@
+# app/rag/doc_registry.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Espacio de nombres para document_id deterministas (uuid5)
+_DOC_NAMESPACE = uuid.UUID("5b1c8f5e-3f4a-4c2e-9a57-2f0d6a1e7c41")
+
+
+# ============================
+# HUELLAS
+# ============================
+def file_fingerprint(file_path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 del archivo, leído por bloques."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_fingerprint(text: str, doc_type: str) -> str:
+    """
+    Huella corta de un chunk. Incluye el tipo de documento porque va en la
+    metadata del vector: si cambia el tipo, todos los chunks se reescriben.
+    """
+    return hashlib.sha256(f"{doc_type}\x1f{text}".encode("utf-8")).hexdigest()[:24]
+
+
+def metadata_fingerprint(metadata: dict) -> str:
+    """Huella de la metadata de un chunk (posición, archivo, etc.)."""
+    blob = json.dumps(metadata, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def document_id_for(source_name: str, external_id: str, provider: str) -> str:
+    """
+    document_id estable a partir del id que el cliente asigna al documento
+    (p. ej. el id del CRM), por origen y proveedor. El nombre de archivo no
+    sirve: dos archivos distintos pueden llamarse igual.
+    """
+    return str(uuid.uuid5(_DOC_NAMESPACE, f"{provider}\x1f{source_name}\x1f{external_id}"))
+
+
+# ============================
+# REGISTRO DE DOCUMENTOS
+# ============================
+class DocumentRegistry:
+    """
+    Estado de la última ingesta de cada documento, para re-ingesta incremental:
+      - documents → huella del archivo, tipo, dimensión, huella del prefijo y resumen
+      - chunks    → ids de chunk vigentes en el índice vectorial y la huella
+                    de la metadata con que se guardaron
+
+    Se escribe solo después de que el índice quedó actualizado; si una
+    ingesta se interrumpe, la siguiente parte del estado anterior.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._doc_locks: dict[str, threading.Lock] = {}
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                provider TEXT,
+                file_hash TEXT NOT NULL,
+                doc_type TEXT,
+                vector_dim INTEGER,
+                prefix_hash TEXT,
+                summary TEXT,
+                chunks INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                document_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                meta_hash TEXT,
+                PRIMARY KEY (document_id, chunk_id)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    @contextmanager
+    def locked(self, document_id: str):
+        """Serializa ingestas concurrentes del mismo documento."""
+        with self._lock:
+            lock = self._doc_locks.setdefault(document_id, threading.Lock())
+        with lock:
+            yield
+
+    def get(self, document_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def chunk_states(self, document_id: str) -> dict[str, Optional[str]]:
+        """chunk_id → huella de la metadata guardada en el índice."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id, meta_hash FROM chunks WHERE document_id = ?", (document_id,)
+            ).fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    def save(self, document_id: str, filename: str, provider: str, file_hash: str,
+             doc_type: str, vector_dim: Optional[int], prefix_hash: str, summary: str,
+             chunk_ids: list[str], meta_hashes: Optional[list[str]] = None):
+        """Reemplaza el estado del documento (una transacción)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (document_id, filename, provider, file_hash, doc_type, "
+                "vector_dim, prefix_hash, summary, chunks, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (document_id, filename, provider, file_hash, doc_type, vector_dim,
+                 prefix_hash, summary, len(chunk_ids), time.time())
+            )
+            self._conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (document_id, chunk_id, meta_hash) VALUES (?, ?, ?)",
+                ((document_id, cid, h) for cid, h in zip(chunk_ids, meta_hashes or [None] * len(chunk_ids)))
+            )
+
+
+# ============================
+# INSTANCIA GLOBAL (perezosa)
+# ============================
+_registry: DocumentRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_document_registry() -> DocumentRegistry | None:
+    """Devuelve el registro global o None si la ingesta incremental está deshabilitada."""
+    global _registry
+
+    if not settings.INGEST_INCREMENTAL:
+        return None
+
+    with _registry_lock:
+        if _registry is None:
+            path = settings.DOC_REGISTRY_DB or settings.STORAGE_DIR / "documents.sqlite3"
+            _registry = DocumentRegistry(path)
+            logger.info(f"🗂️ Registro de documentos en {path}")
+
+    return _registry
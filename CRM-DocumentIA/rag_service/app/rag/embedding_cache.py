@@ -0,0 +1,233 @@
+# app/rag/embedding_cache.py
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+
+_WS_RE = re.compile(r"\s+")
+
+
+# ============================
+# CLAVES
+# ============================
+def normalize_text(text: str) -> str:
+    """Normaliza unicode y espacios para que textos equivalentes compartan clave."""
+    text = unicodedata.normalize("NFC", text)
+    return _WS_RE.sub(" ", text).strip()
+
+
+def cache_key(provider: str, model: str, text: str) -> str:
+    """Clave direccionada por contenido: (provider, modelo, hash del texto normalizado)."""
+    raw = f"{provider}\x1f{model}\x1f{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ============================
+# CACHÉ DE DOS NIVELES
+# ============================
+class EmbeddingCache:
+    """
+    Caché de embeddings:
+      - nivel 1: LRU en memoria (OrderedDict de arrays float32 de solo lectura)
+      - nivel 2: SQLite en disco, vectores como BLOB (float32 o float16)
+
+    El nivel en disco se acota a `max_entries`; al superarlo se expulsan
+    las entradas usadas hace más tiempo. Con dtype="float16" el disco ocupa
+    la mitad; el tipo de cada fila se deduce de su tamaño y `dim`, así que
+    ambos formatos pueden convivir en la misma base.
+    """
+
+    def __init__(self, path: Path, max_entries: int, memory_entries: int, dtype: str = "float32"):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.dtype = np.dtype(dtype)
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+    # ---------- memoria ----------
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ---------- lectura ----------
+    def get_many(self, keys: list[str]) -> list[np.ndarray | None]:
+        """Devuelve un vector float32 por clave (None si no está en caché)."""
+        found: dict[str, np.ndarray] = {}
+
+        with self._lock:
+            pending = []
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+                    self.memory_hits += 1
+                elif key not in found:
+                    pending.append(key)
+
+            pending = list(dict.fromkeys(pending))
+            if pending:
+                now = time.time()
+                # SQLite limita el número de parámetros por consulta
+                for i in range(0, len(pending), 500):
+                    part = pending[i:i + 500]
+                    marks = ",".join("?" * len(part))
+                    rows = self._conn.execute(
+                        f"SELECT key, dim, vector FROM embeddings WHERE key IN ({marks})", part
+                    ).fetchall()
+                    for key, dim, blob in rows:
+                        vec = _decode(blob, dim)
+                        found[key] = vec
+                        self._remember(key, vec)
+                    if rows:
+                        self._conn.executemany(
+                            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                            [(now, key) for key, _, _ in rows]
+                        )
+                self._conn.commit()
+
+            result = [found.get(key) for key in keys]
+            hits = sum(1 for v in result if v is not None)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return result
+
+    # ---------- escritura ----------
+    def put_many(self, provider: str, model: str, keys: list[str], vectors):
+        """vectors: matriz (n, dim) o lista de vectores."""
+        now = time.time()
+        rows = []
+        matrix = np.asarray(vectors, dtype=np.float32)
+
+        with self._lock:
+            for key, vec in zip(keys, matrix):
+                rows.append((key, provider, model, vec.shape[0], vec.astype(self.dtype).tobytes(), now))
+                # Copia de la fila: una vista retendría la matriz completa
+                row = vec.copy()
+                row.flags.writeable = False
+                self._remember(key, row)
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, provider, model, dim, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count <= self.max_entries:
+            return
+
+        # Se libera un 10% extra para no expulsar en cada escritura
+        to_remove = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "  SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?"
+            ")",
+            (to_remove,)
+        )
+        self._conn.commit()
+        self.evictions += to_remove
+        logger.info(f"🧹 Caché de embeddings: {to_remove} entradas expulsadas")
+
+    # ---------- métricas ----------
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "disk_entries": size,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+
+def _decode(blob: bytes, dim: int) -> np.ndarray:
+    """BLOB → array float32 de solo lectura (float16 si ocupa 2 bytes por componente)."""
+    if len(blob) == dim * 2:
+        vec = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+        vec.flags.writeable = False
+        return vec
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+# ============================
+# INSTANCIA GLOBAL (perezosa)
+# ============================
+_cache: EmbeddingCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache | None:
+    """Devuelve la caché global o None si está deshabilitada."""
+    global _cache
+
+    if not settings.EMB_CACHE_ENABLED:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            path = settings.EMB_CACHE_PATH or settings.STORAGE_DIR / "embedding_cache.sqlite3"
+            _cache = EmbeddingCache(
+                path,
+                max_entries=settings.EMB_CACHE_MAX_ENTRIES,
+                memory_entries=settings.EMB_CACHE_MEMORY_ENTRIES,
+                dtype=settings.EMB_CACHE_DTYPE
+            )
+            logger.info(f"🗄️ Caché de embeddings en {path}")
+
+    return _cache
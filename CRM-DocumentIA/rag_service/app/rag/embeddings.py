@@ -1,18 +1,31 @@
 # app/rag/embeddings.py
 
+import asyncio
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
 import requests
+
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.http_clients import (
+    RETRY_STATUS,
+    request_with_retry, arequest_with_retry,
+    get_openai_client, get_async_openai_client,
+    limit, alimit
+)
+from app.rag.embedding_cache import get_embedding_cache, cache_key
 
 # ============================
-# Local sentence-transformers
+# Local sentence-transformers (import perezoso: torch tarda segundos)
 # ============================
-try:
-    from sentence_transformers import SentenceTransformer
-except Exception:
-    SentenceTransformer = None
+from app.rag.local_models import load_sentence_transformer
 
 _local_model = None
+_local_model_lock = threading.Lock()
 
 
 # ============================
@@ -20,21 +33,71 @@ _local_model = None
 # ============================
 def _load_local_model():
     global _local_model
-    if _local_model is None:
-        if SentenceTransformer is None:
-            logger.error("sentence-transformers no está instalado.")
-            return None
-
-        logger.info(f"🔹 Cargando modelo local ST: {settings.EMB_MODEL}")
-        _local_model = SentenceTransformer(settings.EMB_MODEL)
+    with _local_model_lock:
+        if _local_model is None:
+            logger.info(f"🔹 Cargando modelo local ST: {settings.EMB_MODEL} "
+                        f"(backend={settings.LOCAL_INFERENCE_BACKEND})")
+            try:
+                _local_model = load_sentence_transformer(settings.EMB_MODEL)
+            except ImportError:
+                logger.error("sentence-transformers no está instalado.")
+                return None
 
     return _local_model
 
 
+# ============================
+# ERRORES TRANSITORIOS
+# ============================
+# Los lotes remotos se reintentan en un solo nivel (_embed_batch_with_retry):
+# las llamadas de embeddings van con los reintentos HTTP / del SDK en 0, así
+# un lote se envía como máximo EMB_MAX_RETRIES veces.
+class TransientEmbeddingError(RuntimeError):
+    """429 / 5xx del proveedor: vale la pena reintentar (respetando Retry-After)."""
+
+    def __init__(self, message: str, retry_after: str | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _is_transient(e: Exception) -> bool:
+    """Timeouts, errores de conexión y 429/5xx; lo demás (config, auth, 400) no se reintenta."""
+    if isinstance(e, (TransientEmbeddingError, requests.ConnectionError, requests.Timeout,
+                      httpx.TransportError)):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(e, openai.APIConnectionError):        # incluye APITimeoutError
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code in RETRY_STATUS
+
+
+def _retry_after(e: Exception) -> float:
+    value = getattr(e, "retry_after", None)
+    response = getattr(e, "response", None)
+    if value is None and response is not None:
+        value = response.headers.get("retry-after")
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _check_hf_response(status_code: int, text: str, headers) -> None:
+    if status_code in RETRY_STATUS:
+        raise TransientEmbeddingError(f"HuggingFace embedding HTTP {status_code}: {text}",
+                                      retry_after=headers.get("Retry-After"))
+    if status_code != 200:
+        raise RuntimeError(f"HuggingFace embedding error: {text}")
+
+
 # ============================
 # HUGGINGFACE INFERENCE API
 # ============================
-def _hf_embed(texts: list[str]) -> list[list[float]]:
+def _hf_request(texts: list[str]) -> tuple[str, dict, dict]:
+    """URL, headers y payload del endpoint de embeddings de HF."""
     if settings.HF_INFERENCE_API_KEY is None or settings.HF_MODEL is None:
         raise RuntimeError("Faltan variables HF: HF_INFERENCE_API_KEY o HF_MODEL")
 
@@ -42,12 +105,25 @@ def _hf_embed(texts: list[str]) -> list[list[float]]:
 
     headers = {"Authorization": f"Bearer {settings.HF_INFERENCE_API_KEY}"}
 
+    return url, headers, {"inputs": texts}
+
+
+def _hf_embed(texts: list[str]) -> list[list[float]]:
+    url, headers, payload = _hf_request(texts)
+
     logger.info(f"🔹 Usando HuggingFace Inference API para embeddings: {settings.HF_MODEL}")
 
-    response = requests.post(url, headers=headers, json={"inputs": texts})
+    response = request_with_retry("hf", "POST", url, headers=headers, json=payload, retries=0)
+    _check_hf_response(response.status_code, response.text, response.headers)
+
+    return response.json()
+
+
+async def _hf_embed_async(texts: list[str]) -> list[list[float]]:
+    url, headers, payload = _hf_request(texts)
 
-    if response.status_code != 200:
-        raise RuntimeError(f"HuggingFace embedding error: {response.text}")
+    response = await arequest_with_retry("hf", "POST", url, headers=headers, json=payload, retries=0)
+    _check_hf_response(response.status_code, response.text, response.headers)
 
     return response.json()
 
@@ -59,48 +135,352 @@ def _openai_embed(texts: list[str]) -> list[list[float]]:
     if settings.OPENAI_API_KEY is None:
         raise RuntimeError("OPENAI_API_KEY no configurada.")
 
-    import openai
-    openai.api_key = settings.OPENAI_API_KEY
+    client = get_openai_client().with_options(max_retries=0)
 
-    logger.info("🔹 Usando OpenAI embeddings (text-embedding-3-large)")
+    logger.info(f"🔹 Usando OpenAI embeddings ({settings.OPENAI_EMB_MODEL})")
+
+    with limit("openai"):
+        response = client.embeddings.create(
+            model=settings.OPENAI_EMB_MODEL,
+            input=texts
+        )
+
+    return [item.embedding for item in response.data]
 
-    response = openai.embeddings.create(
-        model="text-embedding-3-large",
-        input=texts
-    )
+
+async def _openai_embed_async(texts: list[str]) -> list[list[float]]:
+    if settings.OPENAI_API_KEY is None:
+        raise RuntimeError("OPENAI_API_KEY no configurada.")
+
+    client = get_async_openai_client().with_options(max_retries=0)
+
+    async with alimit("openai"):
+        response = await client.embeddings.create(
+            model=settings.OPENAI_EMB_MODEL,
+            input=texts
+        )
 
     return [item.embedding for item in response.data]
 
 
+# ============================
+# MOTOR DE LOTES
+# ============================
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Pool compartido para lotes remotos (HF / OpenAI).
+    Se comparte entre llamadas para acotar la concurrencia total.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.EMB_MAX_WORKERS),
+                thread_name_prefix="emb-batch"
+            )
+    return _executor
+
+
+def _estimate_tokens(text: str) -> int:
+    """Aproximación barata: ~4 caracteres por token."""
+    return len(text) // 4 + 1
+
+
+def _batch_limits(provider: str) -> tuple[int, int | None]:
+    """
+    Devuelve (máx. textos, máx. tokens) por lote para el proveedor.
+    None en tokens = sin límite de tokens.
+    """
+    if provider == "hf":
+        return settings.EMB_BATCH_SIZE_HF, settings.EMB_BATCH_TOKENS_HF
+    if provider == "openai":
+        return settings.EMB_BATCH_SIZE_OPENAI, settings.EMB_BATCH_TOKENS_OPENAI
+    return settings.EMB_BATCH_SIZE_LOCAL, None
+
+
+def make_batches(
+    texts: list[str],
+    max_items: int,
+    max_tokens: int | None = None
+) -> list[tuple[int, int]]:
+    """
+    Parte la lista en rangos [inicio, fin) respetando el máximo de textos
+    y (opcionalmente) de tokens por lote. Un texto que por sí solo supera
+    el límite de tokens va en su propio lote.
+    """
+    batches = []
+    start = 0
+    tokens = 0
+
+    for i, text in enumerate(texts):
+        t = _estimate_tokens(text)
+        full = (i - start) >= max_items
+        too_big = max_tokens is not None and i > start and tokens + t > max_tokens
+
+        if full or too_big:
+            batches.append((start, i))
+            start, tokens = i, 0
+
+        tokens += t
+
+    if start < len(texts):
+        batches.append((start, len(texts)))
+
+    return batches
+
+
+def _check_length(vectors: list, batch: list[str]):
+    if len(vectors) != len(batch):
+        raise RuntimeError(f"El proveedor devolvió {len(vectors)} vectores para {len(batch)} textos")
+
+
+def _retry_wait(e: Exception, attempt: int, attempts: int, provider: str, batch_no: int) -> float:
+    """Espera antes del siguiente intento; relanza si el error no es transitorio o no quedan intentos."""
+    if not _is_transient(e):
+        logger.error(f"❌ Lote {batch_no} ({provider}) falló (error no reintentable): {e}")
+        raise e
+    if attempt == attempts:
+        logger.error(f"❌ Lote {batch_no} ({provider}) falló tras {attempts} intentos: {e}")
+        raise e
+
+    wait = max(settings.EMB_RETRY_BACKOFF * (2 ** (attempt - 1)), _retry_after(e))
+    logger.warning(
+        f"⚠️ Lote {batch_no} ({provider}) falló (intento {attempt}/{attempts}): {e}. "
+        f"Reintentando en {wait:.1f}s"
+    )
+    return wait
+
+
+def _embed_batch_with_retry(fn, batch: list[str], provider: str, batch_no: int) -> list[list[float]]:
+    """
+    Embebe un lote reintentando solo ese lote, con backoff exponencial,
+    ante errores transitorios (timeouts, conexión, 429/5xx). Los demás
+    (credenciales faltantes, 401/400, respuesta inconsistente) se
+    propagan de inmediato.
+    """
+    attempts = max(1, settings.EMB_MAX_RETRIES)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            vectors = fn(batch)
+        except Exception as e:
+            time.sleep(_retry_wait(e, attempt, attempts, provider, batch_no))
+            continue
+        _check_length(vectors, batch)
+        return vectors
+
+
+def _stack(parts: list) -> np.ndarray:
+    """Lotes de vectores (listas del JSON) → matriz float32 contigua (n, dim)."""
+    return np.vstack([np.asarray(p, dtype=np.float32) for p in parts])
+
+
+def _embed_remote(fn, texts: list[str], provider: str) -> np.ndarray:
+    """
+    Divide en lotes, los envía en paralelo sobre el pool acotado
+    y reconstruye el resultado en el orden original (matriz float32).
+    """
+    max_items, max_tokens = _batch_limits(provider)
+    batches = make_batches(texts, max_items, max_tokens)
+
+    logger.info(f"🔸 {len(texts)} textos → {len(batches)} lotes ({provider})")
+
+    if len(batches) == 1:
+        return _stack([_embed_batch_with_retry(fn, texts, provider, 0)])
+
+    executor = _get_executor()
+    futures = [
+        executor.submit(_embed_batch_with_retry, fn, texts[a:b], provider, n)
+        for n, (a, b) in enumerate(batches)
+    ]
+
+    return _stack([fut.result() for fut in futures])
+
+
+async def _embed_batch_with_retry_async(fn, batch: list[str], provider: str,
+                                       batch_no: int) -> list[list[float]]:
+    """Versión async de _embed_batch_with_retry (sin bloquear el event loop)."""
+    attempts = max(1, settings.EMB_MAX_RETRIES)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            vectors = await fn(batch)
+        except Exception as e:
+            await asyncio.sleep(_retry_wait(e, attempt, attempts, provider, batch_no))
+            continue
+        _check_length(vectors, batch)
+        return vectors
+
+
+async def _embed_remote_async(fn, texts: list[str], provider: str) -> np.ndarray:
+    """
+    Igual que _embed_remote, con los lotes como corrutinas concurrentes.
+    La concurrencia real la acota el semáforo async del proveedor.
+    """
+    max_items, max_tokens = _batch_limits(provider)
+    batches = make_batches(texts, max_items, max_tokens)
+
+    parts = await asyncio.gather(*[
+        _embed_batch_with_retry_async(fn, texts[a:b], provider, n)
+        for n, (a, b) in enumerate(batches)
+    ])
+
+    return _stack(parts)
+
+
 # ============================
 # INTERFAZ PRINCIPAL
 # ============================
-def embed_texts(texts: list[str], provider: str | None = None) -> list[list[float]]:
+def _model_name(provider: str) -> str:
+    """Modelo efectivo por proveedor (forma parte de la clave de caché)."""
+    if provider == "hf":
+        return settings.HF_MODEL or ""
+    if provider == "openai":
+        return settings.OPENAI_EMB_MODEL
+    return settings.EMB_MODEL
+
+
+def _compute_embeddings(texts: list[str], provider: str) -> np.ndarray:
+    if provider == "sentence_transformers":
+        model = _load_local_model()
+        if model is None:
+            raise RuntimeError("Modelo local no disponible.")
+        vectors = model.encode(
+            texts,
+            batch_size=settings.EMB_BATCH_SIZE_LOCAL,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    elif provider == "hf":
+        return _embed_remote(_hf_embed, texts, provider)
+
+    elif provider == "openai":
+        return _embed_remote(_openai_embed, texts, provider)
+
+    else:
+        raise ValueError(f"Proveedor de embeddings desconocido: {provider}")
+
+
+async def _compute_embeddings_async(texts: list[str], provider: str) -> np.ndarray:
+    if provider == "hf":
+        return await _embed_remote_async(_hf_embed_async, texts, provider)
+    if provider == "openai":
+        return await _embed_remote_async(_openai_embed_async, texts, provider)
+    # Modelo local: cómputo CPU fuera del event loop
+    return await asyncio.to_thread(_compute_embeddings, texts, provider)
+
+
+def _lookup_cache(cache, provider: str, texts: list[str]):
+    """
+    Consulta la caché. Devuelve (modelo, claves, vectores con None en
+    los faltantes, faltantes sin duplicados {clave: texto}).
+    """
+    model = _model_name(provider)
+    keys = [cache_key(provider, model, t) for t in texts]
+    vectors = cache.get_many(keys)
+
+    missing: dict[str, str] = {}
+    for key, text, vec in zip(keys, texts, vectors):
+        if vec is None and key not in missing:
+            missing[key] = text
+
+    return model, keys, vectors, missing
+
+
+def _merge_computed(keys: list[str], vectors: list, missing: dict, computed: np.ndarray) -> np.ndarray:
+    """Filas de caché + matriz calculada → matriz (len(keys), dim) en orden."""
+    if len(missing) == len(keys):
+        return computed   # nada en caché ni duplicados: ya está en orden
+
+    dim = computed.shape[1] if len(computed) else len(next(v for v in vectors if v is not None))
+    out = np.empty((len(keys), dim), dtype=np.float32)
+    row_of = {k: i for i, k in enumerate(missing)}
+    for i, (key, vec) in enumerate(zip(keys, vectors)):
+        out[i] = vec if vec is not None else computed[row_of[key]]
+    return out
+
+
+def _empty(dtype) -> np.ndarray:
+    return np.empty((0, 0), dtype=dtype)
+
+
+def embed_array(texts: list[str], provider: str | None = None, dtype=np.float32) -> np.ndarray:
     """
-    Devuelve lista de embeddings.
+    Embeddings como matriz contigua (len(texts), dim), en el orden de `texts`.
     provider puede ser:
         - "sentence_transformers"
         - "hf"
         - "openai"
         - None → usa EMB_PROVIDER del .env
+
+    Primero se consulta la caché (provider, modelo, hash del texto); solo
+    los textos ausentes se envían al proveedor, divididos en lotes que se
+    procesan en paralelo y se reintentan de forma independiente.
+
+    dtype=np.float16 reduce a la mitad la memoria del resultado; el cálculo
+    y la caché en memoria siguen en float32.
     """
 
     provider = provider or settings.EMB_PROVIDER
 
     logger.info(f"🔸 Embeddings Provider Seleccionado: {provider}")
 
-    if provider == "sentence_transformers":
-        model = _load_local_model()
-        if model is None:
-            raise RuntimeError("Modelo local no disponible.")
-        vectors = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-        return vectors.tolist()
+    if not texts:
+        return _empty(dtype)
 
-    elif provider == "hf":
-        return _hf_embed(texts)
+    cache = get_embedding_cache()
+    if cache is None:
+        return _compute_embeddings(texts, provider).astype(dtype, copy=False)
 
-    elif provider == "openai":
-        return _openai_embed(texts)
+    model, keys, vectors, missing = _lookup_cache(cache, provider, texts)
+    cached = len(texts) - sum(1 for v in vectors if v is None)
 
+    if missing:
+        computed = _compute_embeddings(list(missing.values()), provider)
+        cache.put_many(provider, model, list(missing.keys()), computed)
     else:
-        raise ValueError(f"Proveedor de embeddings desconocido: {provider}")
+        computed = np.empty((0, 0), dtype=np.float32)
+
+    logger.info(f"🗄️ Embeddings desde caché: {cached}/{len(texts)}")
+
+    return _merge_computed(keys, vectors, missing, computed).astype(dtype, copy=False)
+
+
+async def embed_array_async(texts: list[str], provider: str | None = None, dtype=np.float32) -> np.ndarray:
+    """
+    Versión async de embed_array para el camino de consulta: HF y OpenAI
+    usan clientes async; el modelo local y la caché SQLite corren en hilos.
+    """
+    provider = provider or settings.EMB_PROVIDER
+
+    if not texts:
+        return _empty(dtype)
+
+    cache = get_embedding_cache()
+    if cache is None:
+        return (await _compute_embeddings_async(texts, provider)).astype(dtype, copy=False)
+
+    model, keys, vectors, missing = await asyncio.to_thread(_lookup_cache, cache, provider, texts)
+
+    if missing:
+        computed = await _compute_embeddings_async(list(missing.values()), provider)
+        await asyncio.to_thread(cache.put_many, provider, model, list(missing.keys()), computed)
+    else:
+        computed = np.empty((0, 0), dtype=np.float32)
+
+    return _merge_computed(keys, vectors, missing, computed).astype(dtype, copy=False)
+
+
+def embed_texts(texts: list[str], provider: str | None = None) -> list[list[float]]:
+    """Como embed_array, pero devuelve listas (para código que aún las espera)."""
+    return embed_array(texts, provider=provider).tolist()
+
+
+async def embed_texts_async(texts: list[str], provider: str | None = None) -> list[list[float]]:
+    return (await embed_array_async(texts, provider=provider)).tolist()
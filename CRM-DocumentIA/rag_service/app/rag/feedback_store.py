@@ -0,0 +1,238 @@
+# app/rag/feedback_store.py
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Ventanas fijas del resumen de /feedback/stats
+WINDOWS = {"24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+BUCKETS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+
+def _accuracy(total: int, correct: int) -> dict:
+    return {
+        "total": total,
+        "correct": correct,
+        "accuracy": round(correct / total, 4) if total else None,
+    }
+
+
+# ============================
+# STORE DE FEEDBACK
+# ============================
+class FeedbackStore:
+    """
+    Feedback de usuarios en SQLite (WAL), solo inserciones:
+      - escribir es O(1) (un INSERT), sin reescribir el historial,
+      - escrituras concurrentes no pierden entradas (una conexión, con lock),
+      - las estadísticas por ventana se resuelven con un índice que cubre
+        (ts, doc_type, provider, correct): no se leen preguntas ni respuestas;
+        el total histórico sale de feedback_totals (mantenida por trigger).
+    """
+
+    def __init__(self, path: Path, legacy_log: Optional[Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")   # WAL: durable salvo corte de energía
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feedback (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                comment TEXT,
+                doc_type TEXT,
+                provider TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_feedback_stats ON feedback (ts, doc_type, provider, correct)"
+        )
+        # Totales históricos por (doc_type, provider), mantenidos en la misma
+        # transacción del INSERT: el total no recorre la tabla ('' = sin valor)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feedback_totals (
+                doc_type TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                PRIMARY KEY (doc_type, provider)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS feedback_totals_insert AFTER INSERT ON feedback
+            BEGIN
+                INSERT INTO feedback_totals (doc_type, provider, total, correct)
+                VALUES (COALESCE(NEW.doc_type, ''), COALESCE(NEW.provider, ''), 1, NEW.correct)
+                ON CONFLICT (doc_type, provider) DO UPDATE
+                SET total = total + 1, correct = correct + excluded.correct;
+            END
+            """
+        )
+        self._conn.commit()
+
+        if legacy_log is not None:
+            self._import_legacy(Path(legacy_log))
+
+    def _import_legacy(self, legacy_log: Path):
+        """Importa feedback_log.json (formato anterior) si la tabla está vacía."""
+        if not legacy_log.exists():
+            return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM feedback LIMIT 1").fetchone():
+                return
+        try:
+            entries = json.loads(legacy_log.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer {legacy_log}: {e}")
+            return
+
+        rows = []
+        for e in entries:
+            try:
+                ts = time.mktime(time.strptime(e["timestamp"], "%Y-%m-%d %H:%M:%S"))
+            except (KeyError, ValueError):
+                ts = legacy_log.stat().st_mtime
+            rows.append((ts, e.get("question", ""), e.get("answer", ""), int(bool(e.get("correct"))),
+                         e.get("comment"), e.get("doc_type"), e.get("provider")))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO feedback (ts, question, answer, correct, comment, doc_type, provider) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        logger.info(f"📥 Importadas {len(rows)} entradas de feedback desde {legacy_log}")
+
+    def add(self, question: str, answer: str, correct: bool, comment: Optional[str] = None,
+            doc_type: Optional[str] = None, provider: Optional[str] = None,
+            ts: Optional[float] = None) -> int:
+        """Inserta una entrada y devuelve su id (= total de entradas, no hay borrados)."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO feedback (ts, question, answer, correct, comment, doc_type, provider) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ts or time.time(), question, answer, int(correct), comment, doc_type, provider)
+            )
+        return cur.lastrowid
+
+    # ---------- estadísticas ----------
+    def _where(self, since: Optional[float], doc_type: Optional[str], provider: Optional[str]):
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if doc_type is not None:
+            clauses.append("doc_type IS ?")
+            params.append(doc_type)
+        if provider is not None:
+            clauses.append("provider IS ?")
+            params.append(provider)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _grouped(self, column: str, where: str, params: list) -> list[dict]:
+        rows = self._conn.execute(
+            f"SELECT {column} AS k, COUNT(*), SUM(correct) FROM feedback{where} "
+            f"GROUP BY {column} ORDER BY COUNT(*) DESC", params
+        ).fetchall()
+        return [{column: r[0], **_accuracy(r[1], r[2] or 0)} for r in rows]
+
+    def stats(self, days: Optional[float] = 30, bucket: Optional[str] = "day",
+              doc_type: Optional[str] = None, provider: Optional[str] = None,
+              now: Optional[float] = None) -> dict:
+        """
+        Exactitud (correctas / total):
+          - windows   → últimas 24h / 7d / 30d y total histórico
+          - by_doc_type, by_provider, timeline → dentro de los últimos `days`
+            días (None = todo), la serie agrupada por `bucket`
+        `doc_type` / `provider` filtran todo el resultado.
+        """
+        if bucket is not None and bucket not in BUCKETS:
+            raise ValueError(f"bucket desconocido: {bucket} (opciones: {list(BUCKETS)})")
+
+        now = now or time.time()
+        since = now - days * 86400 if days is not None else None
+        where, params = self._where(since, doc_type, provider)
+        # Las ventanas solo recorren el rango de la más larga (índice por ts)
+        where_win, params_win = self._where(now - max(WINDOWS.values()), doc_type, provider)
+
+        window_cols = ", ".join(
+            f"SUM(ts >= {now - secs}), SUM(CASE WHEN ts >= {now - secs} THEN correct ELSE 0 END)"
+            for secs in WINDOWS.values()
+        )
+        totals_where, totals_params = [], []
+        for column, value in (("doc_type", doc_type), ("provider", provider)):
+            if value is not None:
+                totals_where.append(f"{column} = ?")
+                totals_params.append(value)
+
+        with self._lock:
+            totals = self._conn.execute(
+                "SELECT SUM(total), SUM(correct) FROM feedback_totals"
+                + (" WHERE " + " AND ".join(totals_where) if totals_where else ""), totals_params
+            ).fetchone()
+            row = self._conn.execute(
+                f"SELECT {window_cols} FROM feedback{where_win}", params_win
+            ).fetchone()
+            by_doc_type = self._grouped("doc_type", where, params)
+            by_provider = self._grouped("provider", where, params)
+
+            timeline = []
+            if bucket is not None:
+                size = BUCKETS[bucket]
+                for start, total, correct in self._conn.execute(
+                    f"SELECT CAST(ts / {size} AS INTEGER) * {size}, COUNT(*), SUM(correct) "
+                    f"FROM feedback{where} GROUP BY 1 ORDER BY 1", params
+                ):
+                    timeline.append({
+                        "start": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start)),
+                        **_accuracy(total, correct or 0),
+                    })
+
+        values = [v or 0 for v in row]
+        windows = {
+            name: _accuracy(values[2 * i], values[2 * i + 1])
+            for i, name in enumerate(WINDOWS)
+        }
+        windows["total"] = _accuracy(totals[0] or 0, totals[1] or 0)
+
+        return {
+            "filters": {"doc_type": doc_type, "provider": provider, "days": days, "bucket": bucket},
+            "windows": windows,
+            "by_doc_type": by_doc_type,
+            "by_provider": by_provider,
+            "timeline": timeline,
+        }
+
+
+# ============================
+# INSTANCIA GLOBAL (perezosa)
+# ============================
+_store: FeedbackStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_feedback_store() -> FeedbackStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = settings.FEEDBACK_DB or settings.STORAGE_DIR / "feedback.sqlite3"
+            _store = FeedbackStore(path, legacy_log=settings.STORAGE_DIR / "feedback_log.json")
+            logger.info(f"📝 Feedback en {path}")
+    return _store
@@ -0,0 +1,380 @@
+# app/rag/ingest_jobs.py
+
+import asyncio
+import json
+import multiprocessing
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.doc_registry import get_document_registry
+from app.rag.ingestion import ingest_file_to_pinecone
+
+# Estados posibles de un job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+# ================================================================
+# 🗄️ PERSISTENCIA DE JOBS (SQLite)
+# ================================================================
+class JobStore:
+    """
+    Guarda el estado de cada job de ingesta: etapas, tiempos y resultado.
+    Las etapas se guardan como JSON {nombre: {status, started_at, elapsed}}.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                provider TEXT,
+                source_name TEXT,
+                include_text INTEGER NOT NULL DEFAULT 0,
+                file_hash TEXT,
+                external_id TEXT,
+                current_stage TEXT,
+                stages TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ingest_jobs_created ON ingest_jobs(created_at)"
+        )
+        # Bases creadas antes de las opciones include_text / file_hash / external_id
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(ingest_jobs)")}
+        if "include_text" not in columns:
+            self._conn.execute("ALTER TABLE ingest_jobs ADD COLUMN include_text INTEGER NOT NULL DEFAULT 0")
+        if "file_hash" not in columns:
+            self._conn.execute("ALTER TABLE ingest_jobs ADD COLUMN file_hash TEXT")
+        if "external_id" not in columns:
+            self._conn.execute("ALTER TABLE ingest_jobs ADD COLUMN external_id TEXT")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ingest_jobs_hash ON ingest_jobs(file_hash, provider, status)"
+        )
+        self._conn.commit()
+
+    def create(self, file_path: str, filename: str, provider: str, source_name: str,
+               include_text: bool = False, file_hash: Optional[str] = None,
+               external_id: Optional[str] = None) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (id, status, filename, file_path, provider, source_name, "
+                "include_text, file_hash, external_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, filename, file_path, provider, source_name, int(include_text),
+                 file_hash, external_id, time.time())
+            )
+            self._conn.commit()
+        return job_id
+
+    def find_done(self, file_hash: str, provider: str, source_name: str,
+                  include_text: bool = False, external_id: Optional[str] = None) -> Optional[dict]:
+        """Último job terminado del mismo contenido, provider, origen y external_id."""
+        query = ("SELECT * FROM ingest_jobs WHERE file_hash = ? AND provider = ? AND status = ? "
+                 "AND source_name = ? AND external_id IS ?")
+        if include_text:
+            query += " AND include_text = 1"
+        with self._lock:
+            row = self._conn.execute(
+                query + " ORDER BY created_at DESC LIMIT 1",
+                (file_hash, provider, DONE, source_name, external_id)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def mark_running(self, job_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = ?, started_at = ? WHERE id = ?",
+                (RUNNING, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def update_stage(self, job_id: str, stage: str, status: str, elapsed: Optional[float]):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stages FROM ingest_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return
+
+            stages = json.loads(row["stages"])
+            info = stages.setdefault(stage, {})
+            info["status"] = status
+            if status == RUNNING:
+                info["started_at"] = time.time()
+            if elapsed is not None:
+                info["elapsed_seconds"] = elapsed
+
+            self._conn.execute(
+                "UPDATE ingest_jobs SET stages = ?, current_stage = ? WHERE id = ?",
+                (json.dumps(stages), stage, job_id)
+            )
+            self._conn.commit()
+
+    def finish(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingest_jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+                "current_stage = NULL WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id
+                )
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> list[dict]:
+        query = "SELECT * FROM ingest_jobs"
+        params: list = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_dict(r, include_result=False) for r in rows]
+
+    def pending(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM ingest_jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._to_dict(r, include_result=False) for r in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row, include_result: bool = True) -> dict:
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "provider": row["provider"],
+            "source_name": row["source_name"],
+            "include_text": bool(row["include_text"]),
+            "file_hash": row["file_hash"],
+            "external_id": row["external_id"],
+            "current_stage": row["current_stage"],
+            "stages": json.loads(row["stages"]),
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "elapsed_seconds": (
+                round(row["finished_at"] - row["started_at"], 2)
+                if row["finished_at"] and row["started_at"] else None
+            ),
+            "file_path": row["file_path"],
+        }
+        if include_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+
+# ================================================================
+# ⚙️ EJECUCIÓN (pool de jobs + pool de procesos para CPU)
+# ================================================================
+_store: Optional[JobStore] = None
+_job_executor: Optional[ThreadPoolExecutor] = None
+_cpu_executor: Optional[ProcessPoolExecutor] = None
+_futures: dict[str, Future] = {}
+_init_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _store
+    with _init_lock:
+        if _store is None:
+            path = settings.INGEST_JOBS_DB or settings.STORAGE_DIR / "ingest_jobs.sqlite3"
+            _store = JobStore(path)
+    return _store
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_executors() -> tuple[ThreadPoolExecutor, ProcessPoolExecutor]:
+    global _job_executor, _cpu_executor
+    with _init_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.INGEST_WORKERS),
+                thread_name_prefix="ingest-job"
+            )
+        if _cpu_executor is None:
+            # Sin fork: el proceso ya tiene hilos y conexiones SQLite abiertas
+            # y un hijo forkeado podría heredar un lock tomado.
+            _cpu_executor = ProcessPoolExecutor(
+                max_workers=max(1, settings.INGEST_CPU_WORKERS),
+                mp_context=_mp_context(),
+            )
+    return _job_executor, _cpu_executor
+
+
+def get_cpu_executor() -> ProcessPoolExecutor:
+    """Pool de procesos de extracción (compartido con la ingesta masiva)."""
+    return _get_executors()[1]
+
+
+def _run_job(job_id: str, file_path: str, provider: str, source_name: str,
+             include_text: bool = False, filename: Optional[str] = None,
+             external_id: Optional[str] = None) -> dict:
+    store = get_job_store()
+    _, cpu_executor = _get_executors()
+
+    store.mark_running(job_id)
+    logger.info(f"🚚 Job de ingesta {job_id} iniciado: {file_path}")
+
+    try:
+        result = ingest_file_to_pinecone(
+            file_path,
+            source_name=source_name,
+            provider=provider,
+            on_stage=lambda stage, status, elapsed: store.update_stage(job_id, stage, status, elapsed),
+            cpu_executor=cpu_executor,
+            include_text=include_text,
+            filename=filename,
+            external_id=external_id,
+        )
+    except Exception as e:
+        logger.error(f"❌ Job de ingesta {job_id} falló: {e}")
+        store.finish(job_id, FAILED, error=str(e))
+        raise
+
+    if result.get("status") == "ok":
+        store.finish(job_id, DONE, result=result)
+    else:
+        store.finish(job_id, FAILED, result=result, error=result.get("error"))
+
+    logger.info(f"🏁 Job de ingesta {job_id} terminado: {result.get('status')}")
+    return result
+
+
+def _dispatch(job_id: str, file_path: str, provider: str, source_name: str,
+              include_text: bool = False, filename: Optional[str] = None,
+              external_id: Optional[str] = None) -> Future:
+    job_executor, _ = _get_executors()
+    fut = job_executor.submit(_run_job, job_id, file_path, provider, source_name, include_text,
+                              filename, external_id)
+    _futures[job_id] = fut
+    fut.add_done_callback(lambda _: _futures.pop(job_id, None))
+    return fut
+
+
+# ================================================================
+# 🔌 API PÚBLICA
+# ================================================================
+def submit_ingest_job(file_path: str, filename: str, provider: str, source_name: str,
+                      include_text: bool = False, file_hash: Optional[str] = None,
+                      external_id: Optional[str] = None) -> str:
+    """
+    Registra el job y lo encola; devuelve el job_id de inmediato.
+    include_text: guardar el texto completo en el resultado.
+    file_hash: SHA-256 del contenido (para find_cached_ingest).
+    external_id: id estable del documento en el cliente (reemplaza su versión anterior).
+    """
+    store = get_job_store()
+    job_id = store.create(file_path, filename, provider, source_name, include_text, file_hash,
+                          external_id)
+    _dispatch(job_id, file_path, provider, source_name, include_text, filename, external_id)
+    logger.info(f"📥 Job de ingesta {job_id} encolado ({filename}, provider={provider})")
+    return job_id
+
+
+def find_cached_ingest(file_hash: str, provider: str, source_name: str,
+                       include_text: bool = False, external_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Job terminado con el mismo contenido, provider, origen y external_id,
+    si su resultado sigue vigente: con ingesta incremental, el documento
+    debe seguir registrado con esa misma huella (una versión posterior con
+    el mismo external_id lo habría reemplazado en el índice).
+    """
+    job = get_job_store().find_done(file_hash, provider, source_name, include_text, external_id)
+    if job is None or not job["result"]:
+        return None
+
+    registry = get_document_registry()
+    if registry is not None:
+        current = registry.get(job["result"].get("document_id", ""))
+        if current is None or current["file_hash"] != file_hash:
+            return None
+    return job
+
+
+async def wait_for_job(job_id: str) -> dict:
+    """Espera un job sin bloquear el event loop y devuelve su resultado."""
+    fut = _futures.get(job_id)
+    if fut is not None:
+        try:
+            await asyncio.wrap_future(fut)
+        except Exception:
+            pass  # el error ya quedó guardado en el job
+    return get_job_store().get(job_id)
+
+
+def resume_pending_jobs() -> int:
+    """
+    Re-encola los jobs que quedaron en cola o a medias tras un reinicio.
+    """
+    store = get_job_store()
+    pending = store.pending()
+
+    for job in pending:
+        if not Path(job["file_path"]).exists():
+            store.finish(job["job_id"], FAILED, error="file_not_found")
+            continue
+        _dispatch(job["job_id"], job["file_path"], job["provider"], job["source_name"],
+                  job["include_text"], job["filename"], job["external_id"])
+
+    if pending:
+        logger.info(f"🔁 {len(pending)} jobs de ingesta re-encolados")
+    return len(pending)
+
+
+def shutdown():
+    """Cierra los pools (para el evento shutdown de FastAPI)."""
+    global _job_executor, _cpu_executor
+    with _init_lock:
+        if _job_executor is not None:
+            _job_executor.shutdown(wait=False, cancel_futures=True)
+            _job_executor = None
+        if _cpu_executor is not None:
+            _cpu_executor.shutdown(wait=False, cancel_futures=True)
+            _cpu_executor = None
@@ -1,41 +1,188 @@
 # app/rag/ingestion.py
+import itertools
 import os
+import tempfile
+import threading
 import uuid
 import time
-from typing import Tuple
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 
 from app.core.config import settings
 from app.core.logger import logger
 
-from app.utils.text_extract import extract_text
-from app.utils.chunker import chunk_text
-from app.utils.pdf_utils import analyze_pdf_images
+from app.utils.text_extract import (
+    extract_text, clean_text, iter_excel_rows, spool_excel_rows, read_spooled_rows
+)
+from app.utils.chunker import chunk_stream, chunk_rows
+from app.utils.pdf_utils import iter_pdf_pages
 
-from app.rag.embeddings import embed_texts
+from app.rag.embeddings import embed_array
 from app.rag.llm_router import generate_summary   # NUEVO
+from app.rag.query_cache import invalidate_retrieval
+from app.rag.doc_classifier import DOC_PATTERNS, classify_document, detect_document_type  # noqa: F401 (compat)
+from app.rag.doc_registry import (
+    get_document_registry, document_id_for,
+    file_fingerprint, text_fingerprint, chunk_fingerprint, metadata_fingerprint
+)
 
-from app.vectorstore.pinecone_client import create_index, upsert_vectors
+from app.vectorstore.bm25_index import get_lexical_index
+from app.vectorstore.helpers import generate_chunk_id
+from app.vectorstore.store import create_index, upsert_vectors, delete_vectors, update_metadata
 
 # ------------------------------
-# Patrones de detección de tipo
+# Seguimiento de etapas
 # ------------------------------
-DOC_PATTERNS = {
-    "contrato": ["contrato", "contratante", "contratista", "cláusula", "clausula", "honorarios"],
-    "correo": ["asunto:", "estimado", "saludos", "atentamente", "from:", "para:"],
-    "factura": ["factura", "subtotal", "iva", "valor total", "nit", "número de factura"],
-    "propuesta": ["propuesta", "cotización", "alcance", "entregables"],
-    "pqr": ["petición", "queja", "reclamo", "pqrs"],
-    "acta": ["acta", "reunión", "acuerdos", "asistentes", "orden del día"]
-}
+StageCallback = Callable[[str, str, Optional[float]], None]
 
-def detect_document_type(text: str) -> str:
-    t = text.lower()
-    scores = {k: sum(1 for kw in kws if kw in t) for k, kws in DOC_PATTERNS.items()}
-    best = max(scores, key=scores.get)
 
-    if scores[best] == 0 or list(scores.values()).count(scores[best]) > 1:
-        return "documento"
-    return best
+class _StageTimes:
+    """
+    Tiempo acumulado por etapa cuando las etapas se intercalan (streaming).
+    Las etapas anidadas no se cuentan dos veces: al entrar en una, la
+    exterior queda en pausa. Notifica "running" la primera vez que se
+    entra en cada etapa y "done" al llamar a finish().
+    """
+
+    def __init__(self, on_stage: Optional[StageCallback]):
+        self.on_stage = on_stage
+        self.totals: dict[str, float] = {}
+        self._stack: list[str] = []
+        self._started: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _notify(self, name: str, status: str, elapsed: Optional[float]):
+        if self.on_stage:
+            self.on_stage(name, status, elapsed)
+
+    def _open(self, name: str):
+        if name not in self.totals:
+            self.totals[name] = 0.0
+            self._notify(name, "running", None)
+
+    @contextmanager
+    def track(self, name: str):
+        now = time.time()
+        with self._lock:
+            self._open(name)
+            if self._stack:
+                outer = self._stack[-1]
+                self.totals[outer] += now - self._started[outer]
+            self._stack.append(name)
+            self._started[name] = now
+        try:
+            yield
+        except Exception:
+            self._close()
+            self._notify(name, "error", round(self.totals[name], 3))
+            raise
+        self._close()
+
+    def _close(self):
+        now = time.time()
+        with self._lock:
+            name = self._stack.pop()
+            self.totals[name] += now - self._started[name]
+            if self._stack:
+                self._started[self._stack[-1]] = now
+
+    def add(self, name: str, seconds: float):
+        """Tiempo medido fuera de la pila (p. ej. en otro hilo)."""
+        with self._lock:
+            self._open(name)
+            self.totals[name] += seconds
+
+    def finish(self):
+        for name, total in self.totals.items():
+            self._notify(name, "done", round(total, 3))
+
+
+def _timed(iterable: Iterable, stages: _StageTimes, name: str) -> Iterator:
+    """Cuenta el tiempo de producir cada elemento como etapa `name`."""
+    it = iter(iterable)
+    while True:
+        with stages.track(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+def _take_head(items: Iterator, size: Callable = len) -> list:
+    """Consume elementos de `items` hasta sumar INGEST_PREFIX_CHARS caracteres."""
+    head = []
+    chars = 0
+    for item in items:
+        head.append(item)
+        chars += size(item)
+        if chars >= settings.INGEST_PREFIX_CHARS:
+            break
+    return head
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_document(file_path: str, executor=None) -> Iterator[Tuple[str, list]]:
+    """
+    Genera (texto limpio, imágenes) por segmento: página a página en PDF
+    (una sola pasada; con `executor` las páginas de los PDF largos se
+    reparten en ese pool) y el documento completo en los demás formatos.
+    """
+    if not file_path.lower().endswith(".pdf"):
+        yield _run_cpu(executor, extract_text, file_path), []
+        return
+
+    pages = iter_pdf_pages(file_path, executor=executor)
+    try:
+        first = next(pages, None)
+    except Exception as e:
+        logger.error(f"❌ Error procesando PDF {file_path}: {e}")
+        return
+
+    if first is None:
+        return
+    yield clean_text(first["text"]), first["images"]
+    for page in pages:
+        yield clean_text(page["text"]), page["images"]
+
+
+def iter_sheet_rows(file_path: str, executor=None) -> Iterator[Tuple[str, int, str]]:
+    """
+    Filas (hoja, número, texto) de un XLSX. Con `executor` el parseo corre
+    en ese pool de procesos y las filas vuelven por un archivo temporal
+    (un generador no cruza procesos); sin él, en streaming en línea.
+    """
+    limits = (settings.XLSX_MAX_ROWS_PER_SHEET, settings.XLSX_MAX_CELLS_PER_ROW)
+    if executor is None:
+        yield from iter_excel_rows(file_path, *limits)
+        return
+
+    fd, spool = tempfile.mkstemp(prefix="xlsx-rows-", suffix=".jsonl")
+    os.close(fd)
+    try:
+        _run_cpu(executor, spool_excel_rows, file_path, spool, *limits)
+        yield from read_spooled_rows(spool)
+    finally:
+        os.remove(spool)
+
+
+def _run_cpu(cpu_executor, fn, *args):
+    """Ejecuta fn en el pool de procesos si existe; si no, en línea."""
+    if cpu_executor is None:
+        return fn(*args)
+    return cpu_executor.submit(fn, *args).result()
 
 
 # ================================================================
@@ -46,6 +193,14 @@ def ingest_file_to_pinecone(
     source_name: str = "upload",
     chunk_size: int = 500,
     provider: str = None,          # <--- NUEVO
+    on_stage: Optional[StageCallback] = None,
+    cpu_executor=None,
+    include_text: bool = False,
+    filename: Optional[str] = None,
+    summarize: bool = True,
+    embed: Optional[Callable] = None,
+    upsert: Optional[Callable] = None,
+    external_id: Optional[str] = None,
 ) -> dict:
 
     """
@@ -53,92 +208,295 @@ def ingest_file_to_pinecone(
       - 'hf'      → Embeddings HF + LLM HF
       - 'openai'  → Embeddings OpenAI + LLM OpenAI
       - 'local'   → SentenceTransformers + LLM según settings (HF u OpenAI)
+
+    Pipeline en streaming: páginas → texto → chunks → lotes de embeddings
+    → lotes de upsert. Cada etapa consume a la anterior con buffers
+    acotados (ventana del chunker, INGEST_EMBED_BATCH chunks por lote,
+    INGEST_PIPELINE_DEPTH upserts en vuelo), así la memoria no crece con
+    el tamaño del documento. El tipo de documento y el resumen se
+    calculan sobre los primeros INGEST_PREFIX_CHARS caracteres.
+
+    Cada ingesta crea un documento nuevo, salvo que el cliente indique
+    `external_id` (id estable del documento en su sistema, p. ej. el del
+    CRM): entonces el document_id sale de (provider, origen, external_id)
+    y, con INGEST_INCREMENTAL, la ingesta reemplaza a la versión anterior
+    de ese documento: solo se embeben los chunks nuevos o modificados
+    (ids derivados del contenido), los que no cambiaron de texto pero sí
+    de posición o de archivo reciben solo su metadata nueva, y se borran
+    del índice los que ya no existen.
+
+    on_stage: callback opcional para reportar progreso por etapa.
+    cpu_executor: pool de procesos opcional para la extracción.
+    include_text: devuelve el texto completo en "contenido_extraido"
+    (única opción que acumula el documento en memoria).
+    filename: nombre lógico del documento (por defecto, el del archivo).
+    summarize: False omite el resumen LLM (se usa el inicio del texto).
+    embed / upsert: reemplazan embed_array(textos, provider) y el upsert
+    al índice (p. ej. por lotes compartidos entre archivos en bulk_ingest).
     """
 
     logger.info(f"Iniciando ingesta [{provider}] : {file_path}")
-    start_t = time.time()
 
     if not os.path.exists(file_path):
         return {"status": "error", "error": "file_not_found", "msg": f"No existe: {file_path}"}
 
-    # ------------------------------
-    # 1) EXTRAER TEXTO
-    # ------------------------------
-    text = extract_text(file_path)
-    if not text.strip():
-        return {"status": "error", "error": "no_text_extracted"}
+    filename = filename or os.path.basename(file_path)
+    registry = get_document_registry()
+    options = dict(
+        source_name=source_name, chunk_size=chunk_size, provider=provider, on_stage=on_stage,
+        cpu_executor=cpu_executor, include_text=include_text, summarize=summarize,
+        embed=embed or embed_array,
+        upsert=upsert or (lambda items: upsert_vectors(settings.PINECONE_INDEX, items)),
+    )
+
+    if registry is None or external_id is None:
+        # Sin id del cliente no se puede saber si es "el mismo" documento
+        # (el nombre de archivo no basta): documento nuevo, no se reemplaza nada
+        return _ingest(file_path, filename, str(uuid.uuid4()), registry, **options)
+
+    document_id = document_id_for(source_name, external_id, provider)
+    with registry.locked(document_id):
+        return _ingest(file_path, filename, document_id, registry, **options)
+
+
+def _chunk_ids(document_id: str, doc_type: str, batch: list[str], occurrences: Counter) -> list[str]:
+    """Ids por contenido; los chunks repetidos se distinguen por ocurrencia."""
+    ids = []
+    for chunk in batch:
+        fp = chunk_fingerprint(chunk, doc_type)
+        occurrences[fp] += 1
+        n = occurrences[fp]
+        ids.append(generate_chunk_id(document_id, fp if n == 1 else f"{fp}-{n}"))
+    return ids
 
-    filename = os.path.basename(file_path)
+
+def _ingest(file_path: str, filename: str, document_id: str, registry, source_name: str,
+            chunk_size: int, provider: str, on_stage: Optional[StageCallback],
+            cpu_executor, include_text: bool, summarize: bool,
+            embed: Callable, upsert: Callable) -> dict:
+    start_t = time.time()
     filesize = os.path.getsize(file_path)
-    doc_type = detect_document_type(text)
-    document_id = str(uuid.uuid4())
+    stages = _StageTimes(on_stage)
+
+    previous = registry.get(document_id) if registry else None
+    previous_chunks = registry.chunk_states(document_id) if previous else {}
+    file_hash = file_fingerprint(file_path)
 
     # ------------------------------
-    # 2) ANALIZAR IMÁGENES (PDF)
+    # 1) EXTRAER TEXTO (+ IMÁGENES EN PDF, MISMA PASADA)
     # ------------------------------
-    num_images = 0
     images_meta = []
-    if filename.lower().endswith(".pdf"):
+    full_text = [] if include_text else None
+    extracted_chars = 0
+
+    def texts():
+        nonlocal extracted_chars
+        for text, images in _timed(iter_document(file_path, executor=cpu_executor), stages, "extract"):
+            images_meta.extend(images)
+            extracted_chars += len(text)
+            if full_text is not None:
+                full_text.append(text)
+            yield text
+
+    def rows():
+        nonlocal extracted_chars
+        it = _timed(iter_sheet_rows(file_path, executor=cpu_executor), stages, "extract")
         try:
-            num_images, images_meta = analyze_pdf_images(file_path)
+            first = next(it, None)
         except Exception as e:
-            logger.warning(f"Error analizando imágenes PDF: {e}")
+            logger.error(f"❌ Error procesando XLSX {file_path}: {e}")
+            return
+        if first is None:
+            return
+        for sheet, row, line in itertools.chain([first], it):
+            extracted_chars += len(line)
+            if full_text is not None:
+                full_text.append(line)
+            yield sheet, row, line
 
     # ------------------------------
-    # 3) CHUNKING
+    # 2) CHUNKING → (chunk, metadata extra)
     # ------------------------------
-    chunks = chunk_text(
-        text,
-        chunk_size=chunk_size,
-        chunk_overlap=int(chunk_size * 0.20)
-    )
+    # Prefijo acotado (primeros segmentos) para tipo de documento y resumen
+    if file_path.lower().endswith(".xlsx"):
+        # Hojas de cálculo: filas en streaming, chunks con hoja y rango de filas
+        source = _timed(chunk_rows(rows(), chunk_size=chunk_size), stages, "chunk")
+        head = _take_head(source, size=lambda c: len(c[0]))
+        prefix = "\n".join(text for text, _ in head)
+        chunks = itertools.chain(head, source)
+    else:
+        # Ventana deslizante
+        source = texts()
+        head = _take_head(source)
+        prefix = "\n".join(head)
+        chunks = (
+            (chunk, None)
+            for chunk in _timed(
+                chunk_stream(
+                    itertools.chain(head, source),
+                    chunk_size=chunk_size,
+                    chunk_overlap=int(chunk_size * 0.20)
+                ),
+                stages,
+                "chunk"
+            )
+        )
 
-    # ------------------------------
-    # 4) EMBEDDINGS (dependiendo del provider)
-    # ------------------------------
-    vectors = embed_texts(
-        chunks,
-        provider=provider   # <--- NUEVO
-    )
+    prefix = prefix[:settings.INGEST_PREFIX_CHARS]
+    if not prefix.strip():
+        stages.finish()
+        return {"status": "error", "error": "no_text_extracted"}
+
+    classified = classify_document(prefix)
+    doc_type = classified["doc_type"]
+    logger.info(f"🏷️ Tipo de documento: {doc_type} (confianza {classified['confidence']})")
 
     # ------------------------------
-    # 5) UPSERT EN PINECONE
+    # 3) EMBEDDINGS + 4) UPSERT, por lotes (solo chunks nuevos)
     # ------------------------------
-    upserts = []
-    for i, vec in enumerate(vectors):
-        chunk_id = str(uuid.uuid4())
-        metadata = {
+    lexical = get_lexical_index()
+
+    def upsert_batch(upserts: list, updates: list, lexical_docs: list):
+        t0 = time.time()
+        if upserts:
+            upsert(upserts)
+        if updates:
+            update_metadata(settings.PINECONE_INDEX, updates)
+        if lexical_docs:
+            # Chunks ya indexados se ignoran: solo tokeniza los que faltan
+            lexical.add(lexical_docs)
+        stages.add("upsert", time.time() - t0)
+
+    def chunk_metadata(chunk: str, chunk_index: int, extra: Optional[dict]) -> dict:
+        meta = {
             "source": source_name,
-            "chunk_index": i,
+            "chunk_index": chunk_index,
             "document_id": document_id,
-            "text_excerpt": chunks[i][:600],
+            "text_excerpt": chunk[:600],
             "doc_type": doc_type,
             "filename": filename,
             "provider": provider     # <--- IMPORTANTE PARA SABER CÓMO RESPONDIO
         }
-        upserts.append((chunk_id, vec, metadata))
+        if extra:
+            meta.update(extra)       # p. ej. hoja y rango de filas en XLSX
+        return meta
+
+    n_chunks = 0
+    n_new = 0
+    n_moved = 0
+    vector_dim = previous["vector_dim"] if previous else None
+    index_ready = False
+    chunk_ids: list[str] = []
+    meta_hashes: list[str] = []
+    occurrences: Counter = Counter()
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-upsert") as upsert_pool:
+        pending = deque()
 
-    create_index(settings.PINECONE_INDEX, dim=len(vectors[0]))
-    upsert_vectors(settings.PINECONE_INDEX, upserts)
+        for items in _batched(chunks, max(1, settings.INGEST_EMBED_BATCH)):
+            batch = [chunk for chunk, _ in items]
+            extras = [extra for _, extra in items]
+            if registry is None:
+                ids = [str(uuid.uuid4()) for _ in batch]
+            else:
+                ids = _chunk_ids(document_id, doc_type, batch, occurrences)
+            metas = [chunk_metadata(chunk, n_chunks + i, extras[i]) for i, chunk in enumerate(batch)]
+            hashes = [metadata_fingerprint(meta) for meta in metas]
+            chunk_ids.extend(ids)
+            meta_hashes.extend(hashes)
+            n_chunks += len(batch)
+
+            fresh = [i for i, cid in enumerate(ids) if cid not in previous_chunks]
+            # Mismo texto, otra metadata (p. ej. se insertó algo antes o cambió el nombre)
+            updates = [(cid, metas[i]) for i, cid in enumerate(ids)
+                       if cid in previous_chunks and previous_chunks[cid] != hashes[i]]
+            n_moved += len(updates)
+
+            # BM25: todo el lote (también chunks sin cambios, por si el índice
+            # léxico se habilitó después de la ingesta anterior)
+            lexical_docs = []
+            if lexical is not None:
+                lexical_docs = [(ids[i], chunk, metas[i]) for i, chunk in enumerate(batch)]
+
+            upserts = []
+            if fresh:
+                with stages.track("embed"):
+                    vectors = embed(
+                        [batch[i] for i in fresh],
+                        provider=provider   # <--- NUEVO
+                    )
+
+                if not index_ready:
+                    vector_dim = vectors.shape[1]
+                    with stages.track("upsert"):
+                        create_index(settings.PINECONE_INDEX, dim=vector_dim)
+                    index_ready = True
+
+                # Filas de la matriz (vistas): la lista solo se arma en el cliente de Pinecone
+                for i, vec in zip(fresh, vectors):
+                    upserts.append((ids[i], vec, metas[i]))
+                n_new += len(fresh)
+
+            if not upserts and not updates and not lexical_docs:
+                continue
+
+            # Backpressure: como máximo INGEST_PIPELINE_DEPTH lotes esperando upsert
+            while len(pending) >= max(1, settings.INGEST_PIPELINE_DEPTH):
+                pending.popleft().result()
+            pending.append(upsert_pool.submit(upsert_batch, upserts, updates, lexical_docs))
+
+        while pending:
+            pending.popleft().result()
+
+    if n_chunks == 0:
+        stages.finish()
+        return {"status": "error", "error": "no_text_extracted"}
+
+    # Chunks de la versión anterior que ya no existen
+    stale = sorted(set(previous_chunks).difference(chunk_ids))
+    if stale:
+        with stages.track("upsert"):
+            delete_vectors(settings.PINECONE_INDEX, stale)
+            if lexical is not None:
+                lexical.delete(stale)
+
+    if n_new or n_moved or stale:
+        invalidate_retrieval(provider=provider, doc_type=doc_type)
+        if previous and previous["doc_type"] != doc_type:
+            invalidate_retrieval(provider=provider, doc_type=previous["doc_type"])
 
     # ------------------------------
-    # 6) RESUMEN (LLM DINÁMICO)
+    # 5) RESUMEN (LLM DINÁMICO; se reutiliza si el prefijo no cambió)
     # ------------------------------
-    try:
-        resumen = generate_summary(text, provider=provider)
-    except Exception as e:
-        logger.warning(f"Fallo resumen LLM: {e}")
-        resumen = text[:1200]   # fallback
+    prefix_hash = text_fingerprint(prefix)
+    if previous and previous["prefix_hash"] == prefix_hash and previous["summary"]:
+        resumen = previous["summary"]
+    elif not summarize:
+        resumen = prefix[:1200]
+    else:
+        try:
+            with stages.track("summary"):
+                resumen = generate_summary(prefix, provider=provider)
+        except Exception as e:
+            logger.warning(f"Fallo resumen LLM: {e}")
+            resumen = prefix[:1200]   # fallback
+
+    if registry is not None:
+        registry.save(document_id, filename, provider, file_hash, doc_type, vector_dim,
+                      prefix_hash, resumen, chunk_ids, meta_hashes)
+
+    stages.finish()
+    num_images = len(images_meta)
 
     # ------------------------------
-    # 7) RESPUESTA
+    # 6) RESPUESTA
     # ------------------------------
     payload = {
         "status": "ok",
         "filename": filename,
         "document_id": document_id,
         "doc_type": doc_type,
-        "contenido_extraido": text,
+        "caracteres_extraidos": extracted_chars,
         "resumen_documento": resumen,
         "tamaño_archivo": filesize,
         "numero_imagenes": num_images,
@@ -147,18 +505,29 @@ def ingest_file_to_pinecone(
             "document_id": document_id,
             "filename": filename,
             "doc_type": doc_type,
-            "chunks": len(chunks),
-            "vector_dim": len(vectors[0]),
+            "chunks": n_chunks,
+            "vector_dim": vector_dim,
             "source": source_name,
             "provider": provider,
-            "numero_imagenes": num_images
+            "numero_imagenes": num_images,
+            "huella_archivo": file_hash
+        },
+        "cambios": {
+            "archivo_sin_cambios": bool(previous) and previous["file_hash"] == file_hash,
+            "chunks_nuevos": n_new,
+            "chunks_actualizados": n_moved,
+            "chunks_sin_cambios": n_chunks - n_new - n_moved,
+            "chunks_eliminados": len(stale)
         },
         "elapsed_seconds": round(time.time() - start_t, 2)
     }
+    if full_text is not None:
+        payload["contenido_extraido"] = "\n".join(full_text)
 
     logger.info(
         f"Ingesta completada [{provider}]: {filename} -> {document_id} "
-        f"(chunks={len(chunks)}, images={num_images})"
+        f"(chunks={n_chunks}, nuevos={n_new}, actualizados={n_moved}, eliminados={len(stale)}, "
+        f"images={num_images})"
     )
 
     return payload
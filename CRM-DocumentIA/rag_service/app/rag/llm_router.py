@@ -1,8 +1,15 @@
 # app/rag/llm_router.py
 
-import requests
+import json
+from typing import Iterator
+
 from app.core.logger import logger
 from app.core.config import settings
+from app.core.http_clients import (
+    request_with_retry, arequest_with_retry, stream_with_retry,
+    get_openai_client, get_async_openai_client,
+    limit, alimit
+)
 
 # ======================================================
 # 🔥 GENERADOR DE RESPUESTAS (Router HF / OpenAI)
@@ -32,7 +39,7 @@ def _call_hf_chat(prompt: str) -> str:
 
     logger.info(f"🧠 Llamando HF Chat: {settings.HF_MODEL}")
 
-    r = requests.post(url, headers=headers, json=payload, timeout=120)
+    r = request_with_retry("hf", "POST", url, headers=headers, json=payload, timeout=120)
     if r.status_code != 200:
         raise RuntimeError(f"HF Error: {r.text}")
 
@@ -50,25 +57,139 @@ def _call_openai_chat(prompt: str) -> str:
     if not settings.OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY no definido.")
 
-    from openai import OpenAI
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    client = get_openai_client()
 
     logger.info(f"🧠 Llamando OpenAI Chat ({settings.OPENAI_MODEL})")
 
-    response = client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": "Asistente experto en análisis de documentos para CRM."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=400,
-        temperature=0.2
-    )
+    with limit("openai"):
+        response = client.chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": "Asistente experto en análisis de documentos para CRM."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=400,
+            temperature=0.2
+        )
 
     # Nuevo acceso correcto
     return response.choices[0].message.content
 
 
+# ======================================================
+# 🔥 STREAMING DE TOKENS
+# ======================================================
+
+def _parse_sse_token(data: str) -> str | None:
+    """
+    Extrae el texto de un evento SSE. Soporta:
+      - HF Text Generation Inference: {"token": {"text": ..., "special": bool}}
+      - Formato OpenAI-compatible:    {"choices": [{"delta": {"content": ...}}]}
+    """
+    obj = json.loads(data)
+
+    token = obj.get("token")
+    if isinstance(token, dict):
+        return None if token.get("special") else token.get("text")
+
+    choices = obj.get("choices") or []
+    if choices:
+        return (choices[0].get("delta") or {}).get("content")
+
+    return None
+
+
+def _stream_hf_chat(prompt: str) -> Iterator[str]:
+    """
+    HuggingFace Inference (TGI) con "stream": true → eventos SSE.
+    """
+    if not settings.HF_INFERENCE_API_KEY or not settings.HF_MODEL:
+        raise RuntimeError("Variables HF no configuradas.")
+
+    url = settings.HF_API_URL or f"https://api-inference.huggingface.co/models/{settings.HF_MODEL}"
+
+    headers = {
+        "Authorization": f"Bearer {settings.HF_INFERENCE_API_KEY}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+
+    payload = {
+        "inputs": prompt,
+        "parameters": {
+            "max_new_tokens": 400,
+            "temperature": 0.2
+        },
+        "stream": True
+    }
+
+    logger.info(f"🧠 Llamando HF Chat (stream): {settings.HF_MODEL}")
+
+    with stream_with_retry("hf", "POST", url, headers=headers, json=payload, timeout=120) as r:
+        if r.status_code != 200:
+            raise RuntimeError(f"HF Error: {r.text}")
+
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            token = _parse_sse_token(data)
+            if token:
+                yield token
+
+
+def _stream_openai_chat(prompt: str) -> Iterator[str]:
+    """
+    OpenAI Chat con stream=True: devuelve los deltas de contenido.
+    """
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY no definido.")
+
+    client = get_openai_client()
+
+    logger.info(f"🧠 Llamando OpenAI Chat (stream) ({settings.OPENAI_MODEL})")
+
+    with limit("openai"):
+        stream = client.chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": "Asistente experto en análisis de documentos para CRM."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=400,
+            temperature=0.2,
+            stream=True
+        )
+
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+
+def stream_answer(prompt: str, provider: str = None) -> Iterator[str]:
+    """
+    Igual que generate_answer pero entrega los tokens a medida que llegan.
+    Si el proveedor falla a mitad de la respuesta, se emite el aviso de error
+    como último fragmento.
+    """
+    provider = provider or settings.LLM_PROVIDER
+    logger.info(f"🤖 Generando respuesta LLM (stream) con provider='{provider}'")
+
+    try:
+        if provider == "openai":
+            yield from _stream_openai_chat(prompt)
+        else:
+            yield from _stream_hf_chat(prompt)
+    except Exception as e:
+        logger.error(f"Error LLM (stream): {e}")
+        yield "\n⚠️ Error al llamar al modelo LLM."
+
+
 # ======================================================
 # 🔥 RESUMENES
 # ======================================================
@@ -115,3 +236,73 @@ def generate_answer(prompt: str, provider: str = None) -> str:
     except Exception as e:
         logger.error(f"Error LLM: {e}")
         return "⚠️ Error al llamar al modelo LLM.\n" + prompt
+
+
+# ======================================================
+# 🔥 VERSIÓN ASYNC (camino de consulta)
+# ======================================================
+
+async def _call_hf_chat_async(prompt: str) -> str:
+    if not settings.HF_INFERENCE_API_KEY or not settings.HF_MODEL:
+        raise RuntimeError("Variables HF no configuradas.")
+
+    url = settings.HF_API_URL or f"https://api-inference.huggingface.co/models/{settings.HF_MODEL}"
+
+    headers = {
+        "Authorization": f"Bearer {settings.HF_INFERENCE_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+    payload = {
+        "inputs": prompt,
+        "parameters": {
+            "max_new_tokens": 400,
+            "temperature": 0.2
+        }
+    }
+
+    r = await arequest_with_retry("hf", "POST", url, headers=headers, json=payload, timeout=120)
+    if r.status_code != 200:
+        raise RuntimeError(f"HF Error: {r.text}")
+
+    try:
+        return r.json()[0]["generated_text"]
+    except Exception:
+        return str(r.json())
+
+
+async def _call_openai_chat_async(prompt: str) -> str:
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY no definido.")
+
+    client = get_async_openai_client()
+
+    async with alimit("openai"):
+        response = await client.chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": "Asistente experto en análisis de documentos para CRM."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=400,
+            temperature=0.2
+        )
+
+    return response.choices[0].message.content
+
+
+async def generate_answer_async(prompt: str, provider: str = None) -> str:
+    """
+    Igual que generate_answer, sin ocupar un hilo mientras espera al proveedor.
+    """
+    provider = provider or settings.LLM_PROVIDER
+    logger.info(f"🤖 Generando respuesta LLM (async) con provider='{provider}'")
+
+    try:
+        if provider == "openai":
+            return await _call_openai_chat_async(prompt)
+        else:
+            return await _call_hf_chat_async(prompt)
+    except Exception as e:
+        logger.error(f"Error LLM: {e}")
+        return "⚠️ Error al llamar al modelo LLM.\n" + prompt
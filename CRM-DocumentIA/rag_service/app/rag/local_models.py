@@ -0,0 +1,131 @@
+# app/rag/local_models.py
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Backends de inferencia local (LOCAL_INFERENCE_BACKEND):
+#   "torch" → PyTorch float32 (por defecto)
+#   "onnx"  → ONNX Runtime vía sentence-transformers (requiere optimum[onnxruntime])
+#   "int8"  → PyTorch con cuantización dinámica int8 de las capas Linear
+BACKENDS = ("torch", "onnx", "int8")
+
+_threads_configured = False
+
+
+def _configure_threads():
+    """Fija los hilos intra-op de PyTorch una sola vez (0 = valor por defecto)."""
+    global _threads_configured
+    if _threads_configured or settings.LOCAL_INFERENCE_THREADS <= 0:
+        return
+    import torch
+    torch.set_num_threads(settings.LOCAL_INFERENCE_THREADS)
+    _threads_configured = True
+
+
+def _onnx_kwargs() -> dict:
+    """model_kwargs para el backend ONNX (sesión de ONNX Runtime con N hilos)."""
+    kwargs = {"provider": "CPUExecutionProvider"}
+    if settings.LOCAL_INFERENCE_THREADS > 0:
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = settings.LOCAL_INFERENCE_THREADS
+        kwargs["session_options"] = opts
+    return kwargs
+
+
+def _quantize_int8(module):
+    """Cuantización dinámica int8 de las capas Linear (pesos int8, activaciones float)."""
+    import torch
+    torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return module
+
+
+def _backend(backend: str | None) -> str:
+    backend = backend or settings.LOCAL_INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: {backend} (opciones: {BACKENDS})")
+    return backend
+
+
+# Backend efectivo por modelo (lo que se pidió puede haber caído a PyTorch)
+_resolved: dict[str, dict] = {}
+
+
+def _load_with_fallback(model_name: str, backend: str, load):
+    """
+    load(backend) construye el modelo. Si el backend optimizado falla se
+    usa PyTorch, se registra como error y queda en backend_report() (y en
+    /ready): un despliegue con backend=onnx debe poder ver que no lo tiene.
+    """
+    error = None
+    try:
+        model = load(backend)
+        resolved = backend
+    except Exception as e:
+        if backend == "torch":
+            raise
+        logger.error(f"❌ Backend '{backend}' no disponible para {model_name} ({e}); se usa PyTorch")
+        model = load("torch")
+        resolved = "torch"
+        error = str(e)
+
+    _resolved[model_name] = {
+        "requested": backend,
+        "backend": resolved,
+        "fallback": resolved != backend,
+        "error": error,
+    }
+    return model
+
+
+def resolved_backend(model_name: str) -> str | None:
+    """Backend con el que se cargó realmente `model_name` (None si no se cargó)."""
+    entry = _resolved.get(model_name)
+    return entry["backend"] if entry else None
+
+
+def backend_report() -> dict:
+    """{modelo: {requested, backend, fallback, error}} de los modelos cargados."""
+    return {name: dict(entry) for name, entry in _resolved.items()}
+
+
+def load_sentence_transformer(model_name: str, backend: str | None = None):
+    """
+    SentenceTransformer con el backend configurado. Si el backend
+    optimizado no está disponible se usa PyTorch (ver _load_with_fallback).
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = _backend(backend)
+    _configure_threads()
+
+    def load(backend: str):
+        if backend == "onnx":
+            return SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_kwargs())
+        model = SentenceTransformer(model_name)
+        if backend == "int8":
+            _quantize_int8(model)
+        return model
+
+    return _load_with_fallback(model_name, backend, load)
+
+
+def load_cross_encoder(model_name: str, max_length: int, backend: str | None = None):
+    """CrossEncoder con el backend configurado (mismo fallback que arriba)."""
+    from sentence_transformers import CrossEncoder
+
+    backend = _backend(backend)
+    _configure_threads()
+
+    def load(backend: str):
+        if backend == "onnx":
+            return CrossEncoder(model_name, max_length=max_length, backend="onnx",
+                                model_kwargs=_onnx_kwargs())
+        ce = CrossEncoder(model_name, max_length=max_length)
+        if backend == "int8":
+            # sentence-transformers < 4: CrossEncoder no es un nn.Module; el modelo HF está en ce.model
+            import torch
+            _quantize_int8(ce if isinstance(ce, torch.nn.Module) else ce.model)
+        return ce
+
+    return _load_with_fallback(model_name, backend, load)
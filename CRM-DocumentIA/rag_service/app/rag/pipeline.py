@@ -1,10 +1,11 @@
 # app/rag/pipeline.py
 
 import time
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from app.core.logger import logger
-from app.rag.retriever import retrieve, rerank
-from app.rag.llm_router import generate_answer
+from app.rag.doc_classifier import detect_query_doc_type
+from app.rag.retriever import retrieve, rerank, retrieve_async, rerank_async
+from app.rag.llm_router import generate_answer, generate_answer_async, stream_answer
 
 
 # ======================================================
@@ -111,28 +112,50 @@ def generate_answer_with_llm(prompt: str, provider: str):
 # ======================================================
 # 5. Lógica principal del RAG
 # ======================================================
-def answer_question(
-    question: str,
-    top_k: int = 20,
-    doc_type: Optional[str] = None,
-    provider: str = "openai"
-):
+def _build_answer_context(question: str, hits: List[dict], reranked: List[dict],
+                          doc_type: Optional[str]) -> dict:
+    """Compresión del contexto + prompt a partir de los hits ya rerankeados."""
 
-    start = time.time()
+    # -------------------------------------------
+    # Compresión del contexto
+    # -------------------------------------------
+    compressed = compress_context(reranked, max_chunks=5, group_size=5)
+
+    # -------------------------------------------
+    # Filenames únicos usados
+    # -------------------------------------------
+    documents_used = list({h["metadata"].get("filename", "desconocido") for h in reranked})
 
     # -------------------------------------------
-    # Auto-detección simple
+    # Construcción del prompt final
     # -------------------------------------------
-    if not doc_type:
-        qlow = question.lower()
-        if any(w in qlow for w in ["cláusula", "contrato"]):
-            doc_type = "contrato"
-        elif "factura" in qlow:
-            doc_type = "factura"
-        elif "correo" in qlow or "email" in qlow:
-            doc_type = "correo"
-        else:
-            doc_type = None
+    prompt = build_prompt(
+        question,
+        compressed,
+        doc_type or "documento",
+        documents_used
+    )
+
+    return {
+        "prompt": prompt,
+        "hits": hits,
+        "documents_used": documents_used,
+        "compressed_context": compressed,
+        "doc_type": doc_type or "documento",
+    }
+
+
+def _prepare_answer(
+    question: str,
+    top_k: int,
+    doc_type: Optional[str],
+    provider: str
+) -> dict:
+    """
+    Retrieve + rerank + compresión + prompt.
+    Compartido por la respuesta completa y la respuesta en streaming.
+    """
+    doc_type = doc_type or detect_query_doc_type(question)
 
     # -------------------------------------------
     # Retrieve + fallback si el tipo falla
@@ -148,38 +171,127 @@ def answer_question(
     # -------------------------------------------
     reranked = rerank(question, hits, top_k=min(len(hits), 30), provider=provider)
 
-    # -------------------------------------------
-    # Compresión del contexto
-    # -------------------------------------------
-    compressed = compress_context(reranked, max_chunks=5, group_size=5)
+    return _build_answer_context(question, hits, reranked, doc_type)
 
-    # -------------------------------------------
-    # Filenames únicos usados
-    # -------------------------------------------
-    documents_used = list({h["metadata"].get("filename", "desconocido") for h in reranked})
 
-    # -------------------------------------------
-    # Construcción del prompt final
-    # -------------------------------------------
-    prompt = build_prompt(
-        question,
-        compressed,
-        doc_type or "documento",
-        documents_used
-    )
+async def _prepare_answer_async(
+    question: str,
+    top_k: int,
+    doc_type: Optional[str],
+    provider: str
+) -> dict:
+    """Igual que _prepare_answer, sin bloquear el event loop."""
+    doc_type = doc_type or detect_query_doc_type(question)
+
+    hits = await retrieve_async(question, top_k=top_k, doc_type=doc_type, provider=provider)
+
+    if not hits and doc_type:
+        hits = await retrieve_async(question, top_k=top_k, doc_type=None, provider=provider)
+        doc_type = "documento"
+
+    reranked = await rerank_async(question, hits, top_k=min(len(hits), 30), provider=provider)
+
+    return _build_answer_context(question, hits, reranked, doc_type)
+
+
+def answer_question(
+    question: str,
+    top_k: int = 20,
+    doc_type: Optional[str] = None,
+    provider: str = "openai"
+):
+
+    start = time.time()
+
+    ctx = _prepare_answer(question, top_k, doc_type, provider)
 
     # -------------------------------------------
     # LLM
     # -------------------------------------------
-    answer = generate_answer_with_llm(prompt, provider=provider)
+    answer = generate_answer_with_llm(ctx["prompt"], provider=provider)
 
     elapsed = round(time.time() - start, 2)
 
     return {
         "answer": answer,
-        "sources": [h["metadata"] for h in hits],
-        "documents_used": documents_used,
-        "compressed_context": compressed,
-        "doc_type": doc_type or "documento",
+        "sources": [h["metadata"] for h in ctx["hits"]],
+        "documents_used": ctx["documents_used"],
+        "compressed_context": ctx["compressed_context"],
+        "doc_type": ctx["doc_type"],
         "elapsed_seconds": elapsed
     }
+
+
+async def answer_question_async(
+    question: str,
+    top_k: int = 20,
+    doc_type: Optional[str] = None,
+    provider: str = "openai"
+):
+    """
+    Versión async de answer_question: embeddings y LLM con clientes async,
+    búsqueda vectorial y cross-encoder fuera del event loop. Misma respuesta.
+    """
+
+    start = time.time()
+
+    ctx = await _prepare_answer_async(question, top_k, doc_type, provider)
+
+    answer = await generate_answer_async(ctx["prompt"], provider=provider)
+
+    elapsed = round(time.time() - start, 2)
+
+    return {
+        "answer": answer,
+        "sources": [h["metadata"] for h in ctx["hits"]],
+        "documents_used": ctx["documents_used"],
+        "compressed_context": ctx["compressed_context"],
+        "doc_type": ctx["doc_type"],
+        "elapsed_seconds": elapsed
+    }
+
+
+# ======================================================
+# 6. Respuesta en streaming
+# ======================================================
+def stream_answer_question(
+    question: str,
+    top_k: int = 20,
+    doc_type: Optional[str] = None,
+    provider: str = "openai"
+) -> Iterator[dict]:
+    """
+    Genera eventos en orden:
+      - {"event": "sources", "data": {...}}  fuentes y contexto (antes del LLM)
+      - {"event": "token",   "data": "..."}  fragmentos del LLM a medida que llegan
+      - {"event": "done",    "data": {...}}  tiempos totales
+    """
+
+    start = time.time()
+
+    ctx = _prepare_answer(question, top_k, doc_type, provider)
+
+    yield {
+        "event": "sources",
+        "data": {
+            "doc_type": ctx["doc_type"],
+            "sources": [h["metadata"] for h in ctx["hits"]],
+            "documents_used": ctx["documents_used"],
+            "compressed_context": ctx["compressed_context"],
+            "retrieval_seconds": round(time.time() - start, 2)
+        }
+    }
+
+    first_token_at = None
+    for token in stream_answer(ctx["prompt"], provider=provider):
+        if first_token_at is None:
+            first_token_at = time.time()
+        yield {"event": "token", "data": token}
+
+    yield {
+        "event": "done",
+        "data": {
+            "elapsed_seconds": round(time.time() - start, 2),
+            "first_token_seconds": round(first_token_at - start, 2) if first_token_at else None
+        }
+    }
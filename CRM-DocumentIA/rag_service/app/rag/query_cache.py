@@ -0,0 +1,123 @@
+# app/rag/query_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.embedding_cache import normalize_text
+
+
+# ============================
+# CACHÉ TTL + LRU
+# ============================
+class TTLCache:
+    """
+    Caché en memoria con expiración por tiempo y expulsión LRU.
+    Segura para hilos.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Elimina las claves que cumplen `predicate`; devuelve cuántas."""
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# ============================
+# CACHÉS DEL PIPELINE
+# ============================
+query_embeddings = TTLCache(settings.QUERY_CACHE_MAX_ENTRIES, settings.QUERY_CACHE_TTL_SECONDS)
+retrieval_results = TTLCache(settings.QUERY_CACHE_MAX_ENTRIES, settings.QUERY_CACHE_TTL_SECONDS)
+
+
+def normalize_question(question: str) -> str:
+    return normalize_text(question).casefold()
+
+
+def embedding_key(question: str, provider: str) -> tuple:
+    return (normalize_question(question), provider)
+
+
+def retrieval_key(question: str, provider: Optional[str], doc_type: Optional[str], top_k: int) -> tuple:
+    return (normalize_question(question), provider, doc_type, top_k)
+
+
+def get_cached_hits(key: tuple) -> Optional[list[dict]]:
+    """Copia superficial de cada hit: rerank escribe sobre ellos."""
+    if not settings.QUERY_CACHE_ENABLED:
+        return None
+    hits = retrieval_results.get(key)
+    return [dict(h) for h in hits] if hits is not None else None
+
+
+def cache_hits(key: tuple, hits: list[dict]):
+    # Resultados vacíos no se guardan: pueden venir de un fallo del índice
+    if settings.QUERY_CACHE_ENABLED and hits:
+        retrieval_results.set(key, [dict(h) for h in hits])
+
+
+def invalidate_retrieval(provider: Optional[str], doc_type: Optional[str]) -> int:
+    """
+    Invalida resultados de retrieve afectados por nuevos vectores de
+    (provider, doc_type). Las consultas sin filtro (None) también se invalidan.
+    Los embeddings de consulta no dependen del índice y solo expiran por TTL.
+    """
+    def affected(key: tuple) -> bool:
+        _, k_provider, k_doc_type, _ = key
+        return k_provider in (None, provider) and k_doc_type in (None, doc_type)
+
+    removed = retrieval_results.invalidate(affected)
+    if removed:
+        logger.info(
+            f"🧹 Caché de consultas: {removed} resultados invalidados "
+            f"(provider={provider}, doc_type={doc_type})"
+        )
+    return removed
@@ -0,0 +1,146 @@
+# app/rag/rerank_service.py
+
+import asyncio
+import hashlib
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.batching import MicroBatcher
+from app.core.config import settings
+from app.core.logger import logger
+from app.rag.local_models import load_cross_encoder
+from app.rag.query_cache import TTLCache, normalize_question
+
+
+# -------------------------------------------
+# Modelos: uno por nombre, cargado una sola vez
+# -------------------------------------------
+_models: dict = {}
+_models_lock = threading.Lock()
+
+
+def get_cross_encoder(model_name: Optional[str] = None):
+    """
+    Devuelve el cross-encoder `model_name` (por defecto CROSS_ENCODER_MODEL).
+    Si no se puede cargar devuelve None (el pipeline usa fallback) y no
+    se reintenta.
+    """
+    model_name = model_name or settings.CROSS_ENCODER_MODEL
+
+    with _models_lock:
+        if model_name in _models:
+            return _models[model_name]
+
+        try:
+            ce = load_cross_encoder(model_name, max_length=settings.RERANK_MAX_LENGTH)
+            logger.info(f"Cargado cross-encoder {model_name} (max_length={settings.RERANK_MAX_LENGTH}, "
+                        f"backend={settings.LOCAL_INFERENCE_BACKEND})")
+        except Exception as e:
+            logger.warning(f"No se pudo cargar cross-encoder {model_name}: {e}")
+            ce = None
+
+        _models[model_name] = ce
+        return ce
+
+
+# -------------------------------------------
+# Servicio de rerank
+# -------------------------------------------
+class RerankService:
+    """
+    Puntajes de cross-encoder para pares (pregunta, chunk):
+      - caché de puntajes por (modelo, hash de la pregunta, id del chunk);
+        los ids de chunk se derivan del contenido (o son únicos), así que
+        un puntaje no queda obsoleto al re-ingestar,
+      - micro-batching: los pares de consultas concurrentes se juntan en
+        un MicroBatcher (hasta RERANK_MAX_BATCH_PAIRS por llamada),
+      - length bucketing: dentro de cada llamada los pares se ordenan por
+        longitud antes de armar los lotes de RERANK_BATCH_SIZE, así cada
+        lote rellena (padding) hasta una longitud parecida.
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or settings.CROSS_ENCODER_MODEL
+        self.scores = TTLCache(settings.RERANK_CACHE_MAX_ENTRIES, settings.RERANK_CACHE_TTL_SECONDS)
+        self._batcher = MicroBatcher(
+            self._predict,
+            max_items=settings.RERANK_MAX_BATCH_PAIRS,
+            max_wait=settings.RERANK_BATCH_WAIT,
+            workers=settings.RERANK_WORKERS,
+            name="rerank",
+        )
+
+    @property
+    def loaded(self) -> bool:
+        """True si ya se intentó cargar el modelo (con o sin éxito)."""
+        return self.model_name in _models
+
+    @property
+    def available(self) -> bool:
+        return get_cross_encoder(self.model_name) is not None
+
+    def _predict(self, pairs: list) -> np.ndarray:
+        ce = get_cross_encoder(self.model_name)
+        order = np.argsort([len(q) + len(t) for q, t in pairs], kind="stable")
+        sorted_scores = ce.predict(
+            [pairs[i] for i in order],
+            batch_size=settings.RERANK_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+        scores = np.empty(len(pairs), dtype=np.float32)
+        scores[order] = np.asarray(sorted_scores, dtype=np.float32).reshape(-1)
+        return scores
+
+    # ---------- caché ----------
+    def _keys(self, query: str, hits: List[dict]) -> list:
+        qhash = hashlib.sha1(normalize_question(query).encode("utf-8")).hexdigest()
+        keys = []
+        for h in hits:
+            chunk = h.get("id") or hashlib.sha1(
+                h["metadata"].get("text_excerpt", "").encode("utf-8")).hexdigest()
+            keys.append((self.model_name, qhash, chunk))
+        return keys
+
+    def _lookup(self, query: str, hits: List[dict]):
+        keys = self._keys(query, hits)
+        scores = [self.scores.get(k) for k in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+        pairs = [(query, hits[i]["metadata"].get("text_excerpt", "")) for i in missing]
+        return keys, scores, missing, pairs
+
+    def _merge(self, keys, scores, missing, computed) -> list[float]:
+        for i, s in zip(missing, computed):
+            scores[i] = float(s)
+            self.scores.set(keys[i], scores[i])
+        return scores
+
+    # ---------- API ----------
+    def score(self, query: str, hits: List[dict]) -> list[float]:
+        keys, scores, missing, pairs = self._lookup(query, hits)
+        if pairs:
+            computed = self._batcher(pairs)
+            scores = self._merge(keys, scores, missing, computed)
+        return scores
+
+    async def score_async(self, query: str, hits: List[dict]) -> list[float]:
+        """Igual que score; el event loop espera el lote sin ocupar un hilo."""
+        keys, scores, missing, pairs = self._lookup(query, hits)
+        if pairs:
+            computed = await asyncio.wrap_future(self._batcher.submit(pairs))
+            scores = self._merge(keys, scores, missing, computed)
+        return scores
+
+
+_service: Optional[RerankService] = None
+_service_lock = threading.Lock()
+
+
+def get_rerank_service() -> RerankService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RerankService()
+    return _service
@@ -1,40 +1,66 @@
 # app/rag/retriever.py
 
+import asyncio
 from typing import List, Optional
+
+import numpy as np
+
 from app.core.logger import logger
 from app.core.config import settings
 
-from app.rag.embeddings import embed_texts
-from app.vectorstore.pinecone_client import query_index
+from app.rag.embeddings import embed_array, embed_array_async
+from app.rag import query_cache
+from app.rag.rerank_service import get_rerank_service
+from app.vectorstore.bm25_index import get_lexical_index
+from app.vectorstore.store import query_index
+
+# =====================================================
+# 0. EMBEDDING DE CONSULTA (con caché TTL)
+# =====================================================
 
-from sentence_transformers import CrossEncoder
+def _frozen(qvec: np.ndarray) -> np.ndarray:
+    # Compartido entre requests vía la caché TTL: nadie debe mutarlo
+    qvec.flags.writeable = False
+    return qvec
 
-# -------------------------------------------
-# Cross Encoders por provider (carga perezosa)
-# -------------------------------------------
-_cross_encoders = {}
 
-def get_cross_encoder(provider: str = "hf"):
+def embed_query(query: str, provider: Optional[str] = None) -> np.ndarray:
     """
-    Devuelve un cross-encoder según el provider.
-    Si falla, devuelve None (el pipeline usa fallback).
+    Embedding de la pregunta (float32, solo lectura), reutilizado
+    mientras no expire el TTL. La conversión a lista solo ocurre en el
+    cliente de Pinecone; el índice local lo usa tal cual.
     """
-    global _cross_encoders
+    provider = provider or settings.EMB_PROVIDER
+    key = query_cache.embedding_key(query, provider)
 
-    if provider in _cross_encoders:
-        return _cross_encoders[provider]
+    if settings.QUERY_CACHE_ENABLED:
+        cached = query_cache.query_embeddings.get(key)
+        if cached is not None:
+            return cached
 
-    model_name = settings.CROSS_ENCODER_MODEL
+    qvec = _frozen(embed_array([query], provider=provider)[0])
 
-    try:
-        ce = CrossEncoder(model_name)
-        _cross_encoders[provider] = ce
-        logger.info(f"Cargado cross-encoder {model_name} para provider={provider}")
-    except Exception as e:
-        logger.warning(f"No se pudo cargar cross-encoder para {provider}: {e}")
-        _cross_encoders[provider] = None
+    if settings.QUERY_CACHE_ENABLED:
+        query_cache.query_embeddings.set(key, qvec)
+
+    return qvec
+
+
+async def embed_query_async(query: str, provider: Optional[str] = None) -> np.ndarray:
+    provider = provider or settings.EMB_PROVIDER
+    key = query_cache.embedding_key(query, provider)
 
-    return _cross_encoders[provider]
+    if settings.QUERY_CACHE_ENABLED:
+        cached = query_cache.query_embeddings.get(key)
+        if cached is not None:
+            return cached
+
+    qvec = _frozen((await embed_array_async([query], provider=provider))[0])
+
+    if settings.QUERY_CACHE_ENABLED:
+        query_cache.query_embeddings.set(key, qvec)
+
+    return qvec
 
 
 # =====================================================
@@ -51,11 +77,64 @@ def retrieve(
     Recupera chunks desde Pinecone con:
     - provider (HF/OpenAI/local)
     - doc_type (email/contrato/etc)
+
+    Con HYBRID_SEARCH, los resultados vectoriales se fusionan (RRF) con
+    los del índice BM25 local; las coincidencias literales de
+    identificadores (facturas, NIT, códigos) quedan primero.
+
+    Los resultados se cachean por (pregunta normalizada, provider, doc_type, top_k)
+    y se invalidan cuando la ingesta escribe vectores del mismo provider/doc_type.
     """
 
+    cache_key = query_cache.retrieval_key(query, provider, doc_type, top_k)
+    cached = query_cache.get_cached_hits(cache_key)
+    if cached is not None:
+        logger.debug(f"Retrieve desde caché: {cache_key}")
+        return cached
+
     # ----- Generar embedding con el proveedor correcto -----
-    qvec = embed_texts([query], provider=provider)[0]
+    qvec = embed_query(query, provider=provider)
+
+    res = query_index(**_query_args(qvec, top_k, doc_type, provider))
+
+    hits_sorted = _fuse(_parse_matches(res, _pool_k(top_k)),
+                        _lexical_hits(query, top_k, doc_type, provider), top_k)
+
+    query_cache.cache_hits(cache_key, hits_sorted)
 
+    return hits_sorted
+
+
+async def retrieve_async(
+    query: str,
+    top_k: int = 20,
+    doc_type: Optional[str] = None,
+    provider: Optional[str] = None
+) -> List[dict]:
+    """
+    Versión async de retrieve: embedding con cliente async y búsqueda
+    vectorial en un hilo (el SDK de Pinecone y el índice local son síncronos).
+    """
+    cache_key = query_cache.retrieval_key(query, provider, doc_type, top_k)
+    cached = query_cache.get_cached_hits(cache_key)
+    if cached is not None:
+        return cached
+
+    # BM25 en paralelo con el embedding de la consulta y la búsqueda vectorial
+    lexical = asyncio.create_task(asyncio.to_thread(_lexical_hits, query, top_k, doc_type, provider))
+
+    qvec = await embed_query_async(query, provider=provider)
+
+    res = await asyncio.to_thread(query_index, **_query_args(qvec, top_k, doc_type, provider))
+
+    hits_sorted = _fuse(_parse_matches(res, _pool_k(top_k)), await lexical, top_k)
+
+    query_cache.cache_hits(cache_key, hits_sorted)
+
+    return hits_sorted
+
+
+def _query_args(qvec: np.ndarray, top_k: int, doc_type: Optional[str], provider: Optional[str]) -> dict:
     # ----- Filtrado en Pinecone -----
     filter_obj = {}
 
@@ -68,17 +147,61 @@ def retrieve(
     if not filter_obj:
         filter_obj = None
 
-    # Buscar en un pool grande y luego seleccionar top_k
-    pool_k = max(top_k * 4, 50)
+    return {
+        "index_name": settings.PINECONE_INDEX,
+        "vector": qvec,
+        "top_k": _pool_k(top_k),
+        "include_metadata": True,
+        "filter": filter_obj,
+    }
 
-    res = query_index(
-        index_name=settings.PINECONE_INDEX,
-        vector=qvec,
-        top_k=pool_k,
-        include_metadata=True,
-        filter=filter_obj
-    )
 
+def _pool_k(top_k: int) -> int:
+    # Solo vectores: pool grande y luego top_k. Con BM25 las coincidencias
+    # literales ya no dependen de la cola del ranking vectorial.
+    if settings.HYBRID_SEARCH:
+        return max(top_k, settings.HYBRID_POOL_K)
+    return max(top_k * 4, 50)
+
+
+def _lexical_hits(query: str, top_k: int, doc_type: Optional[str], provider: Optional[str]) -> List[dict]:
+    index = get_lexical_index()
+    if index is None:
+        return []
+    try:
+        return index.search(query, top_k=_pool_k(top_k),
+                            filters={"provider": provider, "doc_type": doc_type})
+    except Exception as e:
+        logger.warning(f"Búsqueda BM25 falló: {e}")
+        return []
+
+
+def _fuse(dense: List[dict], lexical: List[dict], top_k: int) -> List[dict]:
+    """
+    Reciprocal rank fusion: score = Σ 1 / (HYBRID_RRF_K + rango). Los hits
+    con coincidencia literal (exact_match) van primero. Sin hits léxicos
+    se conserva el orden vectorial.
+    """
+    if not lexical:
+        return dense[:top_k]
+
+    k = settings.HYBRID_RRF_K
+    fused: dict = {}
+    for source, hits in (("vector_score", dense), ("bm25_score", lexical)):
+        for rank, h in enumerate(hits, start=1):
+            entry = fused.get(h["id"])
+            if entry is None:
+                entry = fused[h["id"]] = {**h, "score": 0.0}
+                entry.pop("exact_match", None)
+            entry[source] = h["score"]
+            entry["score"] += 1.0 / (k + rank)
+            if h.get("exact_match"):
+                entry["exact_match"] = True
+
+    return sorted(fused.values(), key=lambda h: (not h.get("exact_match"), -h["score"]))[:top_k]
+
+
+def _parse_matches(res, top_k: int) -> List[dict]:
     matches = (
         res.get("matches", [])
         if isinstance(res, dict)
@@ -101,43 +224,76 @@ def retrieve(
         })
 
     # Ordenar por score bruto
-    hits_sorted = sorted(hits, key=lambda x: x["score"], reverse=True)
-
-    return hits_sorted[:top_k]
+    return sorted(hits, key=lambda x: x["score"], reverse=True)[:top_k]
 
 
 # =====================================================
-# 2. RERANK — CrossEncoder dinámico por provider
+# 2. RERANK — cross-encoder compartido (ver rerank_service)
 # =====================================================
 
+def _apply_scores(hits: List[dict], scores: list[float], top_k: int) -> List[dict]:
+    for h, score in zip(hits, scores):
+        h["_rerank_score"] = score
+    return sorted(hits, key=lambda x: x.get("_rerank_score", 0.0), reverse=True)[:top_k]
+
+
 def rerank(
     query: str,
     hits: List[dict],
     top_k: int = 10,
     provider: Optional[str] = None
 ) -> List[dict]:
-
+    """
+    Reordena con el cross-encoder. Todos los providers comparten el mismo
+    modelo (CROSS_ENCODER_MODEL); `provider` se conserva por compatibilidad.
+    """
     if not hits:
         return []
 
-    ce = get_cross_encoder(provider or "hf")
+    if hits[0].get("exact_match"):
+        logger.debug("Coincidencia literal — se omite el cross-encoder.")
+        return hits[:top_k]
 
-    if not ce:
+    service = get_rerank_service()
+    if not service.available:
         logger.debug("No cross-encoder disponible — devolviendo top-k directo.")
         return hits[:top_k]
 
-    # Preparar pares (query, chunk)
-    pairs = [(query, h["metadata"].get("text_excerpt", "")) for h in hits]
-
     try:
-        scores = ce.predict(pairs)
+        scores = service.score(query, hits)
     except Exception as e:
         logger.warning(f"Cross-encoder falló: {e}")
         return hits[:top_k]
 
-    for i, h in enumerate(hits):
-        h["_rerank_score"] = float(scores[i]) if i < len(scores) else 0.0
+    return _apply_scores(hits, scores, top_k)
+
 
-    hits_reranked = sorted(hits, key=lambda x: x.get("_rerank_score", 0.0), reverse=True)
+async def rerank_async(
+    query: str,
+    hits: List[dict],
+    top_k: int = 10,
+    provider: Optional[str] = None
+) -> List[dict]:
+    """
+    Versión async: los pares se encolan en el micro-batcher del servicio
+    (hilos propios, RERANK_WORKERS) y el event loop solo espera el lote.
+    """
+    if not hits:
+        return []
+
+    if hits[0].get("exact_match"):
+        return hits[:top_k]
+
+    service = get_rerank_service()
+    # La primera carga del modelo es lenta: fuera del event loop
+    available = service.available if service.loaded else await asyncio.to_thread(lambda: service.available)
+    if not available:
+        return hits[:top_k]
+
+    try:
+        scores = await service.score_async(query, hits)
+    except Exception as e:
+        logger.warning(f"Cross-encoder falló: {e}")
+        return hits[:top_k]
 
-    return hits_reranked[:top_k]
+    return _apply_scores(hits, scores, top_k)
@@ -0,0 +1,85 @@
+# app/rag/upload_store.py
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class UploadStore:
+    """
+    Archivos subidos direccionados por contenido:
+        <root>/<sha256[:2]>/<sha256><sufijo>
+
+    El upload se copia en bloques de `chunk_size` a un temporal dentro del
+    store mientras se calcula el SHA-256; al terminar se publica con
+    os.replace (atómico) o, si el contenido ya existía, se descarta el
+    temporal. Dos archivos con el mismo nombre ya no se pisan y un
+    adjunto repetido no ocupa disco dos veces.
+
+    El sufijo forma parte de la ruta porque la extracción de texto
+    elige el formato por extensión.
+    """
+
+    def __init__(self, root: Path, chunk_size: int = 1 << 20):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = max(4096, chunk_size)
+
+    def path_for(self, sha256: str, suffix: str = "") -> Path:
+        return self.root / sha256[:2] / f"{sha256}{suffix.lower()}"
+
+    def save(self, src: BinaryIO, filename: str) -> dict:
+        """
+        Guarda el stream y devuelve {"sha256", "path", "size", "duplicate"}
+        (duplicate=True si el contenido ya estaba en el store).
+        """
+        suffix = Path(filename).suffix
+        h = hashlib.sha256()
+        size = 0
+
+        fd, tmp = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    block = src.read(self.chunk_size)
+                    if not block:
+                        break
+                    h.update(block)
+                    out.write(block)
+                    size += len(block)
+
+            sha256 = h.hexdigest()
+            dest = self.path_for(sha256, suffix)
+            duplicate = dest.exists()
+            if not duplicate:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp, dest)
+                tmp = None
+            return {"sha256": sha256, "path": dest, "size": size, "duplicate": duplicate}
+        finally:
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+
+
+# ============================
+# INSTANCIA GLOBAL (perezosa)
+# ============================
+_store: Optional[UploadStore] = None
+_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            root = settings.UPLOAD_STORE_DIR or settings.STORAGE_DIR / "uploads"
+            _store = UploadStore(root, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+            logger.info(f"📁 Uploads direccionados por contenido en {root}")
+    return _store
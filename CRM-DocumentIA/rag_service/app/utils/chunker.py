@@ -1,6 +1,24 @@
 # app/utils/chunker.py
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import Iterable, Iterator
+
+
+def _make_splitter(chunk_size: int, chunk_overlap: int):
+    # Import perezoso: langchain no se carga hasta la primera ingesta
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=[
+            "\n\n",     # separa por párrafos
+            "\n",       # luego por líneas
+            ". ",       # luego por oraciones
+            " ",        # luego por palabras
+            ""          # y finalmente por caracteres
+        ]
+    )
+
 
 def chunk_text(
     text: str,
@@ -18,17 +36,7 @@ def chunk_text(
     if not text:
         return []
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=[
-            "\n\n",     # separa por párrafos
-            "\n",       # luego por líneas
-            ". ",       # luego por oraciones
-            " ",        # luego por palabras
-            ""          # y finalmente por caracteres
-        ]
-    )
+    splitter = _make_splitter(chunk_size, chunk_overlap)
 
     chunks = splitter.split_text(text)
 
@@ -36,3 +44,101 @@ def chunk_text(
     chunks = [c.strip() for c in chunks if c.strip()]
 
     return chunks
+
+
+def chunk_stream(
+    segments: Iterable[str],
+    chunk_size: int = 800,
+    chunk_overlap: int = 150,
+    window: int | None = None
+) -> Iterator[str]:
+    """
+    Versión incremental de chunk_text para textos que llegan por partes
+    (p. ej. página a página). Solo mantiene en memoria una ventana de
+    ~`window` caracteres: al llenarse se parte, se emiten todos los chunks
+    salvo el último, y ese último (posiblemente incompleto) se conserva
+    como inicio de la ventana siguiente. El traslape entre ventanas se
+    preserva porque el texto conservado vuelve a partirse junto con el nuevo.
+    """
+    window = window or chunk_size * 8
+    splitter = _make_splitter(chunk_size, chunk_overlap)
+    buffer = ""
+
+    for segment in segments:
+        if not segment:
+            continue
+        buffer = f"{buffer}\n{segment}" if buffer else segment
+        if len(buffer) < window:
+            continue
+
+        chunks = [c.strip() for c in splitter.split_text(buffer) if c.strip()]
+        if len(chunks) < 2:
+            continue
+
+        yield from chunks[:-1]
+        tail = buffer.rfind(chunks[-1])
+        buffer = buffer[tail:] if tail >= 0 else chunks[-1]
+
+    if buffer:
+        yield from (c.strip() for c in splitter.split_text(buffer) if c.strip())
+
+
+def chunk_rows(
+    rows: Iterable[tuple[str, int, str]],
+    chunk_size: int = 800
+) -> Iterator[tuple[str, dict]]:
+    """
+    Chunks de hoja de cálculo a partir de filas (hoja, número, texto) en
+    streaming: agrupa filas consecutivas de una misma hoja hasta
+    ~`chunk_size` caracteres sin partir filas. La primera fila de cada hoja
+    se toma como encabezado y se repite (acortada a chunk_size/4) al inicio
+    de los chunks siguientes, para que cada chunk se entienda solo.
+
+    Una fila que sola no entra en el chunk (una celda admite 32k
+    caracteres) se parte con el splitter recursivo; cada pieza lleva el
+    título de hoja y fila y el encabezado, así ningún chunk supera el
+    límite de tokens del proveedor de embeddings.
+
+    Devuelve (texto, {"sheet", "row_start", "row_end"}).
+    """
+    sheet, header, header_row = None, "", None
+    block, size, start, end = [], 0, None, None
+    splitters = {}
+
+    def emit(lines, first, last, label=None):
+        title = label or f"filas {first}-{last}"
+        head = [f"--- HOJA: {sheet} ({title}) ---"]
+        if first != header_row:
+            head.append(header)
+        return "\n".join(head + lines), {"sheet": sheet, "row_start": first, "row_end": last}
+
+    for row_sheet, row, line in rows:
+        if row_sheet != sheet:
+            if block:
+                yield emit(block, start, end)
+                block = []
+            sheet, header_row = row_sheet, row
+            limit = chunk_size // 4
+            header = line if len(line) <= limit else line[:limit] + "…"
+
+        budget = chunk_size - len(header)
+        if block and size + len(line) > budget:
+            yield emit(block, start, end)
+            block = []
+
+        if len(line) > budget:
+            if budget not in splitters:
+                splitters[budget] = _make_splitter(budget, budget // 5)
+            pieces = [p.strip() for p in splitters[budget].split_text(line) if p.strip()]
+            for i, piece in enumerate(pieces, start=1):
+                yield emit([piece], row, row, label=f"fila {row}, parte {i}/{len(pieces)}")
+            continue
+
+        if not block:
+            size, start = 0, row
+        block.append(line)
+        size += len(line) + 1
+        end = row
+
+    if block:
+        yield emit(block, start, end)
@@ -1,10 +1,197 @@
 # app/utils/pdf_utils.py
 
-import pymupdf as fitz
+import math
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
 from pathlib import Path
+from app.core.config import settings
 from app.core.logger import logger
 
 
+def process_pdf(file_path: str, executor=None) -> dict:
+    """
+    Recorre el PDF UNA sola vez y devuelve, a partir de los mismos
+    resultados por página:
+        - text:   texto de todas las páginas (sin limpiar)
+        - pages:  número de páginas
+        - blocks: layout por bloques (page, x0, y0, x1, y1, texto, block_no, tipo)
+        - links:  hipervínculos (con su página)
+        - images: metadata de imágenes (ver analyze_pdf_images)
+
+    Para no acumular el documento completo, usar iter_pdf_pages.
+    """
+    result = _merge(iter_pdf_pages(file_path, executor=executor))
+    logger.info(f"PDF procesado: {result['pages']} páginas, {len(result['images'])} imágenes detectadas.")
+    return result
+
+
+def iter_pdf_pages(file_path: str, executor=None) -> Iterator[dict]:
+    """
+    Genera las páginas procesadas en orden, de forma perezosa:
+        {"page", "text", "blocks", "links", "images"}
+
+    Por página se construye un único TextPage que comparten la extracción
+    de texto, los bloques y la búsqueda de captions.
+
+    Desde PDF_PARALLEL_MIN_PAGES páginas, los rangos de páginas se reparten
+    en un pool de procesos (`executor` o uno propio); cada worker abre su
+    propio handle y los rangos se entregan en orden de página. Un PDF
+    corto con `executor` se procesa entero en un solo worker.
+    """
+    import pymupdf as fitz   # import perezoso: ~0.3 s al arrancar
+
+    doc = fitz.open(Path(file_path))
+
+    try:
+        pages = doc.page_count
+        workers = _page_workers(pages)
+
+        if workers > 1 or (executor is not None and not _in_pool_worker()):
+            doc.close()
+            step = max(1, settings.PDF_PAGES_PER_TASK) if workers > 1 else max(1, pages)
+            ranges = [(a, min(a + step, pages)) for a in range(0, pages, step)]
+            if workers > 1:
+                logger.info(f"PDF de {pages} páginas: {len(ranges)} rangos en {workers} procesos")
+            yield from _iter_sharded(str(file_path), ranges, workers, executor)
+        else:
+            for page_index in range(pages):
+                yield _process_page(doc[page_index], page_index + 1)
+    finally:
+        if not doc.is_closed:
+            doc.close()
+
+
+# ===============================================================
+# 📄 PROCESAMIENTO POR PÁGINAS
+# ===============================================================
+
+def _process_page(page, page_no: int) -> dict:
+    # Un solo análisis de layout por página (mismos flags que get_text)
+    import pymupdf as fitz
+
+    textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+    text1 = page.get_text("text", textpage=textpage)
+    blocks = _text_blocks(textpage)
+    del textpage
+
+    text2 = "\n".join([b[4] for b in blocks if isinstance(b, tuple) and len(b) > 4])
+
+    page_links = [_plain_link(link) for link in page.get_links() or []]
+
+    return {
+        "page": page_no,
+        # Escoger el más largo (mejor extracción)
+        "text": text1 if len(text1) > len(text2) else text2,
+        "blocks": [(page_no, *b) for b in blocks],
+        "links": [{**link, "page": page_no} for link in page_links],
+        "images": _page_images(page, page_no, blocks, page_links),
+    }
+
+
+def _text_blocks(textpage) -> list[tuple]:
+    """
+    Igual que get_text("blocks") (x0, y0, x1, y1, texto, block_no, tipo),
+    construido desde extractDICT: extractBLOCKS retiene memoria en cada
+    llamada (~12 KB por página) y en documentos largos crece sin límite.
+    """
+    blocks = []
+    for block in textpage.extractDICT()["blocks"]:
+        if block["type"] != 0:
+            continue
+        parts = []
+        for line in block["lines"]:
+            text = "".join(span["text"] for span in line["spans"])
+            if not text:
+                continue
+            parts.append(text)
+            # Como MuPDF: fin de línea salvo que la línea ya termine en "\n"
+            if not text.endswith("\n"):
+                parts.append("\n")
+        blocks.append((*block["bbox"], "".join(parts), block["number"], block["type"]))
+    return blocks
+
+
+def _process_range(file_path: str, start: int, stop: int) -> list[dict]:
+    """Tarea de un worker: abre su propio handle y procesa [start, stop)."""
+    import pymupdf as fitz
+
+    doc = fitz.open(file_path)
+    try:
+        return [_process_page(doc[i], i + 1) for i in range(start, stop)]
+    finally:
+        doc.close()
+
+
+def _merge(pages: Iterable[dict]) -> dict:
+    result = {"text": [], "pages": 0, "blocks": [], "links": [], "images": []}
+    for page in pages:
+        result["text"].append(page["text"])
+        result["pages"] += 1
+        result["blocks"].extend(page["blocks"])
+        result["links"].extend(page["links"])
+        result["images"].extend(page["images"])
+    result["text"] = "\n".join(result["text"])
+    return result
+
+
+def _in_pool_worker() -> bool:
+    """True dentro de un proceso hijo (no se anidan pools)."""
+    return multiprocessing.parent_process() is not None
+
+
+def _page_workers(pages: int) -> int:
+    """Procesos a usar para un PDF de `pages` páginas (1 → serial)."""
+    if pages < max(2, settings.PDF_PARALLEL_MIN_PAGES) or _in_pool_worker():
+        return 1
+    cap = settings.PDF_PARALLEL_WORKERS or os.cpu_count() or 1
+    shards = math.ceil(pages / max(1, settings.PDF_PAGES_PER_TASK))
+    return max(1, min(cap, shards))
+
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            # Sin fork: el proceso del servidor ya tiene hilos en marcha
+            methods = multiprocessing.get_all_start_methods()
+            _page_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_PARALLEL_WORKERS or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn"),
+            )
+    return _page_pool
+
+
+def _iter_sharded(file_path: str, ranges: list, workers: int, executor=None) -> Iterator[dict]:
+    """
+    Envía los rangos al pool con como máximo `workers` en vuelo: la memoria
+    queda acotada a esos rangos pendientes aunque el pool sea compartido
+    y más grande. Las páginas se entregan en orden.
+    """
+    executor = executor or _get_page_pool()
+    pending = deque()
+
+    try:
+        for start, stop in ranges:
+            if len(pending) >= max(1, workers):
+                yield from pending.popleft().result()
+            pending.append(executor.submit(_process_range, file_path, start, stop))
+
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
 def analyze_pdf_images(file_path: str):
     """
     Analiza imágenes dentro de un PDF y devuelve:
@@ -17,66 +204,55 @@ def analyze_pdf_images(file_path: str):
             caption: texto cercano a la imagen
             links: enlaces cercanos
     """
-
-    path = Path(file_path)
-
     try:
-        doc = fitz.open(path)
+        images_data = process_pdf(file_path)["images"]
     except Exception as e:
         logger.error(f"❌ No se pudo abrir PDF para análisis de imágenes: {e}")
         return 0, []
 
-    images_data = []
-
-    for page_index, page in enumerate(doc):
-
-        # Lista de imágenes encontradas en la página
-        img_list = page.get_images(full=True)
-
-        # Texto dividido en bloques para buscar captions
-        text_blocks = page.get_text("blocks") or []
-
-        # Links detectados en la página
-        page_links = page.get_links() or []
-
-        for img_index, img in enumerate(img_list):
-
-            # xref es el identificador interno de la imagen
-            xref = img[0]
-
-            try:
-                img_data = doc.extract_image(xref)
-                width = img_data.get("width")
-                height = img_data.get("height")
-            except Exception:
-                width, height = None, None
-
-            # Bounding box
-            try:
-                bbox = page.get_image_bbox(img)
-                bbox = tuple(map(float, bbox))
-            except Exception:
-                bbox = (0.0, 0.0, 0.0, 0.0)
-
-            # Caption cercana
-            caption = _extract_caption_near_bbox(bbox, text_blocks)
+    return len(images_data), images_data
 
-            # Links cercanos
-            related_links = _find_links_near_bbox(bbox, page_links)
 
-            images_data.append({
-                "page": page_index + 1,
-                "image_index": img_index,
-                "width": width,
-                "height": height,
-                "bbox": bbox,
-                "caption": caption,
-                "links": related_links,
-                "xref": xref,
-            })
+def _page_images(page, page_no: int, text_blocks: list, page_links: list) -> list:
+    images_data = []
 
-    logger.info(f"PDF analizado: {len(images_data)} imágenes detectadas.")
-    return len(images_data), images_data
+    # full=True → (xref, smask, width, height, bpc, colorspace, ...):
+    # las dimensiones vienen en la tabla, sin decodificar la imagen
+    for img_index, img in enumerate(page.get_images(full=True)):
+
+        # xref es el identificador interno de la imagen
+        xref = img[0]
+        width, height = img[2], img[3]
+
+        # Bounding box
+        try:
+            bbox = page.get_image_bbox(img)
+            bbox = tuple(map(float, bbox))
+        except Exception:
+            bbox = (0.0, 0.0, 0.0, 0.0)
+
+        images_data.append({
+            "page": page_no,
+            "image_index": img_index,
+            "width": width,
+            "height": height,
+            "bbox": bbox,
+            "caption": _extract_caption_near_bbox(bbox, text_blocks),
+            "links": _find_links_near_bbox(bbox, page_links),
+            "xref": xref,
+        })
+
+    return images_data
+
+
+def _plain_link(link: dict) -> dict:
+    """Rect/Point de PyMuPDF → tuplas (serializables y picklables)."""
+    import pymupdf as fitz
+
+    return {
+        k: tuple(map(float, v)) if isinstance(v, (fitz.Rect, fitz.Point)) else v
+        for k, v in link.items()
+    }
 
 
 # ===============================================================
@@ -1,14 +1,20 @@
 # app/utils/text_extract.py
+import json
 import re
 from pathlib import Path
 import mimetypes
-import pymupdf as fitz          # PDF
-import docx
 import email
+import zipfile
+from typing import Iterator
 from email import policy
-import extract_msg              # Outlook .msg
-import openpyxl                 # Excel
+from email.parser import BytesFeedParser
+from xml.etree.ElementTree import iterparse
+from app.core.config import settings
 from app.core.logger import logger
+from app.utils.pdf_utils import process_pdf
+
+# Formatos con extracción de texto (las imágenes no: OCR desactivado)
+TEXT_EXTENSIONS = {".pdf", ".docx", ".txt", ".xlsx", ".eml", ".msg"}
 
 
 # ============================================================================
@@ -92,33 +98,14 @@ def extract_text(file_path: str) -> str:
 # PDF — PyMuPDF
 # ============================================================================
 def extract_text_pdf(path: Path) -> str:
-    doc = fitz.open(path)
-    final_text = []
-
-    try:
-        for page in doc:
-            # Primera pasada — texto normal
-            text1 = page.get_text("text")
-
-            # Segunda pasada — bloques (más robusto)
-            blocks = page.get_text("blocks")
-            text2 = "\n".join([b[4] for b in blocks if isinstance(b, tuple) and len(b) > 4])
-
-            # Escoger el más largo (mejor extracción)
-            best = text1 if len(text1) > len(text2) else text2
-
-            final_text.append(best)
-
-    finally:
-        doc.close()
-
-    return clean_text("\n".join(final_text))
+    return clean_text(process_pdf(path)["text"])
 
 
 # ============================================================================
 # DOCX
 # ============================================================================
 def extract_text_docx(path: Path) -> str:
+    import docx
     doc = docx.Document(path)
     paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
     return clean_text("\n".join(paragraphs))
@@ -132,20 +119,72 @@ def extract_text_txt(path: Path) -> str:
 
 
 # ============================================================================
-# EXCEL (.xlsx)
+# EXCEL (.xlsx) — streaming (openpyxl read_only)
 # ============================================================================
+def iter_excel_rows(path: Path, max_rows: int | None = None,
+                    max_cells: int | None = None) -> Iterator[tuple[str, int, str]]:
+    """
+    Filas no vacías como (hoja, número de fila, "v1 | v2 | ..."). El XML
+    de cada hoja se lee en streaming: la memoria no crece con el número de
+    filas. max_rows: filas por hoja; max_cells: celdas por fila (0 / None
+    = sin límite).
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            # Algunas exportaciones declaran mal el rango usado: leer todas las filas
+            ws.reset_dimensions()
+            n = 0
+            for row_number, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                values = [str(cell).strip() for cell in row if cell is not None]
+                if not values:
+                    continue
+                if max_cells:
+                    values = values[:max_cells]
+                yield ws.title, row_number, " | ".join(values)
+                n += 1
+                if max_rows and n >= max_rows:
+                    logger.warning(f"⚠️ Hoja '{ws.title}': límite de {max_rows} filas alcanzado")
+                    break
+    finally:
+        wb.close()
+
+
+def spool_excel_rows(path: str, out_path: str, max_rows: int | None = None,
+                     max_cells: int | None = None) -> int:
+    """
+    Escribe las filas de iter_excel_rows en `out_path` (JSONL, una por
+    línea). Pensado para correr en el pool de procesos: el parseo del XML
+    queda fuera del proceso del servidor y la memoria sigue acotada.
+    """
+    n = 0
+    with open(out_path, "w", encoding="utf-8") as f:
+        for item in iter_excel_rows(Path(path), max_rows, max_cells):
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def read_spooled_rows(path: str) -> Iterator[tuple[str, int, str]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            sheet, row, text = json.loads(line)
+            yield sheet, row, text
+
+
 def extract_text_excel(path: Path) -> str:
-    wb = openpyxl.load_workbook(path, data_only=True)
     content = []
+    current = None
 
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        content.append(f"\n--- HOJA: {sheet} ---\n")
-
-        for row in ws.iter_rows(values_only=True):
-            values = [str(cell).strip() for cell in row if cell is not None]
-            if values:
-                content.append(" | ".join(values))
+    for sheet, _, line in iter_excel_rows(
+        path, settings.XLSX_MAX_ROWS_PER_SHEET, settings.XLSX_MAX_CELLS_PER_ROW
+    ):
+        if sheet != current:
+            content.append(f"\n--- HOJA: {sheet} ---\n")
+            current = sheet
+        content.append(line)
 
     return clean_text("\n".join(content))
 
@@ -185,6 +224,7 @@ CUERPO:
 # EMAILS — formato .msg (Outlook)
 # ============================================================================
 def extract_text_msg(path: Path) -> str:
+    import extract_msg              # Outlook .msg
     msg = extract_msg.Message(str(path))
 
     text = f"""
@@ -197,6 +237,163 @@ ASUNTO: {msg.subject}
     return clean_text(text)
 
 
+# ============================================================================
+# PREVIEW — lectura acotada (solo el inicio del archivo)
+# ============================================================================
+def extract_preview(file_path: str, max_chars: int | None = None) -> dict:
+    """
+    Texto del inicio del documento para vistas previas, sin procesar el
+    archivo completo: PDF → primeras PREVIEW_MAX_PAGES páginas, DOCX →
+    primeros PREVIEW_MAX_PARAGRAPHS párrafos (XML en streaming), XLSX →
+    primeras PREVIEW_MAX_ROWS filas (openpyxl read_only), TXT / EML →
+    primeros PREVIEW_MAX_BYTES bytes (encabezados + primera parte de
+    texto), MSG → encabezados y cuerpo sin cargar adjuntos.
+
+    Devuelve {"text": texto limpio (≤ max_chars), "truncated": True si
+    quedó contenido sin leer}.
+    """
+    path = Path(file_path)
+    suffix = path.suffix.lower()
+    max_chars = max_chars or settings.PREVIEW_SAMPLE_CHARS
+
+    readers = {
+        ".pdf": _preview_pdf,
+        ".docx": _preview_docx,
+        ".xlsx": _preview_excel,
+        ".txt": _preview_txt,
+        ".eml": _preview_eml,
+        ".msg": _preview_msg,
+    }
+    reader = readers.get(suffix)
+    if reader is None:
+        return {"text": extract_text(file_path)[:max_chars], "truncated": False}
+
+    try:
+        text, truncated = reader(path, max_chars)
+    except Exception as e:
+        logger.error(f"❌ Error en vista previa de {file_path}: {e}")
+        return {"text": "", "truncated": False}
+
+    text = clean_text(text)
+    return {"text": text[:max_chars], "truncated": truncated or len(text) > max_chars}
+
+
+def _preview_pdf(path: Path, max_chars: int) -> tuple[str, bool]:
+    import pymupdf as fitz
+
+    with fitz.open(path) as doc:
+        parts, size, pages = [], 0, 0
+        for page in doc.pages(0, min(doc.page_count, settings.PREVIEW_MAX_PAGES)):
+            text = page.get_text("text")
+            parts.append(text)
+            size += len(text)
+            pages += 1
+            if size >= max_chars:
+                break
+        return "\n".join(parts), pages < doc.page_count
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _preview_docx(path: Path, max_chars: int) -> tuple[str, bool]:
+    # word/document.xml en streaming: python-docx construiría el árbol completo
+    parts, size = [], 0
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as xml:
+        for _, el in iterparse(xml, events=("end",)):
+            if el.tag != _W + "p":
+                continue
+            text = "".join(t.text or "" for t in el.iter(_W + "t"))
+            el.clear()
+            if not text.strip():
+                continue
+            parts.append(text)
+            size += len(text)
+            if len(parts) >= settings.PREVIEW_MAX_PARAGRAPHS or size >= max_chars:
+                return "\n".join(parts), True
+    return "\n".join(parts), False
+
+
+def _preview_excel(path: Path, max_chars: int) -> tuple[str, bool]:
+    rows = iter_excel_rows(path, max_cells=settings.XLSX_MAX_CELLS_PER_ROW)
+    parts, size, current = [], 0, None
+    try:
+        for n, (sheet, _, line) in enumerate(rows, start=1):
+            if sheet != current:
+                parts.append(f"\n--- HOJA: {sheet} ---\n")
+                current = sheet
+            parts.append(line)
+            size += len(line)
+            if n >= settings.PREVIEW_MAX_ROWS or size >= max_chars:
+                return "\n".join(parts), True
+        return "\n".join(parts), False
+    finally:
+        rows.close()
+
+
+def _read_head(path: Path) -> tuple[bytes, bool]:
+    with open(path, "rb") as f:
+        data = f.read(settings.PREVIEW_MAX_BYTES + 1)
+    return data[:settings.PREVIEW_MAX_BYTES], len(data) > settings.PREVIEW_MAX_BYTES
+
+
+def _preview_txt(path: Path, max_chars: int) -> tuple[str, bool]:
+    data, truncated = _read_head(path)
+    return data.decode("utf-8", errors="ignore"), truncated
+
+
+def _preview_eml(path: Path, max_chars: int) -> tuple[str, bool]:
+    # Los adjuntos suelen ir después del cuerpo: basta el inicio del archivo
+    data, truncated = _read_head(path)
+    parser = BytesFeedParser(policy=policy.default)
+    parser.feed(data)
+    msg = parser.close()
+
+    body = ""
+    for content_type in ("text/plain", "text/html"):
+        for part in msg.walk():
+            if part.get_content_type() != content_type or part.is_attachment():
+                continue
+            try:
+                payload = part.get_payload(decode=True) or b""
+                body = payload.decode(part.get_content_charset() or "utf-8", errors="ignore")
+            except Exception:
+                continue
+            if content_type == "text/html":
+                body = re.sub(r"<[^>]+>", " ", body)
+            break
+        if body:
+            break
+
+    text = f"""
+DE: {msg.get("from", "")}
+PARA: {msg.get("to", "")}
+ASUNTO: {msg.get("subject", "")}
+
+CUERPO:
+{body[:max_chars]}
+"""
+    return text, truncated
+
+
+def _preview_msg(path: Path, max_chars: int) -> tuple[str, bool]:
+    import extract_msg
+
+    msg = extract_msg.Message(str(path), delayAttachments=True)
+    try:
+        body = msg.body or ""
+        text = f"""
+DE: {msg.sender}
+PARA: {msg.to}
+ASUNTO: {msg.subject}
+
+{body[:max_chars]}
+"""
+        return text, len(body) > max_chars
+    finally:
+        msg.close()
+
+
 # ============================================================================
 # TEXT CLEANER
 # ============================================================================
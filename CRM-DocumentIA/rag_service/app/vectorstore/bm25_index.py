@@ -0,0 +1,505 @@
+# app/vectorstore/bm25_index.py
+
+import json
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# Campos de metadata filtrables (mismos que el índice vectorial local)
+FILTER_FIELDS = ("provider", "doc_type", "document_id")
+
+_INITIAL_CAPACITY = 1024
+_SQL_VARS = 900   # parámetros por sentencia (límite conservador de SQLite)
+_SMALL = 64       # listas cortas: bucle Python (el overhead de NumPy domina)
+
+
+# ============================================================
+# Tokenización
+# ============================================================
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Códigos con separadores: NIT 900.123.456-7, FAC-2024-001, 12/05/2024
+_CODE_RE = re.compile(r"[a-z0-9]+(?:[.\-/_][a-z0-9]+)+")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+_QUOTED_RE = re.compile(r"\"([^\"]+)\"|“([^”]+)”")
+
+_STOPWORDS = frozenset(
+    "al con de del el en es la las le lo los me mi no nos se si su sus un una uno unos "
+    "por para que y o u a e the of and to in".split()
+)
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin tildes (á → a, ñ → n)."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return text.encode("ascii", "ignore").decode("ascii")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Palabras normalizadas, sin stopwords. Los códigos con separadores y
+    dígitos se indexan además unidos ("900.123.456-7" → "9001234567"),
+    así una factura o un NIT coinciden aunque se escriban distinto.
+    """
+    folded = _fold(text)
+    tokens = [t for t in _WORD_RE.findall(folded) if len(t) > 1 and t not in _STOPWORDS]
+    for code in _CODE_RE.findall(folded):
+        if any(c.isdigit() for c in code):
+            tokens.append(_NON_ALNUM_RE.sub("", code))
+    return tokens
+
+
+def exact_terms(query: str) -> set[str]:
+    """
+    Términos que la consulta pide de forma literal: identificadores con
+    dígitos (facturas, NIT, códigos de contrato; no años sueltos) y
+    frases entre comillas.
+    """
+    terms = {t for t in tokenize(query) if len(t) >= 5 and any(c.isdigit() for c in t)}
+    for groups in _QUOTED_RE.findall(query):
+        terms.update(tokenize(" ".join(groups)))
+    return terms
+
+
+# ============================================================
+# Postings comprimidos (VByte vectorizado)
+# ============================================================
+def vbyte_encode(values: np.ndarray) -> bytes:
+    """
+    Enteros no negativos en VByte: 7 bits por byte, menos
+    significativos primero; el bit alto indica que sigue otro byte.
+    """
+    if len(values) < _SMALL:
+        out = bytearray()
+        for v in values:
+            v = int(v)
+            while v >= 0x80:
+                out.append((v & 0x7F) | 0x80)
+                v >>= 7
+            out.append(v)
+        return bytes(out)
+
+    v = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(v), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        nbytes += v >= (1 << shift)
+    ends = np.cumsum(nbytes)
+    starts = ends - nbytes
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+    for k in range(int(nbytes.max())):
+        sel = nbytes > k
+        cont = (nbytes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + k] = ((v[sel] >> np.uint64(7 * k)) & np.uint64(0x7F)) | cont
+    return out.tobytes()
+
+
+def vbyte_decode(data: bytes) -> np.ndarray:
+    if len(data) < _SMALL:
+        values, value, shift = [], 0, 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+            else:
+                values.append(value)
+                value, shift = 0, 0
+        return np.array(values, dtype=np.int64)
+
+    b = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero((b & 0x80) == 0)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = ((np.arange(len(b)) - starts[group]) * 7).astype(np.uint64)
+    values = (b & 0x7F).astype(np.uint64) << shifts
+    return np.add.reduceat(values, starts).astype(np.int64)
+
+
+def encode_postings(rows, tfs) -> bytes:
+    """Filas ordenadas → deltas en VByte, seguidas de las frecuencias."""
+    if len(rows) < _SMALL:
+        deltas = [b - a for a, b in zip([0, *rows[:-1]], rows)]
+    else:
+        deltas = np.diff(rows, prepend=0)
+    return vbyte_encode(deltas) + vbyte_encode(tfs)
+
+
+def decode_postings(data: bytes, n: int) -> tuple[np.ndarray, np.ndarray]:
+    values = vbyte_decode(data)
+    return np.cumsum(values[:n]), values[n:]
+
+
+# ============================================================
+# Índice BM25 persistente
+# ============================================================
+class BM25Index:
+    """
+    Índice invertido BM25 sobre los mismos chunks que el índice vectorial,
+    persistido en SQLite (WAL):
+      - docs     → una fila por chunk: longitud, filtros y metadata (JSON)
+      - postings → por término, segmentos de postings comprimidos
+                   (deltas de fila + tf en VByte)
+
+    Cada add() escribe un segmento nuevo por término; cuando un término
+    acumula más de BM25_MAX_SEGMENTS segmentos se fusionan en uno,
+    descartando las filas borradas. Las filas no se reutilizan
+    (AUTOINCREMENT): un posting de un chunk borrado simplemente no
+    coincide con ninguna fila viva.
+
+    En memoria solo quedan arrays por fila (longitud, vivo, códigos de
+    filtro); los postings se leen de SQLite por consulta.
+    """
+
+    def __init__(self, path: Path, k1: float = 1.2, b: float = 0.75, max_segments: int = 8):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max(1, max_segments)
+
+        self._lock = threading.Lock()         # arrays en memoria
+        self._write_lock = threading.Lock()   # conexión de escritura
+        self._read_lock = threading.Lock()    # conexión de lectura (WAL: no bloquea al escritor)
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                row INTEGER PRIMARY KEY AUTOINCREMENT,
+                chunk_id TEXT NOT NULL UNIQUE,
+                length INTEGER NOT NULL,
+                provider TEXT,
+                doc_type TEXT,
+                document_id TEXT,
+                metadata TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                segment INTEGER NOT NULL,
+                n INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (term, segment)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+        self._reader = sqlite3.connect(str(self.path), check_same_thread=False)
+
+        self.length = np.zeros(_INITIAL_CAPACITY, dtype=np.float32)
+        self.alive = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+        self.codes = {f: np.zeros(_INITIAL_CAPACITY, dtype=np.int32) for f in FILTER_FIELDS}
+        self.vocab: dict[str, dict] = {f: {} for f in FILTER_FIELDS}
+        self.count = 0
+        self.total_length = 0.0
+        self._load()
+
+    # ---------- estado en memoria ----------
+    def _grow(self, needed: int):
+        if needed <= len(self.alive):
+            return
+        # Arrays nuevos (no resize en sitio): las búsquedas en curso conservan los anteriores
+        extra = max(needed, len(self.alive) * 2) - len(self.alive)
+        self.length = np.concatenate([self.length, np.zeros(extra, np.float32)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, bool)])
+        self.codes = {f: np.concatenate([c, np.zeros(extra, np.int32)]) for f, c in self.codes.items()}
+
+    def _code(self, field: str, value) -> int:
+        if value is None:
+            return 0
+        vocab = self.vocab[field]
+        if value not in vocab:
+            vocab[value] = len(vocab) + 1   # 0 = sin valor
+        return vocab[value]
+
+    def _set_row(self, row: int, length: int, metadata: dict):
+        self._grow(row + 1)
+        self.length[row] = length
+        self.alive[row] = True
+        for f in FILTER_FIELDS:
+            self.codes[f][row] = self._code(f, metadata.get(f))
+        self.count += 1
+        self.total_length += length
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT row, length, provider, doc_type, document_id FROM docs"
+        ).fetchall()
+        with self._lock:
+            for row, length, provider, doc_type, document_id in rows:
+                self._set_row(row, length, {"provider": provider, "doc_type": doc_type,
+                                            "document_id": document_id})
+
+    # ---------- escritura ----------
+    def add(self, docs: Iterable[tuple[str, str, dict]]) -> int:
+        """
+        Indexa (chunk_id, texto, metadata). Los chunk_id ya indexados no se
+        re-tokenizan (los ids derivan del contenido); solo se actualiza su
+        metadata si cambió (posición, nombre de archivo). Devuelve cuántos
+        se agregaron.
+        """
+        docs = list(docs)
+        if not docs:
+            return 0
+
+        with self._write_lock:
+            existing: dict[str, tuple[int, str]] = {}
+            ids = [d[0] for d in docs]
+            for i in range(0, len(ids), _SQL_VARS):
+                part = ids[i:i + _SQL_VARS]
+                existing.update((chunk_id, (row, blob)) for chunk_id, row, blob in self._conn.execute(
+                    f"SELECT chunk_id, row, metadata FROM docs WHERE chunk_id IN ({','.join('?' * len(part))})",
+                    part
+                ))
+
+            added = []
+            updated = []
+            postings: dict[str, list] = defaultdict(list)
+            with self._conn:
+                for chunk_id, text, metadata in docs:
+                    blob = json.dumps(metadata, ensure_ascii=False)
+                    if chunk_id in existing:
+                        row, old = existing[chunk_id]
+                        if old != blob:
+                            self._conn.execute(
+                                "UPDATE docs SET provider = ?, doc_type = ?, document_id = ?, metadata = ? "
+                                "WHERE row = ?",
+                                (metadata.get("provider"), metadata.get("doc_type"),
+                                 metadata.get("document_id"), blob, row)
+                            )
+                            existing[chunk_id] = (row, blob)
+                            updated.append((row, metadata))
+                        continue
+                    counts = Counter(tokenize(text))
+                    length = sum(counts.values())
+                    row = self._conn.execute(
+                        "INSERT INTO docs (chunk_id, length, provider, doc_type, document_id, metadata) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (chunk_id, length, metadata.get("provider"), metadata.get("doc_type"),
+                         metadata.get("document_id"), blob)
+                    ).lastrowid
+                    existing[chunk_id] = (row, blob)
+                    added.append((row, length, metadata))
+                    for term, tf in counts.items():
+                        postings[term].append((row, tf))
+
+                if added:
+                    segment = added[0][0]   # filas crecientes: los segmentos quedan en orden
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, segment, n, data) VALUES (?, ?, ?, ?)",
+                        (
+                            (term, segment, len(plist),
+                             encode_postings([r for r, _ in plist], [tf for _, tf in plist]))
+                            for term, plist in postings.items()
+                        )
+                    )
+                    self._merge_segments(list(postings), [row for row, _, _ in added])
+
+            with self._lock:
+                for row, length, metadata in added:
+                    self._set_row(row, length, metadata)
+                for row, metadata in updated:
+                    for f in FILTER_FIELDS:
+                        self.codes[f][row] = self._code(f, metadata.get(f))
+
+        return len(added)
+
+    def _merge_segments(self, terms: list[str], new_rows: list[int]):
+        """Fusiona los términos con demasiados segmentos (dentro de la transacción de add)."""
+        crowded = []
+        for i in range(0, len(terms), _SQL_VARS):
+            part = terms[i:i + _SQL_VARS]
+            crowded.extend(r[0] for r in self._conn.execute(
+                f"SELECT term FROM postings WHERE term IN ({','.join('?' * len(part))}) "
+                "GROUP BY term HAVING COUNT(*) > ?", (*part, self.max_segments)
+            ))
+
+        if not crowded:
+            return
+
+        # Filas vivas: las del índice más las recién insertadas (aún sin confirmar)
+        with self._lock:
+            alive = np.zeros(max(len(self.alive), new_rows[-1] + 1), dtype=bool)
+            alive[:len(self.alive)] = self.alive
+        alive[new_rows] = True
+
+        for term in crowded:
+            segments = self._conn.execute(
+                "SELECT n, data FROM postings WHERE term = ? ORDER BY segment", (term,)
+            ).fetchall()
+            rows, tfs = _concat(decode_postings(data, n) for n, data in segments)
+            keep = alive[rows]
+            rows, tfs = rows[keep], tfs[keep]
+            self._conn.execute("DELETE FROM postings WHERE term = ?", (term,))
+            if len(rows):
+                self._conn.execute(
+                    "INSERT INTO postings (term, segment, n, data) VALUES (?, ?, ?, ?)",
+                    (term, int(rows[0]), len(rows), encode_postings(rows, tfs))
+                )
+
+    def delete(self, chunk_ids: list[str]) -> int:
+        """Borra chunks; sus postings se descartan en la próxima fusión del término."""
+        removed = []
+        with self._write_lock, self._conn:
+            for i in range(0, len(chunk_ids), _SQL_VARS):
+                part = chunk_ids[i:i + _SQL_VARS]
+                marks = ",".join("?" * len(part))
+                removed.extend(r[0] for r in self._conn.execute(
+                    f"SELECT row FROM docs WHERE chunk_id IN ({marks})", part
+                ))
+                self._conn.execute(f"DELETE FROM docs WHERE chunk_id IN ({marks})", part)
+
+            with self._lock:
+                for row in removed:
+                    if self.alive[row]:
+                        self.alive[row] = False
+                        self.count -= 1
+                        self.total_length -= float(self.length[row])
+        return len(removed)
+
+    # ---------- búsqueda ----------
+    def _postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        with self._read_lock:
+            segments = self._reader.execute(
+                "SELECT n, data FROM postings WHERE term = ? ORDER BY segment", (term,)
+            ).fetchall()
+        return _concat(decode_postings(data, n) for n, data in segments)
+
+    def search(self, query: str, top_k: int = 10, filters: Optional[dict] = None) -> list[dict]:
+        """
+        Top-k por BM25. `filters` = {campo: valor} sobre provider /
+        doc_type / document_id. Los hits que contienen todos los términos
+        literales de la consulta (ver exact_terms) llevan "exact_match".
+        """
+        terms = set(tokenize(query))
+        if not terms or top_k <= 0:
+            return []
+        literal = exact_terms(query) & terms
+
+        postings = {term: self._postings(term) for term in terms}
+
+        with self._lock:
+            if not self.count:
+                return []
+            alive, length, codes = self.alive, self.length, self.codes
+            n_docs, avgdl = self.count, self.total_length / self.count
+            wanted = {}
+            for field, value in (filters or {}).items():
+                if value is None:
+                    continue
+                code = self.vocab[field].get(value)
+                if code is None:
+                    return []
+                wanted[field] = code
+
+        all_rows, all_scores, literal_rows = [], [], []
+        for term, (rows, tfs) in postings.items():
+            rows_ok = rows < len(alive)
+            rows, tfs = rows[rows_ok], tfs[rows_ok]
+            live = alive[rows]
+            for field, code in wanted.items():
+                live &= codes[field][rows] == code
+            rows, tfs = rows[live], tfs[live].astype(np.float32)
+            if not len(rows):
+                continue
+
+            df = len(rows)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * length[rows] / avgdl)
+            all_rows.append(rows)
+            all_scores.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+            if term in literal:
+                literal_rows.append(rows)
+
+        if not all_rows:
+            return []
+
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+
+        # Coincidencias literales primero, luego por puntaje BM25
+        exact = np.zeros(len(rows), dtype=bool)
+        if literal and len(literal_rows) == len(literal):
+            matched, counts = np.unique(np.concatenate(literal_rows), return_counts=True)
+            exact = np.isin(rows, matched[counts == len(literal)])
+        rank = scores + exact * (scores.max() + 1.0)
+
+        k = min(top_k, len(rows))
+        top = np.argpartition(-rank, k - 1)[:k]
+        top = top[np.argsort(-rank[top], kind="stable")]
+
+        return self._hits(rows[top], scores[top], exact[top])
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray, exact: np.ndarray) -> list[dict]:
+        wanted = [int(r) for r in rows]
+        with self._read_lock:
+            found = {
+                row: (chunk_id, metadata)
+                for row, chunk_id, metadata in self._reader.execute(
+                    f"SELECT row, chunk_id, metadata FROM docs WHERE row IN ({','.join('?' * len(wanted))})",
+                    wanted
+                )
+            }
+
+        hits = []
+        for row, score, is_exact in zip(wanted, scores, exact):
+            if row not in found:
+                continue   # borrado entre la búsqueda y la lectura
+            chunk_id, metadata = found[row]
+            hit = {"id": chunk_id, "score": float(score), "metadata": json.loads(metadata)}
+            if is_exact:
+                hit["exact_match"] = True
+            hits.append(hit)
+        return hits
+
+    def stats(self) -> dict:
+        with self._read_lock:
+            terms, segments, size = self._reader.execute(
+                "SELECT COUNT(DISTINCT term), COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM postings"
+            ).fetchone()
+        with self._lock:
+            return {"docs": self.count, "terms": terms, "segments": segments, "postings_bytes": size}
+
+
+def _concat(parts) -> tuple[np.ndarray, np.ndarray]:
+    parts = list(parts)
+    if not parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+# ============================
+# INSTANCIA GLOBAL (perezosa)
+# ============================
+_index: BM25Index | None = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> BM25Index | None:
+    """Devuelve el índice BM25 global o None si la recuperación híbrida está deshabilitada."""
+    global _index
+
+    if not settings.HYBRID_SEARCH:
+        return None
+
+    with _index_lock:
+        if _index is None:
+            path = settings.BM25_INDEX_DB or settings.STORAGE_DIR / "bm25.sqlite3"
+            _index = BM25Index(path, k1=settings.BM25_K1, b=settings.BM25_B,
+                               max_segments=settings.BM25_MAX_SEGMENTS)
+            logger.info(f"🔎 Índice BM25 en {path} ({_index.count} chunks)")
+
+    return _index
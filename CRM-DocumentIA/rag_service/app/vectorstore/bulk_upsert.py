@@ -0,0 +1,135 @@
+# app/vectorstore/bulk_upsert.py
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable
+
+from app.core.logger import logger
+
+
+# ============================================================
+# Partición en lotes acotados por tamaño
+# ============================================================
+def _estimate_bytes(item) -> int:
+    """
+    Tamaño aproximado del vector serializado en el request:
+    ~12 bytes por float en JSON + id + metadata.
+    """
+    vec_id, values, metadata = item
+    meta_size = len(json.dumps(metadata, ensure_ascii=False, default=str)) if metadata else 0
+    return len(values) * 12 + len(str(vec_id)) + meta_size + 32
+
+
+def split_batches(vectors: Iterable, max_vectors: int, max_bytes: int):
+    """
+    Genera lotes de (id, embedding, metadata) sin superar `max_vectors`
+    ni `max_bytes` por lote. Acepta cualquier iterable (incluido un generador).
+    """
+    batch = []
+    size = 0
+
+    for item in vectors:
+        item_size = _estimate_bytes(item)
+
+        if batch and (len(batch) >= max_vectors or size + item_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+
+        batch.append(item)
+        size += item_size
+
+    if batch:
+        yield batch
+
+
+# ============================================================
+# Upsert de un lote con reintentos
+# ============================================================
+def _upsert_batch(index, batch: list, batch_no: int, max_retries: int, backoff: float) -> dict:
+    attempts = max(1, max_retries)
+    t0 = time.time()
+
+    for attempt in range(1, attempts + 1):
+        try:
+            index.upsert(vectors=batch)
+            return {
+                "batch": batch_no,
+                "vectors": len(batch),
+                "attempts": attempt,
+                "elapsed_seconds": round(time.time() - t0, 3),
+                "status": "ok",
+            }
+        except Exception as e:
+            if attempt == attempts:
+                logger.error(f"❌ Lote {batch_no} falló tras {attempts} intentos: {e}")
+                return {
+                    "batch": batch_no,
+                    "vectors": len(batch),
+                    "attempts": attempt,
+                    "elapsed_seconds": round(time.time() - t0, 3),
+                    "status": "error",
+                    "error": str(e),
+                }
+
+            delay = backoff * (2 ** (attempt - 1))
+            logger.warning(
+                f"⚠️ Lote {batch_no} falló (intento {attempt}/{attempts}): {e}. Reintentando en {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+# ============================================================
+# Upsert masivo con concurrencia acotada
+# ============================================================
+def bulk_upsert(
+    index,
+    vectors: Iterable,
+    batch_size: int = 200,
+    max_bytes: int = 1_800_000,
+    max_concurrency: int = 4,
+    max_retries: int = 3,
+    backoff: float = 0.5,
+) -> dict:
+    """
+    Sube los vectores en lotes, con hasta `max_concurrency` requests en vuelo.
+
+    Backpressure: no se generan nuevos lotes mientras haya
+    `max_concurrency` pendientes, así un generador de entrada nunca se
+    materializa completo en memoria.
+
+    Devuelve estadísticas globales y por lote. Si algún lote falla tras
+    los reintentos se lanza RuntimeError (con las estadísticas en el mensaje).
+    """
+    t0 = time.time()
+    stats = []
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="upsert") as pool:
+        in_flight = set()
+
+        for batch_no, batch in enumerate(split_batches(vectors, batch_size, max_bytes)):
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                stats.extend(f.result() for f in done)
+
+            in_flight.add(pool.submit(_upsert_batch, index, batch, batch_no, max_retries, backoff))
+
+        for fut in in_flight:
+            stats.append(fut.result())
+
+    stats.sort(key=lambda s: s["batch"])
+    failed = [s for s in stats if s["status"] != "ok"]
+
+    summary = {
+        "upserted": sum(s["vectors"] for s in stats if s["status"] == "ok"),
+        "batches": len(stats),
+        "failed_batches": len(failed),
+        "retries": sum(s["attempts"] - 1 for s in stats),
+        "elapsed_seconds": round(time.time() - t0, 3),
+        "batch_stats": stats,
+    }
+
+    if failed:
+        raise RuntimeError(f"Upsert incompleto: {len(failed)} lotes fallaron ({summary})")
+
+    return summary
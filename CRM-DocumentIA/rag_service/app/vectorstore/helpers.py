@@ -31,11 +31,12 @@ def build_metadata(
     return base
 
 
-def generate_chunk_id(doc_id: str, chunk_index: int):
+def generate_chunk_id(doc_id: str, chunk_key):
     """
-    ID único para cada chunk.
+    ID único para cada chunk. chunk_key puede ser la posición o la huella
+    del contenido (ids estables entre re-ingestas).
     """
-    return f"{doc_id}_chunk_{chunk_index}"
+    return f"{doc_id}_chunk_{chunk_key}"
 
 
 def generate_doc_id():
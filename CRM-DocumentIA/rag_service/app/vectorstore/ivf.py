@@ -0,0 +1,217 @@
+# app/vectorstore/ivf.py
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from app.core.logger import logger
+
+
+# Celdas (filas x centroides) por bloque de puntajes: ~64 MB en float32
+_SCORE_BUDGET = 1 << 24
+
+
+def _block_rows(nlist: int) -> int:
+    return max(1, _SCORE_BUDGET // max(1, nlist))
+
+
+def nearest_centroids(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Centroide más cercano de cada fila, por bloques (memoria acotada)."""
+    out = np.empty(len(data), dtype=np.int32)
+    step = _block_rows(len(centroids))
+    for start in range(0, len(data), step):
+        block = np.asarray(data[start:start + step])
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+# ============================================================
+# K-means esférico (vectores normalizados, similitud coseno)
+# ============================================================
+def train_centroids(data: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Entrena `nlist` centroides unitarios sobre `data` (filas normalizadas).
+    Las asignaciones se calculan por bloques de filas: la matriz de
+    puntajes nunca supera _SCORE_BUDGET celdas.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(data))
+    centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+    step = _block_rows(nlist)
+
+    for _ in range(iterations):
+        sums = np.zeros_like(centroids)
+        counts = np.zeros(nlist, dtype=np.int64)
+        for start in range(0, len(data), step):
+            block = data[start:start + step]
+            assign = np.argmax(block @ centroids.T, axis=1)
+            np.add.at(sums, assign, block)
+            counts += np.bincount(assign, minlength=nlist)
+
+        # Listas vacías: se re-siembran con puntos aleatorios
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    return centroids
+
+
+# ============================================================
+# Índice IVF (inverted file) sobre la matriz del índice local
+# ============================================================
+class IVFIndex:
+    """
+    Cuantizador grueso IVF-Flat para LocalVectorIndex.
+
+    - Cada fila de la matriz se asigna a su centroide más cercano
+      (asignaciones en un memmap int32 alineado con las filas).
+    - La búsqueda examina solo las `nprobe` listas más cercanas a la
+      consulta; el puntaje final es exacto sobre esas filas.
+    - Los filtros de metadata llegan como máscara y se combinan con las
+      listas sondeadas ANTES de puntuar (no hay post-filtrado).
+
+    Se entrena al alcanzar `min_train` vectores y se re-entrena cuando el
+    índice crece `retrain_factor` veces desde el último entrenamiento.
+    El entrenamiento se divide en build() (puro, se puede correr fuera del
+    lock del índice) e install() (rápido, bajo el lock).
+    """
+
+    def __init__(self, directory: Path, nlist: int = 0, nprobe: int = 8,
+                 min_train: int = 10_000, retrain_factor: float = 4.0,
+                 max_train_sample: int = 100_000):
+        self.directory = Path(directory)
+        self.nlist_setting = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_factor = retrain_factor
+        self.max_train_sample = max_train_sample
+
+        self._centroids_path = self.directory / "ivf_centroids.npy"
+        self._state_path = self.directory / "ivf_state.json"
+        self._assign_path = self._assign_file(0)
+
+        self.centroids: np.ndarray | None = None
+        self.trained_on = 0
+        self.assign: np.ndarray | None = None
+
+        if self._centroids_path.exists() and self._state_path.exists():
+            self.centroids = np.load(self._centroids_path)
+            self.trained_on = json.loads(self._state_path.read_text())["trained_on"]
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, n_alive: int) -> bool:
+        if not self.trained:
+            return n_alive >= self.min_train
+        return n_alive >= self.trained_on * self.retrain_factor
+
+    # ---------- almacenamiento ----------
+    def _assign_file(self, generation: int) -> Path:
+        suffix = f".{generation}" if generation else ""
+        return self.directory / f"ivf_assign{suffix}.i32"
+
+    def use_generation(self, generation: int):
+        """Apunta a las asignaciones de `generation` (ver LocalVectorIndex.compact)."""
+        if self.assign is not None:
+            self.assign.flush()
+        self.assign = None
+        self._assign_path = self._assign_file(generation)
+
+    def write_compacted(self, live: np.ndarray, generation: int, capacity: int):
+        """Asignaciones de las filas `live`, renumeradas, en el archivo de `generation`."""
+        path = self._assign_file(generation)
+        with open(path, "wb") as f:
+            f.truncate(capacity * 4)
+        assign = np.memmap(path, dtype=np.int32, mode="r+", shape=(capacity,))
+        assign[:] = -1
+        if self.assign is not None and len(live):
+            assign[:len(live)] = self.assign[live]
+        assign.flush()
+
+    def ensure_capacity(self, capacity: int):
+        """Memmap de asignaciones alineado con la matriz (-1 = sin asignar)."""
+        if self.assign is not None and len(self.assign) >= capacity:
+            return
+
+        current = self._assign_path.stat().st_size // 4 if self._assign_path.exists() else 0
+        if current < capacity:
+            if self.assign is not None:
+                self.assign.flush()
+            with open(self._assign_path, "ab") as f:
+                f.truncate(capacity * 4)
+
+        self.assign = np.memmap(self._assign_path, dtype=np.int32, mode="r+",
+                                shape=(max(capacity, current),))
+        if current < capacity:
+            self.assign[current:] = -1
+
+    def _save_centroids(self):
+        np.save(self._centroids_path, self.centroids)
+        self._state_path.write_text(json.dumps({"trained_on": self.trained_on}))
+
+    # ---------- entrenamiento ----------
+    def build(self, matrix: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Centroides nuevos y asignación de `rows`, sin modificar el índice.
+        La muestra de entrenamiento se acota a min(n, 64·nlist, max_train_sample).
+        """
+        nlist = self.nlist_setting or max(16, int(4 * np.sqrt(len(rows))))
+
+        rng = np.random.default_rng(0)
+        size = min(len(rows), nlist * 64, self.max_train_sample)
+        sample = rows if size == len(rows) else np.sort(rng.choice(rows, size=size, replace=False))
+
+        logger.info(f"🧭 Entrenando IVF: nlist={nlist}, muestra={len(sample)}, vectores={len(rows)}")
+        centroids = train_centroids(np.asarray(matrix[sample]), nlist)
+
+        assign = np.empty(len(rows), dtype=np.int32)
+        step = _block_rows(len(centroids))
+        for start in range(0, len(rows), step):
+            part = rows[start:start + step]
+            assign[start:start + len(part)] = nearest_centroids(np.asarray(matrix[part]), centroids)
+        return centroids, assign
+
+    def install(self, centroids: np.ndarray, rows: np.ndarray, assign: np.ndarray):
+        """Publica el resultado de build()."""
+        self.centroids = centroids
+        self.trained_on = len(rows)
+        self._save_centroids()
+        self.assign[rows] = assign
+        self.assign.flush()
+
+    def train(self, matrix: np.ndarray, alive: np.ndarray):
+        """Entrenamiento sincrónico sobre todas las filas vivas."""
+        rows = np.flatnonzero(alive)
+        centroids, assign = self.build(matrix, rows)
+        self.install(centroids, rows, assign)
+
+    def add(self, rows, vecs: np.ndarray):
+        """Asigna filas nuevas o sobrescritas con los centroides actuales."""
+        if not self.trained:
+            return
+        self.assign[rows] = nearest_centroids(vecs, self.centroids)
+        self.assign.flush()
+
+    # ---------- búsqueda ----------
+    def candidates(self, q: np.ndarray, mask: np.ndarray, nprobe: int | None = None) -> np.ndarray:
+        """
+        Filas candidatas: máscara de filtros ∩ listas de los `nprobe`
+        centroides más cercanos a la consulta.
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        sims = self.centroids @ q
+        probe = np.argpartition(-sims, nprobe - 1)[:nprobe]
+
+        # Tabla de consulta por lista; la última posición cubre filas sin asignar (-1)
+        lut = np.zeros(len(self.centroids) + 1, dtype=bool)
+        lut[probe] = True
+
+        n = len(mask)
+        return np.flatnonzero(mask & lut[self.assign[:n]])
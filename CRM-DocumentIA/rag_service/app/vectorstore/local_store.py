@@ -0,0 +1,550 @@
+# app/vectorstore/local_store.py
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.vectorstore.ivf import IVFIndex
+
+# Campos de metadata con filtro vectorizado (códigos enteros por fila)
+FILTER_FIELDS = ("provider", "doc_type", "document_id")
+
+_INITIAL_CAPACITY = 1024
+_COPY_BLOCK = 65536   # filas por bloque al compactar
+
+
+# ============================================================
+# Índice local: matriz float32 en memmap + tabla de metadata
+# ============================================================
+class LocalVectorIndex:
+    """
+    Índice vectorial en proceso, persistido en `directory`:
+      - header.json   → dimensión y generación de los archivos
+      - vectors.f32   → matriz float32 [capacidad x dim] (memmap), vectores normalizados
+      - meta.jsonl    → log append-only de altas/bajas/cambios de metadata {op, id, row, metadata}
+
+    Las bajas solo marcan la fila como muerta y las sobrescrituras agregan
+    líneas al log; cuando la basura supera LOCAL_COMPACT_RATIO del log se
+    compacta (ver compact()).
+
+    La búsqueda es exacta por coseno (producto punto sobre vectores
+    normalizados) con top-k vía argpartition. Los filtros sobre
+    provider / doc_type / document_id se resuelven con máscaras NumPy.
+
+    Con `ann="ivf"` se añade un índice IVF (ver ivf.py) que restringe el
+    puntaje a las listas sondeadas; los filtros se aplican dentro de la
+    búsqueda, antes de puntuar. El IVF se entrena en un hilo aparte, fuera
+    del lock: mientras tanto las consultas siguen (exactas o con los
+    centroides anteriores) y el resultado se publica al terminar.
+    """
+
+    def __init__(self, directory: Path, dim: int | None = None, ann: str = "none"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._header_path = self.directory / "header.json"
+
+        self.ann = None
+        if ann == "ivf":
+            self.ann = IVFIndex(
+                self.directory,
+                nlist=settings.LOCAL_IVF_NLIST,
+                nprobe=settings.LOCAL_IVF_NPROBE,
+                min_train=settings.LOCAL_IVF_MIN_TRAIN,
+                max_train_sample=settings.LOCAL_IVF_TRAIN_SAMPLE,
+            )
+        self._training: threading.Thread | None = None
+        self._ann_dirty: set[int] = set()   # filas escritas durante un entrenamiento
+
+        generation = 0
+        if self._header_path.exists():
+            header = json.loads(self._header_path.read_text())
+            self.dim = header["dim"]
+            generation = header.get("generation", 0)
+            if dim is not None and dim != self.dim:
+                raise ValueError(
+                    f"Dimensión {dim} incompatible con el índice local existente ({self.dim})"
+                )
+        elif dim is None:
+            raise ValueError(f"El índice local '{self.directory.name}' no existe y no se indicó dimensión")
+        else:
+            self.dim = dim
+            self._header_path.write_text(json.dumps({"dim": dim}))
+
+        self._reset(generation)
+        self._open_matrix()
+        self._replay_log()
+
+    def _reset(self, generation: int):
+        """Estado vacío apuntando a los archivos de `generation` (0 = nombres originales)."""
+        suffix = f".{generation}" if generation else ""
+        self.generation = generation
+        if self.ann is not None:
+            self.ann.use_generation(generation)
+        self._vectors_path = self.directory / f"vectors{suffix}.f32"
+        self._meta_path = self.directory / f"meta{suffix}.jsonl"
+
+        self.ids: list[str | None] = []
+        self.metadata: list[dict | None] = []
+        self.id_to_row: dict[str, int] = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.codes = {f: np.zeros(0, dtype=np.int32) for f in FILTER_FIELDS}
+        self.vocab: dict[str, dict] = {f: {} for f in FILTER_FIELDS}
+        self._log_entries = 0
+
+    # ---------- almacenamiento ----------
+    @property
+    def size(self) -> int:
+        """Filas ocupadas (incluye filas borradas)."""
+        return len(self.ids)
+
+    @property
+    def count(self) -> int:
+        """Vectores vivos."""
+        return int(self.alive[:self.size].sum())
+
+    def _open_matrix(self, capacity: int | None = None):
+        row_bytes = self.dim * 4
+        current = self._vectors_path.stat().st_size // row_bytes if self._vectors_path.exists() else 0
+        capacity = max(capacity or 0, current, _INITIAL_CAPACITY)
+
+        if current < capacity:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+
+        self.capacity = capacity
+        self.matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        if self.ann is not None:
+            self.ann.ensure_capacity(capacity)
+
+        if len(self.alive) < capacity:
+            self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+            for f in FILTER_FIELDS:
+                pad = np.full(capacity - len(self.codes[f]), -1, dtype=np.int32)
+                self.codes[f] = np.concatenate([self.codes[f], pad])
+
+    def _grow(self, needed: int):
+        if needed <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+        self.matrix.flush()
+        del self.matrix
+        self._open_matrix(new_capacity)
+
+    def _code(self, field: str, value) -> int:
+        if value is None:
+            return -1
+        vocab = self.vocab[field]
+        key = str(value)
+        if key not in vocab:
+            vocab[key] = len(vocab)
+        return vocab[key]
+
+    def _set_row(self, row: int, vec_id: str, metadata: dict):
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.metadata.append(None)
+        self.ids[row] = vec_id
+        self.metadata[row] = metadata
+        self.id_to_row[vec_id] = row
+        self.alive[row] = True
+        for f in FILTER_FIELDS:
+            self.codes[f][row] = self._code(f, metadata.get(f))
+
+    def _delete_row(self, vec_id: str):
+        row = self.id_to_row.pop(vec_id, None)
+        if row is not None:
+            self.alive[row] = False
+            self.metadata[row] = None
+
+    def _replay_log(self):
+        if not self._meta_path.exists():
+            return
+
+        with open(self._meta_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Línea corrupta en meta.jsonl del índice local (ignorada)")
+                    continue
+
+                if entry["op"] == "put":
+                    self._grow(entry["row"] + 1)
+                    self._set_row(entry["row"], entry["id"], entry["metadata"])
+                elif entry["op"] == "del":
+                    self._delete_row(entry["id"])
+                elif entry["op"] == "meta" and entry["id"] in self.id_to_row:
+                    self._set_row(self.id_to_row[entry["id"]], entry["id"], entry["metadata"])
+                self._log_entries += 1
+
+        logger.info(f"📦 Índice local '{self.directory.name}' cargado: {self.count} vectores")
+
+        # Índice ANN sin entrenar pero con datos suficientes (p. ej. activado después)
+        if self.ann is not None and not self.ann.trained and self.ann.needs_training(self.count):
+            self._start_training()
+
+    # ---------- escritura ----------
+    def upsert(self, vectors) -> int:
+        """
+        vectors: iterable de (id, embedding, metadata).
+        Un id existente se sobrescribe en su misma fila.
+        """
+        items = list(vectors)
+        if not items:
+            return 0
+
+        mat = np.asarray([v for _, v, _ in items], dtype=np.float32)
+        if mat.ndim != 2 or mat.shape[1] != self.dim:
+            raise ValueError(f"Se esperaban vectores de dimensión {self.dim}, llegaron {mat.shape}")
+
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        mat /= norms
+
+        with self._lock:
+            rows = []
+            assigned: dict[str, int] = {}
+            next_row = self.size
+            for vec_id, _, _ in items:
+                row = self.id_to_row.get(vec_id, assigned.get(vec_id))
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                assigned[vec_id] = row
+                rows.append(row)
+
+            self._grow(next_row)
+            self.matrix[rows] = mat
+            self.matrix.flush()
+
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for (vec_id, _, metadata), row in zip(items, rows):
+                    metadata = dict(metadata or {})
+                    f.write(json.dumps({"op": "put", "id": vec_id, "row": row, "metadata": metadata},
+                                       ensure_ascii=False) + "\n")
+                    self._set_row(row, vec_id, metadata)
+            self._log_entries += len(items)
+
+            if self.ann is not None:
+                self.ann.add(rows, mat)
+                if self._training is not None:
+                    self._ann_dirty.update(rows)
+                elif self.ann.needs_training(self.count):
+                    self._start_training()
+
+            self._maybe_compact()
+
+        return len(items)
+
+    def delete(self, ids: list[str]) -> int:
+        with self._lock:
+            present = [i for i in ids if i in self.id_to_row]
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for vec_id in present:
+                    f.write(json.dumps({"op": "del", "id": vec_id}) + "\n")
+                    self._delete_row(vec_id)
+            self._log_entries += len(present)
+            self._maybe_compact()
+        return len(present)
+
+    def update_metadata(self, items: list[tuple[str, dict]]) -> int:
+        """Reemplaza la metadata de ids existentes sin tocar sus vectores."""
+        with self._lock:
+            present = [(vec_id, dict(metadata or {})) for vec_id, metadata in items
+                       if vec_id in self.id_to_row]
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for vec_id, metadata in present:
+                    f.write(json.dumps({"op": "meta", "id": vec_id, "metadata": metadata},
+                                       ensure_ascii=False) + "\n")
+                    self._set_row(self.id_to_row[vec_id], vec_id, metadata)
+            self._log_entries += len(present)
+            self._maybe_compact()
+        return len(present)
+
+    # ---------- compactación ----------
+    def _maybe_compact(self):
+        """
+        Compacta cuando las líneas del log que ya no describen un vector vivo
+        (bajas, altas borradas, versiones sobrescritas) superan la fracción
+        LOCAL_COMPACT_RATIO. Cada fila muerta deja al menos dos líneas de
+        basura, así el mismo umbral acota también las filas muertas.
+        """
+        ratio = settings.LOCAL_COMPACT_RATIO
+        if self._training is not None:
+            return   # se reintenta en la próxima escritura
+        if ratio <= 0 or self._log_entries < settings.LOCAL_COMPACT_MIN_ENTRIES:
+            return
+        if self._log_entries - self.count > ratio * self._log_entries:
+            self.compact()
+
+    def compact(self) -> int:
+        """
+        Reescribe matriz y log solo con las filas vivas (renumeradas, en el
+        mismo orden) en archivos de la generación siguiente; header.json se
+        reemplaza de forma atómica al final, así un corte a mitad de camino
+        deja el índice en la generación anterior. Devuelve filas liberadas.
+        """
+        with self._lock:
+            live = np.flatnonzero(self.alive[:self.size])
+            freed = self.size - len(live)
+            generation = self.generation + 1
+            suffix = f".{generation}"
+            vectors_path = self.directory / f"vectors{suffix}.f32"
+            meta_path = self.directory / f"meta{suffix}.jsonl"
+
+            capacity = max(_INITIAL_CAPACITY, len(live))
+            with open(vectors_path, "wb") as f:
+                f.truncate(capacity * self.dim * 4)
+            matrix = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+            for start in range(0, len(live), _COPY_BLOCK):
+                part = live[start:start + _COPY_BLOCK]
+                matrix[start:start + len(part)] = self.matrix[part]
+            matrix.flush()
+            del matrix
+
+            with open(meta_path, "w", encoding="utf-8") as f:
+                for new_row, row in enumerate(live):
+                    f.write(json.dumps({"op": "put", "id": self.ids[row], "row": new_row,
+                                        "metadata": self.metadata[row]}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self.ann is not None:
+                self.ann.write_compacted(live, generation, capacity)
+
+            tmp = self._header_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"dim": self.dim, "generation": generation}))
+            os.replace(tmp, self._header_path)
+
+            old = [self._vectors_path, self._meta_path]
+            if self.ann is not None:
+                old.append(self.ann._assign_path)
+            self.matrix.flush()
+            del self.matrix
+            self._reset(generation)
+            for path in old:
+                path.unlink(missing_ok=True)
+
+            self._open_matrix()
+            self._replay_log()
+
+        logger.info(f"🧹 Índice local '{self.directory.name}' compactado: {freed} filas liberadas")
+        return freed
+
+    # ---------- búsqueda ----------
+    def _filter_mask(self, filter: dict | None) -> tuple[np.ndarray, dict]:
+        """
+        Máscara de filas candidatas. Devuelve además las condiciones que no
+        pudieron vectorizarse (se evalúan después sobre la metadata).
+        """
+        n = self.size
+        mask = self.alive[:n].copy()
+        residual = {}
+
+        for field, cond in (filter or {}).items():
+            if not isinstance(cond, dict):
+                cond = {"$eq": cond}
+
+            if field not in FILTER_FIELDS:
+                residual[field] = cond
+                continue
+
+            codes = self.codes[field][:n]
+            vocab = self.vocab[field]
+
+            if "$eq" in cond:
+                code = vocab.get(str(cond["$eq"]))
+                mask &= codes == (code if code is not None else -2)
+            if "$in" in cond:
+                wanted = [vocab[str(v)] for v in cond["$in"] if str(v) in vocab]
+                mask &= np.isin(codes, wanted)
+
+        return mask, residual
+
+    # ---------- entrenamiento del IVF ----------
+    def _start_training(self):
+        """Lanza el entrenamiento sobre las filas vivas actuales (llamar con el lock)."""
+        rows = np.flatnonzero(self.alive[:self.size])
+        self._ann_dirty = set()
+        self._training = threading.Thread(
+            target=self._train_ann, args=(self.matrix, rows), name="ivf-train", daemon=True
+        )
+        self._training.start()
+
+    def _train_ann(self, matrix: np.ndarray, rows: np.ndarray):
+        try:
+            centroids, assign = self.ann.build(matrix, rows)
+        except Exception as e:
+            logger.error(f"❌ Falló el entrenamiento IVF de '{self.directory.name}': {e}")
+            with self._lock:
+                self._training = None
+            return
+
+        with self._lock:
+            self.ann.install(centroids, rows, assign)
+            # Filas agregadas o sobrescritas mientras se entrenaba
+            dirty = np.fromiter(self._ann_dirty, dtype=np.int64, count=len(self._ann_dirty))
+            if dirty.size:
+                self.ann.add(dirty, np.asarray(self.matrix[dirty]))
+            self._ann_dirty = set()
+            self._training = None
+
+    def wait_for_ann(self, timeout: float | None = None):
+        """Espera a que termine el entrenamiento IVF en curso (si hay)."""
+        thread = self._training
+        if thread is not None:
+            thread.join(timeout)
+
+    def rebuild_ann(self, wait: bool = True):
+        """Re-entrena el índice ANN con todos los vectores vivos."""
+        if self.ann is None:
+            return
+        self.wait_for_ann()   # un entrenamiento en curso usa una foto anterior de las filas
+        with self._lock:
+            if not self.count or self._training is not None:
+                return
+            self._start_training()
+        if wait:
+            self.wait_for_ann()
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = True,
+              filter: dict | None = None, nprobe: int | None = None) -> dict:
+        q = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        with self._lock:
+            mask, residual = self._filter_mask(filter)
+
+            if self.ann is not None and self.ann.trained:
+                rows = self.ann.candidates(q, mask, nprobe=nprobe)
+                # Filtros muy selectivos: pocas filas, se puntúan todas
+                if rows.size < top_k:
+                    rows = np.flatnonzero(mask)
+            else:
+                rows = np.flatnonzero(mask)
+
+            if residual:
+                rows = np.array(
+                    [r for r in rows if _matches(self.metadata[r], residual)],
+                    dtype=np.int64
+                )
+
+            if rows.size == 0:
+                return {"matches": []}
+
+            scores = self.matrix[rows] @ q
+
+            k = min(top_k, rows.size)
+            if k < rows.size:
+                part = np.argpartition(-scores, k - 1)[:k]
+            else:
+                part = np.arange(rows.size)
+            order = part[np.argsort(-scores[part])]
+
+            matches = []
+            for i in order:
+                row = int(rows[i])
+                match = {"id": self.ids[row], "score": float(scores[i])}
+                if include_metadata:
+                    match["metadata"] = self.metadata[row]
+                matches.append(match)
+
+        return {"matches": matches}
+
+
+def _matches(metadata: dict | None, conds: dict) -> bool:
+    if metadata is None:
+        return False
+    for field, cond in conds.items():
+        value = metadata.get(field)
+        if "$eq" in cond and value != cond["$eq"]:
+            return False
+        if "$in" in cond and value not in cond["$in"]:
+            return False
+    return True
+
+
+# ============================================================
+# API compatible con pinecone_client
+# ============================================================
+_indexes: dict[str, LocalVectorIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _index_dir(index_name: str) -> Path:
+    base = settings.LOCAL_VECTOR_DIR or settings.STORAGE_DIR / "vector_index"
+    return Path(base) / index_name
+
+
+def get_index(index_name: str, dim: int | None = None) -> LocalVectorIndex:
+    with _indexes_lock:
+        index = _indexes.get(index_name)
+        if index is None:
+            index = LocalVectorIndex(_index_dir(index_name), dim=dim, ann=settings.LOCAL_ANN)
+            _indexes[index_name] = index
+        return index
+
+
+def create_index(index_name: str, dim: int, metric: str = "cosine"):
+    """Crea (o abre) el índice local. Solo se soporta métrica coseno."""
+    if metric != "cosine":
+        raise ValueError("El índice local solo soporta metric='cosine'")
+    get_index(index_name, dim=dim)
+
+
+def upsert_vectors(index_name: str, vectors) -> dict:
+    items = list(vectors)
+    if not items:
+        return {"upserted": 0}
+    index = get_index(index_name, dim=len(items[0][1]))
+    n = index.upsert(items)
+    logger.info(f"✅ Upsert local completado: {n} vectores.")
+    return {"upserted": n}
+
+
+def delete_vectors(index_name: str, ids: list[str]) -> dict:
+    if not ids:
+        return {"deleted": 0}
+    try:
+        index = get_index(index_name)
+    except ValueError:
+        return {"deleted": 0}   # índice aún no creado
+    n = index.delete(ids)
+    logger.info(f"🗑️ Borrado local: {n} vectores.")
+    return {"deleted": n}
+
+
+def update_metadata(index_name: str, items: list[tuple[str, dict]]) -> dict:
+    if not items:
+        return {"updated": 0}
+    try:
+        index = get_index(index_name)
+    except ValueError:
+        return {"updated": 0}   # índice aún no creado
+    n = index.update_metadata(items)
+    logger.info(f"📝 Metadata local actualizada: {n} vectores.")
+    return {"updated": n}
+
+
+def query_index(index_name: str, vector: list, top_k: int = 10,
+                include_metadata: bool = True, filter: dict = None, nprobe: int | None = None):
+    try:
+        index = get_index(index_name)
+    except ValueError:
+        return {"matches": []}   # índice aún no creado
+    return index.query(vector, top_k=top_k, include_metadata=include_metadata,
+                       filter=filter, nprobe=nprobe)
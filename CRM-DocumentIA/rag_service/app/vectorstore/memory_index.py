@@ -0,0 +1,72 @@
+# app/vectorstore/memory_index.py
+
+import math
+import threading
+
+
+class InMemoryIndex:
+    """
+    Índice en memoria con la misma interfaz básica que `pinecone.Index`
+    (upsert / query / delete / describe_index_stats).
+
+    Pensado para tests y desarrollo local: búsqueda exacta por coseno y
+    filtros de igualdad ({"campo": {"$eq": valor}} o {"campo": valor}).
+    """
+
+    def __init__(self):
+        self._vectors: dict[str, tuple[list[float], dict]] = {}
+        self._lock = threading.Lock()
+        self.upsert_calls = 0
+
+    def upsert(self, vectors: list, **kwargs):
+        with self._lock:
+            self.upsert_calls += 1
+            for vec_id, values, metadata in vectors:
+                self._vectors[vec_id] = (list(values), dict(metadata or {}))
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: list[str] | None = None, **kwargs):
+        with self._lock:
+            for vec_id in ids or []:
+                self._vectors.pop(vec_id, None)
+        return {}
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            return {"total_vector_count": len(self._vectors)}
+
+    def query(self, vector: list[float], top_k: int = 10, include_metadata: bool = True,
+              filter: dict | None = None, **kwargs):
+        with self._lock:
+            items = list(self._vectors.items())
+
+        scored = []
+        for vec_id, (values, metadata) in items:
+            if filter and not _matches(metadata, filter):
+                continue
+            match = {"id": vec_id, "score": _cosine(vector, values)}
+            if include_metadata:
+                match["metadata"] = metadata
+            scored.append(match)
+
+        scored.sort(key=lambda m: m["score"], reverse=True)
+        return {"matches": scored[:top_k]}
+
+
+def _matches(metadata: dict, filter: dict) -> bool:
+    for field, cond in filter.items():
+        if isinstance(cond, dict):
+            if "$eq" in cond and metadata.get(field) != cond["$eq"]:
+                return False
+            if "$in" in cond and metadata.get(field) not in cond["$in"]:
+                return False
+        elif metadata.get(field) != cond:
+            return False
+    return True
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
@@ -1,8 +1,11 @@
 import os
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
+from app.core.config import settings
 from app.core.logger import logger
+from app.vectorstore.bulk_upsert import bulk_upsert
 
 load_dotenv()
 
@@ -11,21 +14,45 @@ INDEX_NAME = os.getenv("PINECONE_INDEX", "crm-rag-index")
 ENV_REGION = os.getenv("PINECONE_ENV", "us-east-1")
 
 # ============================================================
-# Validación inicial
+# Cliente (perezoso: el servicio arranca aunque falte la API key)
 # ============================================================
-if not API_KEY:
-    raise RuntimeError("❌ PINECONE_API_KEY no está configurado en .env")
+_pc = None
+_pc_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Devuelve el cliente Pinecone, creándolo en el primer uso.
+    Falla aquí (y no al importar) si falta PINECONE_API_KEY.
+    """
+    global _pc
+    with _pc_lock:
+        if _pc is None:
+            if not API_KEY:
+                raise RuntimeError("❌ PINECONE_API_KEY no está configurado en .env")
+
+            from pinecone import Pinecone
+            _pc = Pinecone(api_key=API_KEY)
+    return _pc
 
-pc = Pinecone(api_key=API_KEY)
 
 # ============================================================
 # Crear índice
 # ============================================================
+_known_indexes: set[str] = set()
+
+
 def create_index(index_name: str, dim: int, metric: str = "cosine"):
     """
     Crea un índice serverless en Pinecone si no existe.
+    Los índices ya verificados no se vuelven a consultar.
     """
+    if index_name in _known_indexes:
+        return
+
     try:
+        from pinecone import ServerlessSpec
+        pc = get_client()
         existing = pc.list_indexes().names()
 
         if index_name not in existing:
@@ -43,6 +70,8 @@ def create_index(index_name: str, dim: int, metric: str = "cosine"):
         else:
             logger.info(f"ℹ️ El índice '{index_name}' ya existe.")
 
+        _known_indexes.add(index_name)
+
     except Exception as e:
         logger.error(f"❌ Error creando índice: {e}")
         raise
@@ -50,37 +79,111 @@ def create_index(index_name: str, dim: int, metric: str = "cosine"):
 # ============================================================
 # Obtener índice
 # ============================================================
+_index_handles = {}
+_index_lock = threading.Lock()
+
+
 def get_index(index_name: str):
     """
     Devuelve una instancia de índice lista para usar.
+    El handle (y su pool de conexiones) se crea una vez y se reutiliza.
     """
-    try:
-        return pc.Index(index_name)
-    except Exception as e:
-        logger.error(f"❌ No se pudo obtener el índice '{index_name}': {e}")
-        raise
+    with _index_lock:
+        index = _index_handles.get(index_name)
+        if index is not None:
+            return index
+
+        try:
+            index = get_client().Index(index_name, pool_threads=settings.PINECONE_UPSERT_CONCURRENCY)
+        except Exception as e:
+            logger.error(f"❌ No se pudo obtener el índice '{index_name}': {e}")
+            raise
+
+        _index_handles[index_name] = index
+        return index
+
+def _as_list(vector) -> list:
+    """El SDK serializa a JSON: los arrays NumPy se convierten aquí, en el borde."""
+    return vector.tolist() if hasattr(vector, "tolist") else vector
+
 
 # ============================================================
 # Insertar vectores
 # ============================================================
-def upsert_vectors(index_name: str, vectors: list):
+def upsert_vectors(index_name: str, vectors) -> dict:
     """
-    Inserta vectores en el índice.
-    Formato esperado:
+    Inserta vectores en el índice, en lotes acotados y concurrentes.
+    Formato esperado (lista o generador):
     [
         (id, embedding, metadata),
         ...
     ]
+    El embedding puede ser lista o array NumPy (se convierte por ítem,
+    a medida que se arman los lotes).
+    Devuelve estadísticas por lote (ver bulk_upsert).
     """
     try:
         index = get_index(index_name)
-        index.upsert(vectors=vectors)
-        logger.info(f"✅ Upsert completado: {len(vectors)} vectores insertados.")
+        stats = bulk_upsert(
+            index,
+            ((vec_id, _as_list(vec), metadata) for vec_id, vec, metadata in vectors),
+            batch_size=settings.PINECONE_UPSERT_BATCH_SIZE,
+            max_bytes=settings.PINECONE_UPSERT_MAX_BYTES,
+            max_concurrency=settings.PINECONE_UPSERT_CONCURRENCY,
+            max_retries=settings.PINECONE_UPSERT_MAX_RETRIES,
+        )
+        logger.info(
+            f"✅ Upsert completado: {stats['upserted']} vectores en {stats['batches']} lotes "
+            f"({stats['elapsed_seconds']}s, reintentos={stats['retries']})."
+        )
+        return stats
 
     except Exception as e:
         logger.error(f"❌ Error durante upsert en Pinecone: {e}")
         raise
 
+# ============================================================
+# Borrar vectores
+# ============================================================
+_DELETE_BATCH = 1000   # máximo de ids por request de Pinecone
+
+
+def delete_vectors(index_name: str, ids: list[str]) -> dict:
+    """
+    Borra vectores por id, en lotes de hasta 1000.
+    """
+    try:
+        index = get_index(index_name)
+        for start in range(0, len(ids), _DELETE_BATCH):
+            index.delete(ids=ids[start:start + _DELETE_BATCH])
+        logger.info(f"🗑️ Borrado completado: {len(ids)} vectores.")
+        return {"deleted": len(ids)}
+
+    except Exception as e:
+        logger.error(f"❌ Error borrando vectores en Pinecone: {e}")
+        raise
+
+# ============================================================
+# Actualizar metadata (sin re-enviar vectores)
+# ============================================================
+def update_metadata(index_name: str, items: list[tuple[str, dict]]) -> dict:
+    """
+    Reemplaza la metadata de vectores existentes. Pinecone actualiza de a
+    un id por request: se envían con la misma concurrencia que los upserts.
+    """
+    if not items:
+        return {"updated": 0}
+    try:
+        index = get_index(index_name)
+        with ThreadPoolExecutor(max_workers=max(1, settings.PINECONE_UPSERT_CONCURRENCY)) as pool:
+            list(pool.map(lambda item: index.update(id=item[0], set_metadata=item[1]), items))
+        logger.info(f"📝 Metadata actualizada: {len(items)} vectores.")
+        return {"updated": len(items)}
+
+    except Exception as e:
+        logger.error(f"❌ Error actualizando metadata en Pinecone: {e}")
+        raise
+
 # ============================================================
 # Consultar vectores
 # ============================================================
@@ -93,7 +196,7 @@ def query_index(index_name: str, vector: list, top_k: int = 10,
         index = get_index(index_name)
 
         params = {
-            "vector": vector,
+            "vector": _as_list(vector),
             "top_k": top_k,
             "include_metadata": include_metadata
         }
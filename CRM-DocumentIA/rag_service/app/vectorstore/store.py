@@ -0,0 +1,52 @@
+# app/vectorstore/store.py
+
+import importlib
+
+from app.core.config import settings
+
+# ============================================================
+# Backends disponibles (mismo contrato: create_index /
+# upsert_vectors / query_index / delete_vectors / update_metadata)
+# ============================================================
+_BACKENDS = {
+    "pinecone": "app.vectorstore.pinecone_client",
+    "local": "app.vectorstore.local_store",
+}
+
+
+def get_backend(name: str | None = None):
+    """
+    Devuelve el módulo del backend configurado en VECTOR_BACKEND.
+    Se importa de forma perezosa: usar "local" no requiere Pinecone.
+    """
+    name = name or settings.VECTOR_BACKEND
+    if name not in _BACKENDS:
+        raise ValueError(f"Vector store desconocido: {name}")
+    return importlib.import_module(_BACKENDS[name])
+
+
+def create_index(index_name: str, dim: int, metric: str = "cosine"):
+    return get_backend().create_index(index_name, dim, metric=metric)
+
+
+def upsert_vectors(index_name: str, vectors) -> dict:
+    return get_backend().upsert_vectors(index_name, vectors)
+
+
+def delete_vectors(index_name: str, ids: list[str]) -> dict:
+    return get_backend().delete_vectors(index_name, ids)
+
+
+def update_metadata(index_name: str, items: list[tuple[str, dict]]) -> dict:
+    return get_backend().update_metadata(index_name, items)
+
+
+def query_index(index_name: str, vector: list, top_k: int = 10,
+                include_metadata: bool = True, filter: dict = None):
+    return get_backend().query_index(
+        index_name,
+        vector=vector,
+        top_k=top_k,
+        include_metadata=include_metadata,
+        filter=filter
+    )
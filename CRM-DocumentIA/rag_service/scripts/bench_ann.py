@@ -0,0 +1,94 @@
+# scripts/bench_ann.py
+"""
+Benchmark recall vs latencia del índice local: IVF frente a búsqueda exacta.
+
+Uso:
+    python scripts/bench_ann.py --n 200000 --dim 384 --queries 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.vectorstore.local_store import LocalVectorIndex
+
+
+def synthetic_data(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Datos agrupados (más parecidos a embeddings reales que ruido uniforme)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="0 → 4·√n")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--filter-doc-type", action="store_true",
+                        help="Mide también con filtro doc_type (1 de 4 tipos)")
+    args = parser.parse_args()
+
+    data = synthetic_data(args.n, args.dim, clusters=max(50, args.n // 2000))
+    queries = synthetic_data(args.queries, args.dim, clusters=max(50, args.n // 2000), seed=1)
+    doc_types = ["contrato", "factura", "correo", "acta"]
+    flt = {"doc_type": {"$eq": "factura"}} if args.filter_doc_type else None
+
+    settings.LOCAL_IVF_NLIST = args.nlist
+    settings.LOCAL_IVF_MIN_TRAIN = args.n + 1   # entrenamos una sola vez al final
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LocalVectorIndex(os.path.join(tmp, "bench"), dim=args.dim, ann="ivf")
+
+        t0 = time.perf_counter()
+        for start in range(0, args.n, 5000):
+            index.upsert(
+                (f"v{i}", data[i], {"doc_type": doc_types[i % 4], "provider": "hf"})
+                for i in range(start, min(start + 5000, args.n))
+            )
+        load_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index.rebuild_ann()
+        train_s = time.perf_counter() - t0
+        print(f"Vectores={args.n} dim={args.dim} | carga {load_s:.1f}s | entrenamiento IVF "
+              f"{train_s:.1f}s | nlist={len(index.ann.centroids)}")
+
+        # Exacto: se desactiva el ANN temporalmente
+        ann, index.ann = index.ann, None
+        t0 = time.perf_counter()
+        truth = [
+            {m["id"] for m in index.query(q, top_k=args.top_k, include_metadata=False, filter=flt)["matches"]}
+            for q in queries
+        ]
+        exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        index.ann = ann
+
+        print(f"\n{'modo':>10} | {'recall@' + str(args.top_k):>10} | {'ms/consulta':>11}")
+        print(f"{'exacto':>10} | {1.0:>10.3f} | {exact_ms:>11.2f}")
+
+        for nprobe in args.nprobe:
+            t0 = time.perf_counter()
+            found = [
+                {m["id"] for m in index.query(q, top_k=args.top_k, include_metadata=False,
+                                              filter=flt, nprobe=nprobe)["matches"]}
+                for q in queries
+            ]
+            ms = (time.perf_counter() - t0) * 1000 / len(queries)
+            recall = np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)])
+            print(f"{'nprobe=' + str(nprobe):>10} | {recall:>10.3f} | {ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# scripts/bench_inference.py
+"""
+Throughput de los backends de inferencia local (torch / onnx / int8)
+para embeddings y rerank, en textos/s y pares/s.
+
+Uso:
+    python scripts/bench_inference.py --backends torch onnx int8 --threads 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.rag import local_models
+
+SAMPLE = (
+    "El contratista se obliga a entregar informes mensuales de avance y la factura "
+    "correspondiente dentro de los primeros cinco días hábiles de cada mes. "
+)
+
+
+def _rate(fn, n: int, repeat: int) -> float:
+    fn()   # calentamiento
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return n * repeat / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(local_models.BACKENDS))
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--emb-model", default=settings.EMB_MODEL)
+    parser.add_argument("--ce-model", default=settings.CROSS_ENCODER_MODEL)
+    parser.add_argument("--n", type=int, default=128, help="Textos / pares por llamada")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    settings.LOCAL_INFERENCE_THREADS = args.threads
+    texts = [SAMPLE * (1 + i % 3) for i in range(args.n)]
+    pairs = [("¿Cuándo se entrega la factura?", t) for t in texts]
+
+    print(f"{'backend':>8} | {'emb textos/s':>12} | {'rerank pares/s':>14}")
+    for backend in args.backends:
+        st = local_models.load_sentence_transformer(args.emb_model, backend=backend)
+        ce = local_models.load_cross_encoder(args.ce_model, max_length=settings.RERANK_MAX_LENGTH, backend=backend)
+        emb = _rate(lambda: st.encode(texts, batch_size=32, show_progress_bar=False), args.n, args.repeat)
+        rr = _rate(lambda: ce.predict(pairs, batch_size=32, show_progress_bar=False), args.n, args.repeat)
+        print(f"{backend:>8} | {emb:>12.1f} | {rr:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
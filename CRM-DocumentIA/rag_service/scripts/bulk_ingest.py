@@ -0,0 +1,69 @@
+# scripts/bulk_ingest.py
+"""
+Ingesta masiva desde la línea de comandos: directorios, zips y archivos.
+
+Reanudable: con el mismo --checkpoint se saltan los documentos ya
+ingestados. Al final imprime el throughput (docs/s, chunks/s).
+
+Uso:
+    python scripts/bulk_ingest.py historico/ correos.zip --provider openai \\
+        --checkpoint storages/bulk/onboarding.jsonl --workers 8
+    python scripts/bulk_ingest.py --list archivos.txt
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.rag.bulk_ingest import BulkIngest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="Directorios, zips o archivos")
+    parser.add_argument("--list", help="Archivo con una ruta por línea")
+    parser.add_argument("--provider", default=None, help="hf | openai | sentence_transformers")
+    parser.add_argument("--source-name", default="bulk")
+    parser.add_argument("--checkpoint", default=None, help="JSONL de progreso (reanudación)")
+    parser.add_argument("--workers", type=int, default=settings.BULK_INGEST_WORKERS,
+                        help="Archivos en paralelo")
+    parser.add_argument("--cpu-workers", type=int, default=settings.INGEST_CPU_WORKERS,
+                        help="Procesos de extracción (0 = en los hilos de trabajo)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--summaries", action="store_true", help="Genera el resumen LLM por documento")
+    args = parser.parse_args()
+
+    inputs = list(args.inputs)
+    if args.list:
+        with open(args.list, encoding="utf-8") as f:
+            inputs.extend(line.strip() for line in f if line.strip())
+    if not inputs:
+        parser.error("Indique al menos una entrada")
+
+    cpu_executor = ProcessPoolExecutor(max_workers=args.cpu_workers) if args.cpu_workers > 0 else None
+    try:
+        run = BulkIngest(
+            inputs,
+            provider=args.provider,
+            source_name=args.source_name,
+            checkpoint=args.checkpoint,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            summarize=args.summaries,
+            cpu_executor=cpu_executor,
+        )
+        stats = run.run()
+    finally:
+        if cpu_executor is not None:
+            cpu_executor.shutdown()
+
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# scripts/load_test_query.py
+"""
+Prueba de carga de /query contra servicios simulados (sin red externa).
+
+Levanta un servidor HTTP local que imita HF Inference (embeddings y
+generación, ambos con latencia configurable), usa el índice vectorial
+local sobre un directorio temporal y un cross-encoder falso que ocupa
+CPU un tiempo fijo. Luego dispara N requests concurrentes contra:
+
+  - antes:   handler async que llama a answer_question (síncrono),
+             como estaba /query: cada request bloquea el event loop.
+  - después: el router real de /query (answer_question_async).
+
+Todo corre en un solo event loop (equivalente a un worker de uvicorn).
+
+Uso:
+    python scripts/load_test_query.py --concurrency 200 --requests 400 --latency-ms 150
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault("AZURE_CONTAINER", "rag-docs")
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+from app.core.config import settings
+
+DIM = 64
+
+
+# ============================================================
+# Servicios simulados
+# ============================================================
+def _vector(text: str) -> list[float]:
+    rng = np.random.default_rng(abs(hash(text)) % (2 ** 32))
+    return rng.normal(size=DIM).astype(np.float32).tolist()
+
+
+class _HFHandler(BaseHTTPRequestHandler):
+    latency = 0.1
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True   # cabeceras y cuerpo van en writes separados
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency)
+
+        # Embeddings y generación comparten HF_API_URL: se distinguen por "parameters"
+        if "parameters" in body:
+            payload = [{"generated_text": "Respuesta simulada."}]
+        else:
+            payload = [_vector(t) for t in body["inputs"]]
+
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _FakeCrossEncoder:
+    def __init__(self, cost: float):
+        self.cost = cost
+
+    def predict(self, pairs, **kwargs):
+        time.sleep(self.cost)
+        return [float(len(text)) for _, text in pairs]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # backlog amplio: cientos de conexiones simultáneas
+
+
+def _start_server(latency: float) -> tuple[ThreadingHTTPServer, str]:
+    handler = type("Handler", (_HFHandler,), {"latency": latency})
+    server = _Server(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ============================================================
+# Carga
+# ============================================================
+async def _run(app: FastAPI, path: str, total: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=600) as client:
+        async def one(i: int):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(path, json={"query": f"¿Qué dice el documento {i % 50}?",
+                                                  "provider": "hf"})
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(total)])
+        elapsed = time.perf_counter() - t0
+
+    lat = np.array(latencies) * 1000
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100, help="Latencia simulada por llamada HF")
+    parser.add_argument("--rerank-ms", type=float, default=5, help="CPU simulada del cross-encoder")
+    parser.add_argument("--docs", type=int, default=2000, help="Vectores en el índice local")
+    parser.add_argument("--provider-concurrency", type=int, default=32,
+                        help="HF_MAX_CONCURRENCY / HTTP_POOL_SIZE (pools muy grandes penalizan a httpcore)")
+    args = parser.parse_args()
+
+    server, url = _start_server(args.latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.HF_INFERENCE_API_KEY = "test"
+        settings.HF_MODEL = "fake"
+        settings.HF_API_URL = url
+        settings.EMB_PROVIDER = "hf"
+        settings.VECTOR_BACKEND = "local"
+        settings.LOCAL_VECTOR_DIR = tmp
+        settings.EMB_CACHE_ENABLED = False
+        settings.QUERY_CACHE_ENABLED = False
+        settings.HF_MAX_CONCURRENCY = args.provider_concurrency
+        settings.HTTP_POOL_SIZE = args.provider_concurrency
+
+        from app.api import query
+        from app.rag import rerank_service
+        from app.rag.pipeline import answer_question
+        from app.vectorstore.local_store import upsert_vectors
+
+        rerank_service._models[settings.CROSS_ENCODER_MODEL] = _FakeCrossEncoder(args.rerank_ms / 1000)
+
+        upsert_vectors(settings.PINECONE_INDEX, [
+            (f"doc-{i}", _vector(f"doc-{i}"),
+             {"provider": "hf", "doc_type": "documento", "filename": f"doc{i % 20}.pdf",
+              "text_excerpt": f"Contenido del documento {i}."})
+            for i in range(args.docs)
+        ])
+
+        # Antes: async def + pipeline síncrono (bloquea el event loop)
+        before = FastAPI()
+
+        @before.post("/query/")
+        async def legacy_query(q: query.QueryRequest):
+            result = answer_question(question=q.query, top_k=15, doc_type=q.doc_type, provider=q.provider)
+            return {"answer": result["answer"]}
+
+        after = FastAPI()
+        after.include_router(query.router)
+
+        print(f"Concurrencia={args.concurrency} requests={args.requests} "
+              f"latencia HF={args.latency_ms}ms rerank={args.rerank_ms}ms")
+
+        for name, app in (("antes (sync)", before), ("después (async)", after)):
+            stats = asyncio.run(_run(app, "/query/", args.requests, args.concurrency))
+            print(f"{name:18s} " + "  ".join(f"{k}={v}" for k, v in stats.items()))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
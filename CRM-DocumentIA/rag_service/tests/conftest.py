@@ -0,0 +1,6 @@
+# tests/conftest.py
+
+import os
+
+# Settings exige estas variables; en tests no hay .env
+os.environ.setdefault("AZURE_CONTAINER", "rag-docs")
@@ -0,0 +1,82 @@
+# tests/fake_llm_server.py
+"""
+Servidor LLM falso para tests (sin red externa).
+
+Responde a cualquier POST:
+  - /v1/chat/completions        → formato OpenAI (JSON o SSE si "stream": true)
+  - cualquier otra ruta (HF)    → formato TGI (JSON o SSE si "stream": true)
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKENS = ["La ", "factura ", "vence ", "el ", "30."]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        openai_style = self.path.endswith("/chat/completions")
+
+        if not body.get("stream"):
+            text = "".join(TOKENS)
+            payload = (
+                {"id": "x", "object": "chat.completion", "created": 0, "model": "fake",
+                 "choices": [{"index": 0, "finish_reason": "stop",
+                              "message": {"role": "assistant", "content": text}}]}
+                if openai_style else [{"generated_text": text}]
+            )
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        for tok in TOKENS:
+            if openai_style:
+                event = {"id": "x", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+                         "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]}
+            else:
+                event = {"token": {"id": 0, "text": tok, "special": False}}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.delay)
+
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeLLMServer:
+    """Uso: with FakeLLMServer() as url: ..."""
+
+    def __init__(self, delay: float = 0.0):
+        handler = type("Handler", (_Handler,), {"delay": delay})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        return self.url
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
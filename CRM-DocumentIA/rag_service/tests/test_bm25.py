@@ -0,0 +1,85 @@
+# tests/test_bm25.py
+
+import numpy as np
+import pytest
+
+from app.rag import retriever
+from app.vectorstore import bm25_index
+from app.vectorstore.bm25_index import BM25Index, decode_postings, encode_postings, tokenize
+
+
+def _meta(doc_type="factura", provider="hf", **extra):
+    return {"doc_type": doc_type, "provider": provider, "document_id": "d1", "text_excerpt": "", **extra}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return BM25Index(tmp_path / "bm25.sqlite3", max_segments=2)
+
+
+def test_postings_roundtrip_is_compressed():
+    rows = np.array([3, 4, 130, 20_000, 5_000_000, 40_000_000_000])
+    tfs = np.array([1, 2, 1, 300, 1, 7])
+
+    data = encode_postings(rows, tfs)
+    out_rows, out_tfs = decode_postings(data, len(rows))
+
+    assert out_rows.tolist() == rows.tolist() and out_tfs.tolist() == tfs.tolist()
+    assert len(data) < (rows.nbytes + tfs.nbytes) // 3   # vs. int64 sin comprimir
+
+
+def test_codes_match_regardless_of_separators():
+    assert "9001234567" in tokenize("NIT 900.123.456-7")
+    assert "9001234567" in tokenize("nit 900123456-7")
+    assert "fac2024001" in tokenize("Factura FAC-2024-001")
+    assert tokenize("Cláusula DE Honorarios") == ["clausula", "honorarios"]
+
+
+def test_search_ranks_exact_identifier_first_and_filters(index):
+    index.add([
+        ("a", "Factura FAC-2024-001 de Acme, valor total 1.200.000", _meta()),
+        ("b", "Factura FAC-2024-002 de Acme, valor total 980.000", _meta()),
+        ("c", "Contrato con Acme por servicios de soporte", _meta(doc_type="contrato")),
+    ])
+
+    hits = index.search("¿cuál es el valor de la factura fac-2024-002?", top_k=3)
+    assert hits[0]["id"] == "b" and hits[0]["exact_match"]
+    assert not any(h.get("exact_match") for h in hits[1:])
+
+    assert [h["id"] for h in index.search("acme", top_k=5, filters={"doc_type": "contrato"})] == ["c"]
+    assert index.search("acme", top_k=5, filters={"provider": "openai"}) == []
+
+
+def test_incremental_updates_merge_segments_and_persist(index, tmp_path):
+    for n in range(5):
+        index.add([(f"c{n}", f"acta de reunión número {n} con acuerdos", _meta(doc_type="acta"))])
+    index.add([("c0", "duplicado ignorado", _meta(filename="v2.pdf"))])   # id ya indexado: solo metadata
+    index.delete(["c1", "c3"])
+
+    stats = index.stats()
+    assert stats["docs"] == 3
+    assert stats["segments"] <= stats["terms"] * 2   # fusión al superar max_segments
+
+    reopened = BM25Index(tmp_path / "bm25.sqlite3")
+    assert sorted(h["id"] for h in reopened.search("acuerdos", top_k=10)) == ["c0", "c2", "c4"]
+    assert reopened.search("duplicado") == []
+    assert [h["id"] for h in reopened.search("acuerdos", filters={"doc_type": "factura"})] == ["c0"]
+    assert reopened.search("acuerdos numero 0", top_k=1)[0]["metadata"]["filename"] == "v2.pdf"
+
+
+def test_fusion_and_exact_match_skips_cross_encoder(tmp_path, monkeypatch):
+    monkeypatch.setattr(retriever.settings, "BM25_INDEX_DB", tmp_path / "bm25.sqlite3")
+    monkeypatch.setattr(bm25_index, "_index", None)
+    bm25_index.get_lexical_index().add([
+        ("x", "Contrato CT-88123 firmado con Globex", _meta(doc_type="contrato")),
+        ("y", "Propuesta comercial para Globex", _meta(doc_type="propuesta")),
+    ])
+
+    dense = [{"id": "y", "score": 0.9, "metadata": {}}, {"id": "z", "score": 0.8, "metadata": {}}]
+    fused = retriever._fuse(dense, retriever._lexical_hits("contrato ct-88123", 5, None, None), top_k=5)
+
+    assert [h["id"] for h in fused][:1] == ["x"] and fused[0]["exact_match"]
+    assert {h["id"] for h in fused} == {"x", "y", "z"}
+
+    monkeypatch.setattr(retriever, "get_rerank_service", lambda: pytest.fail("no debe rerankear"))
+    assert retriever.rerank("contrato ct-88123", fused, top_k=2) == fused[:2]
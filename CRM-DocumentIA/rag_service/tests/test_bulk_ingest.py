@@ -0,0 +1,165 @@
+# tests/test_bulk_ingest.py
+
+import threading
+import zipfile
+
+import numpy as np
+import pytest
+
+from app.core.batching import MicroBatcher
+from app.rag import bulk_ingest, doc_registry, ingestion
+from app.vectorstore import bm25_index, local_store
+
+
+@pytest.fixture
+def local_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion.settings, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(ingestion.settings, "LOCAL_VECTOR_DIR", tmp_path / "vectors")
+    monkeypatch.setattr(ingestion.settings, "DOC_REGISTRY_DB", tmp_path / "documents.sqlite3")
+    monkeypatch.setattr(ingestion.settings, "BULK_BATCH_WAIT", 0.2)
+    monkeypatch.setattr(local_store, "_indexes", {})
+    monkeypatch.setattr(doc_registry, "_registry", None)
+    monkeypatch.setattr(ingestion.settings, "BM25_INDEX_DB", tmp_path / "bm25.sqlite3")
+    monkeypatch.setattr(bm25_index, "_index", None)
+
+    def no_summary(text, provider=None):
+        raise AssertionError("la ingesta masiva no resume por defecto")
+
+    monkeypatch.setattr(ingestion, "generate_summary", no_summary)
+
+    batches = []
+
+    def fake_embed(texts, provider=None):
+        batches.append(len(texts))
+        return np.array([[float(len(t)), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(bulk_ingest, "embed_array", fake_embed)
+    return batches
+
+
+def _corpus(tmp_path):
+    src = tmp_path / "historico"
+    (src / "2023").mkdir(parents=True)
+    for i in range(6):
+        (src / "2023" / f"correo{i}.txt").write_text(f"Asunto: pedido {i}. Estimado cliente, saludos.",
+                                                     encoding="utf-8")
+    (src / "foto.png").write_bytes(b"\x89PNG")   # sin extracción de texto: se ignora
+
+    with zipfile.ZipFile(src / "facturas.zip", "w") as zf:
+        for i in range(4):
+            zf.writestr(f"facturas/f{i}.txt", f"Factura {i}. Subtotal 100, IVA 19, valor total 119.")
+    return src
+
+
+def test_micro_batcher_groups_requests_across_threads():
+    calls = []
+
+    def double(items):
+        calls.append(len(items))
+        return [x * 2 for x in items]
+
+    batcher = MicroBatcher(double, max_items=100, max_wait=0.2)
+    results = {}
+
+    def worker(n):
+        results[n] = batcher([n, n + 1])
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(0, 20, 2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert all(results[n] == [2 * n, 2 * n + 2] for n in results)
+    assert sum(calls) == 20 and len(calls) < 10
+
+
+def test_bulk_ingest_directory_and_zip_with_checkpoint(tmp_path, local_backend):
+    src = _corpus(tmp_path)
+    checkpoint = tmp_path / "run.jsonl"
+
+    stats = bulk_ingest.BulkIngest([str(src)], provider="hf", checkpoint=checkpoint, workers=4).run()
+
+    assert stats["status"] == "done"
+    assert stats["docs"] == 10 and stats["failed"] == 0
+    assert stats["chunks"] == 10 and stats["docs_per_s"] > 0
+    # lotes globales: menos llamadas de embeddings que documentos
+    assert sum(local_backend) == 10 and len(local_backend) < 10
+    assert local_store.get_index(ingestion.settings.PINECONE_INDEX).count == 10
+
+    # Reanudación: nada pendiente
+    local_backend.clear()
+    again = bulk_ingest.BulkIngest([str(src)], provider="hf", checkpoint=checkpoint).run()
+    assert again["skipped"] == 10 and again["docs"] == 0 and local_backend == []
+
+
+def test_invalid_run_id_is_rejected(tmp_path, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api import ingest
+
+    monkeypatch.setattr(ingest.settings, "STORAGE_DIR", tmp_path / "storage")
+    app = FastAPI()
+    app.include_router(ingest.router)
+
+    resp = TestClient(app).post(
+        "/ingest/bulk",
+        data={"run_id": "../../x"},
+        files=[("files", ("a.txt", b"hola", "text/plain"))],
+    )
+    assert resp.status_code == 422
+    assert not (tmp_path / "storage").exists()      # nada escrito
+
+    with pytest.raises(ValueError):
+        bulk_ingest.BulkIngest([], run_id="../x")
+
+
+def test_uploaded_copies_are_removed_after_run(tmp_path, local_backend):
+    upload_dir = tmp_path / "uploads" / "req1"
+    upload_dir.mkdir(parents=True)
+    (upload_dir / "nota.txt").write_text("Acta de reunión con acuerdos.", encoding="utf-8")
+
+    stats = bulk_ingest.BulkIngest([str(upload_dir)], provider="hf", run_id="run-1",
+                                   checkpoint=tmp_path / "run.jsonl", upload_dir=upload_dir).run()
+
+    assert stats["docs"] == 1
+    assert not upload_dir.exists() and (tmp_path / "run.jsonl").exists()
+
+
+def test_bulk_upload_keeps_same_named_files_and_resumes_by_content(tmp_path, local_backend, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api import ingest
+
+    monkeypatch.setattr(ingest.settings, "STORAGE_DIR", tmp_path / "storage")
+    monkeypatch.setattr(ingest.ingest_jobs, "get_cpu_executor", lambda: None)
+    runs = []
+
+    def start_now(inputs, **kwargs):   # síncrono para el test
+        run = bulk_ingest.BulkIngest(inputs, **kwargs)
+        runs.append(run.run())
+        return run
+
+    monkeypatch.setattr(bulk_ingest, "start_bulk_ingest", start_now)
+    app = FastAPI()
+    app.include_router(ingest.router)
+    client = TestClient(app)
+
+    files = [
+        ("files", ("a/reporte.txt", "Reporte de ventas de Acme.".encode(), "text/plain")),
+        ("files", ("b/reporte.txt", "Reporte de soporte de Globex.".encode(), "text/plain")),
+    ]
+    assert client.post("/ingest/bulk", data={"run_id": "r1"}, files=files).status_code == 202
+    assert runs[-1]["docs"] == 2
+    lexical = bm25_index.get_lexical_index()
+    for word in ("Acme", "Globex"):
+        assert lexical.search(word, top_k=1)[0]["metadata"]["filename"] == "reporte.txt"
+
+    # Mismos archivos y run_id: el checkpoint los reconoce por contenido
+    assert client.post("/ingest/bulk", data={"run_id": "r1"}, files=files).status_code == 202
+    assert runs[-1]["skipped"] == 2 and runs[-1]["docs"] == 0
+    assert not any((tmp_path / "storage" / "bulk" / "uploads").iterdir())
+
+    resp = client.post("/ingest/bulk", files=[("files", ("..", b"hola", "text/plain"))])
+    assert resp.status_code == 400
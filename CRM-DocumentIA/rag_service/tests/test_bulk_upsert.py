@@ -0,0 +1,59 @@
+# tests/test_bulk_upsert.py
+
+import pytest
+
+from app.vectorstore.bulk_upsert import bulk_upsert, split_batches
+from app.vectorstore.memory_index import InMemoryIndex
+
+
+def _vectors(n, dim=4):
+    return [(f"id-{i}", [float(i)] * dim, {"doc_type": "factura"}) for i in range(n)]
+
+
+def test_split_batches_bounded_by_count_and_bytes():
+    batches = list(split_batches(_vectors(25), max_vectors=10, max_bytes=10_000_000))
+    assert [len(b) for b in batches] == [10, 10, 5]
+
+    small = list(split_batches(_vectors(6, dim=100), max_vectors=100, max_bytes=3000))
+    assert all(len(b) <= 2 for b in small)
+    assert sum(len(b) for b in small) == 6
+
+
+def test_bulk_upsert_into_fake_index():
+    index = InMemoryIndex()
+    stats = bulk_upsert(index, iter(_vectors(50)), batch_size=8, max_concurrency=3)
+
+    assert stats["upserted"] == 50
+    assert stats["batches"] == 7
+    assert index.describe_index_stats()["total_vector_count"] == 50
+
+    res = index.query([1.0, 1.0, 1.0, 1.0], top_k=3, filter={"doc_type": {"$eq": "factura"}})
+    assert len(res["matches"]) == 3
+
+
+def test_failed_batches_are_retried():
+    class FlakyIndex(InMemoryIndex):
+        def __init__(self):
+            super().__init__()
+            self.failures = 0
+
+        def upsert(self, vectors, **kwargs):
+            if self.failures < 2:
+                self.failures += 1
+                raise ConnectionError("503")
+            return super().upsert(vectors)
+
+    index = FlakyIndex()
+    stats = bulk_upsert(index, _vectors(10), batch_size=5, max_concurrency=1, backoff=0)
+
+    assert stats["upserted"] == 10
+    assert stats["retries"] == 2
+
+
+def test_exhausted_retries_raise():
+    class BrokenIndex(InMemoryIndex):
+        def upsert(self, vectors, **kwargs):
+            raise ConnectionError("503")
+
+    with pytest.raises(RuntimeError):
+        bulk_upsert(BrokenIndex(), _vectors(3), max_retries=2, backoff=0)
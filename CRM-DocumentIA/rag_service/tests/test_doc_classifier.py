@@ -0,0 +1,56 @@
+# tests/test_doc_classifier.py
+
+from app.rag import doc_classifier
+from app.rag.doc_classifier import (
+    DOC_PATTERNS, KeywordClassifier, classify_document, detect_query_doc_type
+)
+
+
+def _legacy_detect(text: str) -> str:
+    """Detección anterior: un `kw in t` por palabra clave."""
+    t = text.lower()
+    scores = {k: sum(1 for kw in kws if kw in t) for k, kws in DOC_PATTERNS.items()}
+    best = max(scores, key=scores.get)
+    if scores[best] == 0 or list(scores.values()).count(scores[best]) > 1:
+        return "documento"
+    return best
+
+
+def test_matches_legacy_detection_on_typical_documents():
+    samples = [
+        "CONTRATO de prestación de servicios entre el CONTRATANTE y el contratista. Cláusula primera.",
+        "Factura N° 123\nNIT 900.123.456\nSubtotal: 100\nIVA 19%\nValor total: 119",
+        "Asunto: reunión\nEstimado Juan, quedo atento. Saludos",
+        "Acta de reunión. Asistentes: ... Orden del día: ... Acuerdos: ...",
+        "Propuesta comercial: alcance, entregables y cotización",
+        "Texto sin pistas",
+    ]
+    for text in samples:
+        assert classify_document(text)["doc_type"] == _legacy_detect(text)
+
+
+def test_scores_confidence_and_overlapping_keywords():
+    result = classify_document("Número de factura 77 — subtotal 10")
+    assert result["doc_type"] == "factura"
+    assert result["scores"]["factura"] == 3        # "número de factura" implica "factura"
+    assert result["confidence"] == 1.0
+
+    # Palabra clave dentro de otra palabra no cuenta ("iva" en "archivada", "acta" en "contacto")
+    assert classify_document("carpeta archivada, datos de contacto")["doc_type"] == "documento"
+
+
+def test_window_limits_scored_text(monkeypatch):
+    monkeypatch.setattr(doc_classifier.settings, "DOC_TYPE_WINDOW_CHARS", 100)
+    text = "x " * 100 + "factura subtotal iva"
+    assert classify_document(text)["doc_type"] == "documento"
+
+    clf = KeywordClassifier({"a": ["uno"], "b": ["dos"]})
+    assert clf.classify("uno dos")["doc_type"] is None           # empate → default
+    assert clf.classify("uno dos uno", window=3)["doc_type"] == "a"
+
+
+def test_query_doc_type():
+    assert detect_query_doc_type("¿Qué dice la cláusula de vigencia?") == "contrato"
+    assert detect_query_doc_type("total de las facturas de marzo") == "factura"
+    assert detect_query_doc_type("resume el último email del cliente") == "correo"
+    assert detect_query_doc_type("¿quién es el gerente?") is None
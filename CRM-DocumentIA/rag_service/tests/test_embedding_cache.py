@@ -0,0 +1,56 @@
+# tests/test_embedding_cache.py
+
+import numpy as np
+
+from app.rag.embedding_cache import EmbeddingCache, cache_key
+
+
+def _rows(vectors):
+    return [None if v is None else v.tolist() for v in vectors]
+
+
+def test_cache_key_normalizes_whitespace():
+    assert cache_key("hf", "m", "hola   mundo\n") == cache_key("hf", "m", "hola mundo")
+    assert cache_key("hf", "m", "hola") != cache_key("openai", "m", "hola")
+
+
+def test_hits_misses_and_persistence(tmp_path):
+    path = tmp_path / "emb.sqlite3"
+    cache = EmbeddingCache(path, max_entries=100, memory_entries=10)
+
+    keys = [cache_key("hf", "m", t) for t in ["a", "b"]]
+    assert cache.get_many(keys) == [None, None]
+
+    cache.put_many("hf", "m", keys, [[1.0, 2.0], [3.0, 4.0]])
+    assert _rows(cache.get_many(keys)) == [[1.0, 2.0], [3.0, 4.0]]
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2
+
+    # Nueva instancia: sin nivel en memoria, lee de disco
+    reopened = EmbeddingCache(path, max_entries=100, memory_entries=10)
+    assert _rows(reopened.get_many(keys[:1])) == [[1.0, 2.0]]
+
+
+def test_size_bounded_eviction(tmp_path):
+    cache = EmbeddingCache(tmp_path / "emb.sqlite3", max_entries=10, memory_entries=0)
+    keys = [cache_key("hf", "m", str(i)) for i in range(15)]
+    cache.put_many("hf", "m", keys, [[float(i)] for i in range(15)])
+
+    stats = cache.stats()
+    assert stats["disk_entries"] <= 10
+    assert stats["evictions"] > 0
+
+
+def test_float16_storage_coexists_with_float32(tmp_path):
+    path = tmp_path / "emb.sqlite3"
+    old = EmbeddingCache(path, max_entries=100, memory_entries=0)
+    old.put_many("hf", "m", ["k32"], np.array([[0.1, 0.2]], dtype=np.float32))
+
+    cache = EmbeddingCache(path, max_entries=100, memory_entries=0, dtype="float16")
+    cache.put_many("hf", "m", ["k16"], np.array([[0.1, 0.2]], dtype=np.float32))
+
+    v32, v16 = cache.get_many(["k32", "k16"])
+    assert v32.dtype == v16.dtype == np.float32
+    assert v32.tolist() == np.array([0.1, 0.2], dtype=np.float32).tolist()
+    np.testing.assert_allclose(v16, v32, atol=1e-3)
@@ -0,0 +1,122 @@
+# tests/test_embeddings.py
+
+import numpy as np
+
+from app.rag import embeddings
+from app.rag.embeddings import make_batches
+
+
+def test_make_batches_respects_item_limit():
+    texts = ["a"] * 10
+    assert make_batches(texts, max_items=4) == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_make_batches_respects_token_limit():
+    texts = ["x" * 40] * 6          # ~11 tokens cada uno
+    batches = make_batches(texts, max_items=100, max_tokens=25)
+    assert batches == [(0, 2), (2, 4), (4, 6)]
+
+
+def test_embed_remote_keeps_order_and_retries(monkeypatch):
+    monkeypatch.setattr(embeddings.settings, "EMB_BATCH_SIZE_HF", 3)
+    monkeypatch.setattr(embeddings.settings, "EMB_RETRY_BACKOFF", 0.0)
+
+    failed = set()
+
+    def fake_embed(batch):
+        # el primer intento de cada lote falla
+        key = batch[0]
+        if key not in failed:
+            failed.add(key)
+            raise embeddings.TransientEmbeddingError("429")
+        return [[float(t)] for t in batch]
+
+    texts = [str(i) for i in range(10)]
+    vectors = embeddings._embed_remote(fake_embed, texts, "hf")
+
+    assert vectors.dtype == np.float32
+    assert vectors.tolist() == [[float(i)] for i in range(10)]
+    assert len(failed) == 4
+
+
+def test_embed_remote_async_keeps_order_and_retries(monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(embeddings.settings, "EMB_BATCH_SIZE_HF", 3)
+    monkeypatch.setattr(embeddings.settings, "EMB_RETRY_BACKOFF", 0.0)
+
+    failed = set()
+
+    async def fake_embed(batch):
+        key = batch[0]
+        if key not in failed:
+            failed.add(key)
+            raise embeddings.TransientEmbeddingError("429")
+        return [[float(t)] for t in batch]
+
+    texts = [str(i) for i in range(10)]
+    vectors = asyncio.run(embeddings._embed_remote_async(fake_embed, texts, "hf"))
+
+    assert vectors.dtype == np.float32
+    assert vectors.tolist() == [[float(i)] for i in range(10)]
+    assert len(failed) == 4
+
+
+def test_non_transient_error_is_raised_after_one_attempt(monkeypatch):
+    import asyncio
+
+    import pytest
+
+    monkeypatch.setattr(embeddings.settings, "EMB_RETRY_BACKOFF", 0.0)
+    calls = []
+
+    def fake_embed(batch):
+        calls.append(batch)
+        raise RuntimeError("OPENAI_API_KEY no configurada.")
+
+    async def fake_embed_async(batch):
+        return fake_embed(batch)
+
+    with pytest.raises(RuntimeError, match="OPENAI_API_KEY"):
+        embeddings._embed_batch_with_retry(fake_embed, ["a"], "openai", 1)
+    assert len(calls) == 1
+
+    with pytest.raises(RuntimeError, match="OPENAI_API_KEY"):
+        asyncio.run(embeddings._embed_batch_with_retry_async(fake_embed_async, ["a"], "openai", 1))
+    assert len(calls) == 2
+
+
+def test_hf_status_is_classified_as_transient_or_not():
+    import pytest
+
+    with pytest.raises(embeddings.TransientEmbeddingError) as exc:
+        embeddings._check_hf_response(503, "loading", {"Retry-After": "2"})
+    assert embeddings._is_transient(exc.value)
+    assert embeddings._retry_after(exc.value) == 2.0
+
+    with pytest.raises(RuntimeError) as exc:
+        embeddings._check_hf_response(401, "unauthorized", {})
+    assert not embeddings._is_transient(exc.value)
+
+
+def test_embed_array_merges_cache_hits_and_duplicates(tmp_path, monkeypatch):
+    from app.rag.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(tmp_path / "emb.sqlite3", max_entries=100, memory_entries=10)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+
+    sent = []
+
+    def fake_compute(texts, provider):
+        sent.append(list(texts))
+        return np.array([[float(t), 1.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "_compute_embeddings", fake_compute)
+
+    embeddings.embed_array(["1", "2"], provider="hf")
+    out = embeddings.embed_array(["2", "3", "3", "1"], provider="hf", dtype=np.float16)
+
+    assert sent == [["1", "2"], ["3"]]
+    assert out.dtype == np.float16 and out.flags.c_contiguous
+    assert out[:, 0].tolist() == [2.0, 3.0, 3.0, 1.0]
+    assert embeddings.embed_texts([], provider="hf") == []
@@ -0,0 +1,60 @@
+# tests/test_feedback.py
+
+import json
+import threading
+
+from app.rag.feedback_store import FeedbackStore
+
+DAY = 86400
+NOW = 1_800_000_000.0
+
+
+def test_concurrent_writes_are_not_lost(tmp_path):
+    store = FeedbackStore(tmp_path / "feedback.sqlite3")
+
+    def post(n):
+        for i in range(50):
+            store.add(f"q{n}-{i}", "a", correct=i % 2 == 0, doc_type="factura")
+
+    threads = [threading.Thread(target=post, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert store.add("última", "a", correct=True) == 401
+    assert store.stats(days=None)["windows"]["total"]["total"] == 401
+
+
+def test_stats_by_window_doc_type_and_provider(tmp_path):
+    store = FeedbackStore(tmp_path / "feedback.sqlite3")
+    store.add("q", "a", True, doc_type="factura", provider="openai", ts=NOW - 3600)
+    store.add("q", "a", False, doc_type="factura", provider="hf", ts=NOW - 2 * DAY)
+    store.add("q", "a", True, doc_type="contrato", provider="hf", ts=NOW - 10 * DAY)
+    store.add("q", "a", False, doc_type="contrato", provider="hf", ts=NOW - 60 * DAY)
+
+    stats = store.stats(days=30, now=NOW)
+    assert stats["windows"]["24h"] == {"total": 1, "correct": 1, "accuracy": 1.0}
+    assert stats["windows"]["7d"]["total"] == 2 and stats["windows"]["7d"]["accuracy"] == 0.5
+    assert stats["windows"]["total"]["total"] == 4
+    assert {r["doc_type"]: r["total"] for r in stats["by_doc_type"]} == {"factura": 2, "contrato": 1}
+    assert {r["provider"]: r["accuracy"] for r in stats["by_provider"]} == {"hf": 0.5, "openai": 1.0}
+    assert sum(b["total"] for b in stats["timeline"]) == 3
+
+    only_hf = store.stats(days=None, bucket=None, provider="hf", now=NOW)
+    assert only_hf["windows"]["total"] == {"total": 3, "correct": 1, "accuracy": 0.3333}
+    assert only_hf["timeline"] == []
+
+
+def test_imports_legacy_json_log_once(tmp_path):
+    legacy = tmp_path / "feedback_log.json"
+    legacy.write_text(json.dumps([
+        {"question": "q1", "answer": "a", "correct": True, "timestamp": "2024-05-01 10:00:00"},
+        {"question": "q2", "answer": "a", "correct": False, "doc_type": "pqr", "timestamp": "2024-05-02 10:00:00"},
+    ]))
+
+    FeedbackStore(tmp_path / "feedback.sqlite3", legacy_log=legacy)
+    store = FeedbackStore(tmp_path / "feedback.sqlite3", legacy_log=legacy)   # reabrir: no duplica
+
+    total = store.stats(days=None)["windows"]["total"]
+    assert total == {"total": 2, "correct": 1, "accuracy": 0.5}
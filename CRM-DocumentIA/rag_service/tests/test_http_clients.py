@@ -0,0 +1,76 @@
+# tests/test_http_clients.py
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core import http_clients
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """Responde 429 las primeras `failures` veces y luego 200."""
+    protocol_version = "HTTP/1.1"   # keep-alive
+    failures = 2
+    calls = 0
+    ports = set()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        cls = type(self)
+        cls.calls += 1
+        cls.ports.add(self.client_address[1])
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        status = 429 if cls.calls <= cls.failures else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def flaky_server(monkeypatch):
+    monkeypatch.setattr(http_clients.settings, "HTTP_BACKOFF_BASE", 0.0)
+    handler = type("Handler", (_FlakyHandler,), {"calls": 0, "ports": set()})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    http_clients.reset_clients()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", handler
+    httpd.shutdown()
+    httpd.server_close()
+    http_clients.reset_clients()
+
+
+def test_sync_retries_429_and_reuses_connection(flaky_server):
+    url, handler = flaky_server
+    resp = http_clients.request_with_retry("hf", "POST", url, json={})
+    assert resp.status_code == 200
+    assert handler.calls == 3
+
+    http_clients.request_with_retry("hf", "POST", url, json={})
+    assert len(handler.ports) == 1   # misma conexión keep-alive
+
+
+def test_async_retries_429(flaky_server):
+    url, handler = flaky_server
+
+    async def run():
+        return await http_clients.arequest_with_retry("hf", "POST", url, json={})
+
+    resp = asyncio.run(run())
+    assert resp.status_code == 200
+    assert handler.calls == 3
+
+
+def test_gives_up_after_max_retries(flaky_server, monkeypatch):
+    url, handler = flaky_server
+    monkeypatch.setattr(http_clients.settings, "HTTP_MAX_RETRIES", 1)
+    resp = http_clients.request_with_retry("hf", "POST", url, json={})
+    assert resp.status_code == 429
+    assert handler.calls == 2
@@ -0,0 +1,69 @@
+# tests/test_inference_backends.py
+"""
+Paridad de los backends optimizados frente a PyTorch float32.
+Requiere sentence-transformers (y optimum[onnxruntime] para "onnx") y
+los modelos descargables; si falta algo, se omite.
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from app.rag import local_models
+
+EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CE_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+TEXTS = [
+    "El contratista entregará informes mensuales de avance.",
+    "Factura número 1234: subtotal 100, IVA 19, valor total 119.",
+    "Asunto: reunión de seguimiento. Estimado equipo, saludos.",
+    "Acta de la reunión con los acuerdos y los asistentes.",
+]
+QUERY = "¿Qué valor total tiene la factura?"
+
+# backend → (coseno mínimo entre embeddings, diferencia máx. de puntaje de rerank)
+TOLERANCE = {"onnx": (0.999, 0.01), "int8": (0.98, 0.5)}
+
+
+def _load(loader, *args, **kwargs):
+    try:
+        return loader(*args, **kwargs)
+    except OSError as e:   # modelo no descargable (sin red)
+        pytest.skip(f"Modelo no disponible: {e}")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "int8"])
+def test_embeddings_match_torch(backend):
+    if backend == "onnx":
+        pytest.importorskip("optimum.onnxruntime")
+    min_cos, _ = TOLERANCE[backend]
+
+    ref = _load(local_models.load_sentence_transformer, EMB_MODEL, backend="torch")
+    opt = _load(local_models.load_sentence_transformer, EMB_MODEL, backend=backend)
+    # Sin esto un fallback silencioso compararía PyTorch contra PyTorch
+    assert local_models.resolved_backend(EMB_MODEL) == backend, local_models.backend_report()
+
+    a = ref.encode(TEXTS, normalize_embeddings=True, convert_to_numpy=True)
+    b = opt.encode(TEXTS, normalize_embeddings=True, convert_to_numpy=True)
+
+    assert np.min(np.sum(a * b, axis=1)) >= min_cos
+
+
+@pytest.mark.parametrize("backend", ["onnx", "int8"])
+def test_rerank_scores_match_torch(backend):
+    if backend == "onnx":
+        pytest.importorskip("optimum.onnxruntime")
+    _, max_diff = TOLERANCE[backend]
+
+    ref = _load(local_models.load_cross_encoder, CE_MODEL, max_length=256, backend="torch")
+    opt = _load(local_models.load_cross_encoder, CE_MODEL, max_length=256, backend=backend)
+    assert local_models.resolved_backend(CE_MODEL) == backend, local_models.backend_report()
+
+    pairs = [(QUERY, t) for t in TEXTS]
+    a = np.asarray(ref.predict(pairs), dtype=np.float32)
+    b = np.asarray(opt.predict(pairs), dtype=np.float32)
+
+    assert np.max(np.abs(a - b)) <= max_diff
+    assert np.argmax(a) == np.argmax(b)
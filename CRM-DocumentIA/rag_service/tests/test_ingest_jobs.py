@@ -0,0 +1,64 @@
+# tests/test_ingest_jobs.py
+
+import asyncio
+
+from app.rag import ingest_jobs
+from app.rag.ingest_jobs import JobStore
+
+
+def test_job_lifecycle_records_stages(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(ingest_jobs, "_store", store)
+
+    def fake_ingest(file_path, source_name, provider, on_stage, cpu_executor, include_text, filename,
+                    external_id=None):
+        for stage in ("extract", "chunk", "embed", "upsert"):
+            on_stage(stage, "running", None)
+            on_stage(stage, "done", 0.01)
+        return {"status": "ok", "document_id": "doc-1"}
+
+    monkeypatch.setattr(ingest_jobs, "ingest_file_to_pinecone", fake_ingest)
+
+    doc = tmp_path / "a.txt"
+    doc.write_text("hola")
+    job_id = ingest_jobs.submit_ingest_job(str(doc), "a.txt", "hf", "pytest")
+
+    job = asyncio.run(ingest_jobs.wait_for_job(job_id))
+
+    assert job["status"] == ingest_jobs.DONE
+    assert job["result"]["document_id"] == "doc-1"
+    assert list(job["stages"]) == ["extract", "chunk", "embed", "upsert"]
+    assert all(s["status"] == "done" for s in job["stages"].values())
+    assert store.list_jobs()[0]["job_id"] == job_id
+
+
+def test_failed_job_keeps_error(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(ingest_jobs, "_store", store)
+    monkeypatch.setattr(
+        ingest_jobs, "ingest_file_to_pinecone",
+        lambda *a, **k: {"status": "error", "error": "no_text_extracted"}
+    )
+
+    job_id = ingest_jobs.submit_ingest_job("x.pdf", "x.pdf", "hf", "pytest")
+    job = asyncio.run(ingest_jobs.wait_for_job(job_id))
+
+    assert job["status"] == ingest_jobs.FAILED
+    assert job["error"] == "no_text_extracted"
+
+
+def test_cpu_executor_does_not_fork(tmp_path, monkeypatch):
+    from app.utils.text_extract import extract_text
+
+    monkeypatch.setattr(ingest_jobs, "_job_executor", None)
+    monkeypatch.setattr(ingest_jobs, "_cpu_executor", None)
+
+    pool = ingest_jobs.get_cpu_executor()
+    try:
+        assert pool._mp_context.get_start_method() != "fork"
+
+        doc = tmp_path / "a.txt"
+        doc.write_text("hola mundo")
+        assert "hola mundo" in pool.submit(extract_text, str(doc)).result(timeout=60)
+    finally:
+        ingest_jobs.shutdown()
@@ -0,0 +1,271 @@
+# tests/test_ingestion.py
+
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import openpyxl
+import pytest
+
+from app.rag import doc_registry, ingestion
+from app.utils.chunker import chunk_rows, chunk_stream, chunk_text
+from app.vectorstore import bm25_index, local_store
+
+PARAGRAPH = (
+    "Contrato de prestación de servicios. El contratista se obliga a entregar los informes "
+    "mensuales. La cláusula de honorarios fija el pago a treinta días."
+)
+
+
+@pytest.fixture
+def local_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion.settings, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(ingestion.settings, "LOCAL_VECTOR_DIR", tmp_path / "vectors")
+    monkeypatch.setattr(local_store, "_indexes", {})
+    monkeypatch.setattr(ingestion.settings, "DOC_REGISTRY_DB", tmp_path / "documents.sqlite3")
+    monkeypatch.setattr(doc_registry, "_registry", None)
+    monkeypatch.setattr(ingestion.settings, "BM25_INDEX_DB", tmp_path / "bm25.sqlite3")
+    monkeypatch.setattr(bm25_index, "_index", None)
+    monkeypatch.setattr(ingestion, "generate_summary", lambda text, provider=None: text[:50])
+
+    batches = []
+
+    def fake_embed(texts, provider=None):
+        batches.append(len(texts))
+        return np.array([[float(len(t)), 1.0, 0.0] for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(ingestion, "embed_array", fake_embed)
+    return batches
+
+
+def test_chunk_stream_matches_whole_text_chunking():
+    pages = [f"Página {n}. " + PARAGRAPH * 5 for n in range(40)]
+    streamed = list(chunk_stream(pages, chunk_size=300, chunk_overlap=60, window=1200))
+    whole = chunk_text("\n".join(pages), chunk_size=300, chunk_overlap=60)
+
+    assert all(len(c) <= 300 for c in streamed)
+    # mismo contenido, en orden (la ventana solo puede mover algún corte)
+    assert streamed[0] == whole[0] and streamed[-1] == whole[-1]
+    assert abs(len(streamed) - len(whole)) <= len(whole) // 10
+    for n in range(40):
+        assert any(f"Página {n}." in c for c in streamed)
+
+
+def test_streaming_ingest_batches_and_omits_text(tmp_path, local_backend, monkeypatch):
+    monkeypatch.setattr(ingestion.settings, "INGEST_EMBED_BATCH", 8)
+    monkeypatch.setattr(ingestion.settings, "INGEST_PREFIX_CHARS", 2000)
+
+    path = tmp_path / "contrato.txt"
+    path.write_text("\n\n".join(PARAGRAPH for _ in range(200)), encoding="utf-8")
+
+    stages = {}
+    result = ingestion.ingest_file_to_pinecone(
+        str(path), provider="hf", chunk_size=300,
+        on_stage=lambda name, status, elapsed: stages.__setitem__(name, status)
+    )
+
+    assert result["status"] == "ok"
+    assert result["doc_type"] == "contrato"
+    assert "contenido_extraido" not in result
+    assert result["caracteres_extraidos"] > 20000
+
+    n_chunks = result["archivo_metadata_json"]["chunks"]
+    assert max(local_backend) == 8 and sum(local_backend) == n_chunks
+    assert local_store.get_index(ingestion.settings.PINECONE_INDEX).count == n_chunks
+    assert set(stages) == {"extract", "chunk", "embed", "upsert", "summary"}
+    assert set(stages.values()) == {"done"}
+
+
+def test_include_text_returns_full_content(tmp_path, local_backend):
+    path = tmp_path / "nota.txt"
+    path.write_text(PARAGRAPH, encoding="utf-8")
+
+    result = ingestion.ingest_file_to_pinecone(str(path), provider="hf", include_text=True)
+
+    assert result["contenido_extraido"] == PARAGRAPH
+
+
+def test_empty_document_reports_no_text(tmp_path, local_backend):
+    path = tmp_path / "vacio.txt"
+    path.write_text("   \n", encoding="utf-8")
+
+    assert ingestion.ingest_file_to_pinecone(str(path), provider="hf")["error"] == "no_text_extracted"
+
+
+def test_reingest_embeds_only_changed_chunks(tmp_path, local_backend):
+    clauses = [f"Cláusula {n}. " + PARAGRAPH for n in range(30)]
+    path = tmp_path / "contrato.txt"
+    path.write_text("\n\n".join(clauses), encoding="utf-8")
+
+    first = ingestion.ingest_file_to_pinecone(str(path), provider="hf", chunk_size=300, external_id="crm-7")
+    n_first = first["archivo_metadata_json"]["chunks"]
+    assert first["cambios"]["chunks_nuevos"] == n_first
+
+    # Revisión: una cláusula modificada y otra eliminada
+    clauses[10] = "Cláusula 10. El plazo de pago se reduce a quince días hábiles."
+    del clauses[20]
+    path.write_text("\n\n".join(clauses), encoding="utf-8")
+    local_backend.clear()
+
+    second = ingestion.ingest_file_to_pinecone(str(path), provider="hf", chunk_size=300, external_id="crm-7")
+    changes = second["cambios"]
+
+    assert second["document_id"] == first["document_id"]
+    assert not changes["archivo_sin_cambios"]
+    assert 0 < changes["chunks_nuevos"] <= 2 and sum(local_backend) == changes["chunks_nuevos"]
+    assert changes["chunks_eliminados"] >= 2
+    index = local_store.get_index(ingestion.settings.PINECONE_INDEX)
+    assert index.count == second["archivo_metadata_json"]["chunks"]
+
+    # Mismo archivo otra vez: nada que embeber ni borrar
+    local_backend.clear()
+    third = ingestion.ingest_file_to_pinecone(str(path), provider="hf", chunk_size=300, external_id="crm-7")
+    assert third["cambios"]["archivo_sin_cambios"] and local_backend == []
+    assert third["cambios"]["chunks_eliminados"] == 0
+
+
+def _stored_chunks(document_id: str) -> list[dict]:
+    index = local_store.get_index(ingestion.settings.PINECONE_INDEX)
+    stored = [m for m in index.metadata if m and m["document_id"] == document_id]
+    return sorted(stored, key=lambda m: m["chunk_index"])
+
+
+def test_reingest_refreshes_metadata_of_unchanged_chunks(tmp_path, local_backend):
+    clauses = [f"Cláusula {n}. " + PARAGRAPH for n in range(12)]
+    path = tmp_path / "contrato.txt"
+    path.write_text("\n\n".join(clauses), encoding="utf-8")
+    options = dict(provider="hf", chunk_size=300, external_id="crm-9")
+
+    first = ingestion.ingest_file_to_pinecone(str(path), filename="contrato_v1.txt", **options)
+
+    # Mismo contenido con otro nombre: nada que embeber, solo metadata
+    local_backend.clear()
+    renamed = ingestion.ingest_file_to_pinecone(str(path), filename="contrato_v2.txt", **options)
+    assert local_backend == []
+    assert renamed["cambios"]["chunks_actualizados"] == renamed["archivo_metadata_json"]["chunks"]
+    assert {m["filename"] for m in _stored_chunks(first["document_id"])} == {"contrato_v2.txt"}
+
+    # Cláusula nueva al principio: los chunks siguientes cambian de posición
+    path.write_text("\n\n".join(["Cláusula 0bis. " + PARAGRAPH] + clauses),
+                    encoding="utf-8")
+    local_backend.clear()
+    moved = ingestion.ingest_file_to_pinecone(str(path), filename="contrato_v2.txt", **options)
+    assert sum(local_backend) == moved["cambios"]["chunks_nuevos"] < moved["archivo_metadata_json"]["chunks"]
+    assert moved["cambios"]["chunks_actualizados"] > 0
+
+    # Misma metadata que una ingesta desde cero del archivo actual
+    fresh = ingestion.ingest_file_to_pinecone(str(path), filename="contrato_v2.txt", provider="hf",
+                                              chunk_size=300, external_id="crm-10")
+    key = lambda m: (m["chunk_index"], m["text_excerpt"], m["filename"])
+    assert [key(m) for m in _stored_chunks(moved["document_id"])] == \
+        [key(m) for m in _stored_chunks(fresh["document_id"])]
+    assert _stored_chunks(moved["document_id"])[0]["text_excerpt"].startswith("Cláusula 0bis")
+
+    hit = bm25_index.get_lexical_index().search("Cláusula 5", top_k=1,
+                                                filters={"document_id": moved["document_id"]})[0]
+    stored = {m["text_excerpt"]: m for m in _stored_chunks(moved["document_id"])}
+    assert hit["metadata"] == stored[hit["metadata"]["text_excerpt"]]
+
+
+def test_same_filename_different_files_are_separate_documents(tmp_path, local_backend):
+    first_dir, second_dir = tmp_path / "cliente_a", tmp_path / "cliente_b"
+    first_dir.mkdir()
+    second_dir.mkdir()
+    (first_dir / "factura.txt").write_text("Factura FAC-10001 de Acme. Subtotal 100. IVA 19.", encoding="utf-8")
+    (second_dir / "factura.txt").write_text("Factura FAC-20002 de Globex. Subtotal 50. IVA 9.", encoding="utf-8")
+
+    # Mismos provider, origen y nombre de archivo (como los envía el backend .NET)
+    first = ingestion.ingest_file_to_pinecone(str(first_dir / "factura.txt"), provider="hf",
+                                              source_name="upload", filename="factura.pdf")
+    second = ingestion.ingest_file_to_pinecone(str(second_dir / "factura.txt"), provider="hf",
+                                               source_name="upload", filename="factura.pdf")
+
+    assert first["document_id"] != second["document_id"]
+    assert second["cambios"]["chunks_eliminados"] == 0
+    index = local_store.get_index(ingestion.settings.PINECONE_INDEX)
+    assert index.count == first["archivo_metadata_json"]["chunks"] + second["archivo_metadata_json"]["chunks"]
+
+    lexical = bm25_index.get_lexical_index()
+    assert lexical.search("FAC-10001", top_k=1)[0]["metadata"]["document_id"] == first["document_id"]
+    assert lexical.search("FAC-20002", top_k=1)[0]["metadata"]["document_id"] == second["document_id"]
+
+
+def test_chunk_rows_keeps_rows_whole_and_repeats_header():
+    rows = [("Ventas", 1, "sku | cantidad")]
+    rows += [("Ventas", n, f"SKU-{n:05d} | {n}") for n in range(2, 60)]
+    rows += [("Notas", 3, "sin encabezado")]
+
+    chunks = list(chunk_rows(rows, chunk_size=120))
+    metas = [m for _, m in chunks]
+
+    assert metas[0] == {"sheet": "Ventas", "row_start": 1, "row_end": metas[0]["row_end"]}
+    # Rangos contiguos, sin filas partidas ni repetidas
+    assert [m["row_start"] for m in metas[1:-1]] == [m["row_end"] + 1 for m in metas[:-2]]
+    assert metas[-2]["row_end"] == 59 and metas[-1] == {"sheet": "Notas", "row_start": 3, "row_end": 3}
+    for text, meta in chunks[1:-1]:
+        assert text.splitlines()[1] == "sku | cantidad"
+        assert f"SKU-{meta['row_end']:05d} | {meta['row_end']}" in text
+
+
+def test_chunk_rows_splits_rows_longer_than_a_chunk():
+    notes = " ".join(f"Observación {n} del cliente sobre la entrega." for n in range(200))
+    rows = [("Pedidos", 1, "pedido | notas"), ("Pedidos", 2, "P-1 | ok"),
+            ("Pedidos", 3, f"P-2 | {notes}"), ("Pedidos", 4, "P-3 | ok")]
+
+    chunks = list(chunk_rows(rows, chunk_size=300))
+    pieces = [(text, meta) for text, meta in chunks if meta["row_start"] == meta["row_end"] == 3]
+
+    assert len(pieces) > 10
+    assert all(len(text) <= 300 + 60 for text, _ in chunks)   # tope + título de hoja/fila
+    for n, (text, _) in enumerate(pieces, start=1):
+        title, header = text.splitlines()[:2]
+        assert title == f"--- HOJA: Pedidos (fila 3, parte {n}/{len(pieces)}) ---"
+        assert header == "pedido | notas"
+    assert "Observación 199 del" in pieces[-1][0]
+    assert chunks[-1][1] == {"sheet": "Pedidos", "row_start": 4, "row_end": 4}
+
+
+def test_xlsx_ingest_attaches_sheet_and_row_range(tmp_path, local_backend, monkeypatch):
+    monkeypatch.setattr(ingestion.settings, "XLSX_MAX_ROWS_PER_SHEET", 500)
+
+    path = tmp_path / "ventas.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Ventas"
+    ws.append(["sku", "cliente", "valor total"])
+    for n in range(1, 2000):
+        ws.append([f"SKU-{n:05d}", f"Cliente {n % 7}", n * 10])
+    wb.save(path)
+
+    result = ingestion.ingest_file_to_pinecone(str(path), provider="hf", chunk_size=300)
+    assert result["status"] == "ok"
+
+    hits = bm25_index.get_lexical_index().search("SKU-00042", top_k=1)
+    meta = hits[0]["metadata"]
+    assert meta["sheet"] == "Ventas" and meta["row_start"] <= 43 <= meta["row_end"]
+
+    # Límite por hoja: 500 filas (encabezado + SKU-00001..SKU-00499)
+    lexical = bm25_index.get_lexical_index()
+    assert lexical.search("SKU-00499", top_k=1)[0]["metadata"]["row_end"] == 500
+    assert not any(h.get("exact_match") for h in lexical.search("SKU-00500", top_k=3))
+
+
+def test_xlsx_rows_are_parsed_in_the_cpu_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    path = tmp_path / "stock.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Stock"
+    ws.append(["sku", "bodega"])
+    for n in range(1, 50):
+        ws.append([f"SKU-{n:03d}", "Norte"])
+    wb.save(path)
+
+    inline = list(ingestion.iter_sheet_rows(str(path)))
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pooled = list(ingestion.iter_sheet_rows(str(path), executor=pool))
+
+    assert pooled == inline
+    assert pooled[1] == ("Stock", 2, "SKU-001 | Norte")
+    assert not list(tmp_path.glob("xlsx-rows-*"))
@@ -0,0 +1,48 @@
+# tests/test_llm_stream.py
+
+import pytest
+
+from app.core import http_clients
+from app.rag import llm_router
+from tests.fake_llm_server import FakeLLMServer, TOKENS
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    with FakeLLMServer() as url:
+        monkeypatch.setattr(llm_router.settings, "HF_API_URL", f"{url}/models/fake")
+        monkeypatch.setattr(llm_router.settings, "HF_MODEL", "fake")
+        monkeypatch.setattr(llm_router.settings, "HF_INFERENCE_API_KEY", "test")
+        monkeypatch.setattr(llm_router.settings, "OPENAI_BASE_URL", f"{url}/v1")
+        monkeypatch.setattr(llm_router.settings, "OPENAI_API_KEY", "test")
+        http_clients.reset_clients()
+        yield url
+    http_clients.reset_clients()
+
+
+def test_hf_stream_yields_tokens_in_order(fake_llm):
+    assert list(llm_router.stream_answer("prompt", provider="hf")) == TOKENS
+
+
+def test_openai_stream_yields_tokens_in_order(fake_llm):
+    assert list(llm_router.stream_answer("prompt", provider="openai")) == TOKENS
+
+
+def test_stream_matches_blocking_answer(fake_llm):
+    streamed = "".join(llm_router.stream_answer("prompt", provider="hf"))
+    assert streamed == llm_router.generate_answer("prompt", provider="hf")
+
+
+def test_stream_reports_provider_errors(monkeypatch):
+    monkeypatch.setattr(llm_router.settings, "HF_INFERENCE_API_KEY", None)
+    chunks = list(llm_router.stream_answer("prompt", provider="hf"))
+    assert chunks and "Error" in chunks[-1]
+
+
+@pytest.mark.parametrize("provider", ["hf", "openai"])
+def test_async_answer_matches_blocking_answer(fake_llm, provider):
+    import asyncio
+
+    async_answer = asyncio.run(llm_router.generate_answer_async("prompt", provider=provider))
+    assert async_answer == llm_router.generate_answer("prompt", provider=provider)
+    assert async_answer == "".join(TOKENS)
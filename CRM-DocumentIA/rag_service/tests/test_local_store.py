@@ -0,0 +1,169 @@
+# tests/test_local_store.py
+
+import numpy as np
+
+from app.vectorstore.local_store import LocalVectorIndex
+
+
+def _meta(provider, doc_type, document_id="doc-1"):
+    return {"provider": provider, "doc_type": doc_type, "document_id": document_id}
+
+
+def test_query_matches_exact_cosine_and_filters(tmp_path):
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(300, 16)).astype(np.float32)
+    index = LocalVectorIndex(tmp_path / "idx", dim=16)
+    index.upsert(
+        (f"c{i}", vecs[i].tolist(), _meta("hf" if i % 2 else "openai", "factura" if i % 3 else "contrato"))
+        for i in range(300)
+    )
+
+    q = vecs[7]
+    res = index.query(q.tolist(), top_k=5, filter={"provider": {"$eq": "hf"}, "doc_type": {"$eq": "factura"}})
+
+    # referencia: coseno exacto en NumPy sobre las filas que cumplen el filtro
+    allowed = [i for i in range(300) if i % 2 and i % 3]
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    ref = sorted(allowed, key=lambda i: -float(unit[i] @ (q / np.linalg.norm(q))))[:5]
+
+    assert [m["id"] for m in res["matches"]] == [f"c{i}" for i in ref]
+    assert res["matches"][0]["id"] == "c7"
+    assert all(m["metadata"]["provider"] == "hf" for m in res["matches"])
+
+
+def test_persistence_overwrite_and_delete(tmp_path):
+    index = LocalVectorIndex(tmp_path / "idx", dim=3)
+    index.upsert([("a", [1, 0, 0], _meta("hf", "acta")), ("b", [0, 1, 0], _meta("hf", "acta"))])
+    index.upsert([("a", [0, 0, 1], _meta("hf", "correo"))])
+    index.delete(["b"])
+    index.update_metadata([("a", _meta("hf", "correo", "doc-2")), ("b", _meta("hf", "acta"))])
+
+    # crecer más allá de la capacidad inicial
+    index.upsert((f"x{i}", [1, 1, 1], _meta("hf", "acta")) for i in range(2000))
+
+    reopened = LocalVectorIndex(tmp_path / "idx")
+    assert reopened.count == 2001
+    res = reopened.query([0, 0, 1], top_k=1, filter={"doc_type": "correo", "document_id": "doc-2"})
+    assert res["matches"][0]["id"] == "a"
+    assert reopened.query([0, 1, 0], top_k=5, filter={"document_id": {"$in": ["nope"]}}) == {"matches": []}
+
+
+def test_ivf_matches_exact_when_probing_all_lists(tmp_path, monkeypatch):
+    from app.vectorstore import local_store
+
+    monkeypatch.setattr(local_store.settings, "LOCAL_IVF_MIN_TRAIN", 500)
+    monkeypatch.setattr(local_store.settings, "LOCAL_IVF_NLIST", 16)
+
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(1200, 8)).astype(np.float32)
+    meta = [_meta("hf", "factura" if i % 2 else "acta") for i in range(1200)]
+
+    exact = LocalVectorIndex(tmp_path / "exact", dim=8)
+    ivf = LocalVectorIndex(tmp_path / "ivf", dim=8, ann="ivf")
+    for index in (exact, ivf):
+        index.upsert((f"c{i}", vecs[i], meta[i]) for i in range(600))
+        index.upsert((f"c{i}", vecs[i], meta[i]) for i in range(600, 1200))
+
+    ivf.wait_for_ann()
+    assert ivf.ann.trained
+    flt = {"doc_type": {"$eq": "factura"}}
+    for q in vecs[:20]:
+        ref = exact.query(q, top_k=5, filter=flt)["matches"]
+        got = ivf.query(q, top_k=5, filter=flt, nprobe=16)["matches"]
+        assert [m["id"] for m in got] == [m["id"] for m in ref]
+
+    # persistido: al reabrir se cargan centroides y asignaciones
+    reopened = LocalVectorIndex(tmp_path / "ivf", ann="ivf")
+    assert reopened.ann.trained
+    assert reopened.query(vecs[3], top_k=1, nprobe=16)["matches"][0]["id"] == "c3"
+
+
+def test_compaction_drops_dead_rows_and_survives_reopen(tmp_path, monkeypatch):
+    from app.vectorstore import local_store
+
+    monkeypatch.setattr(local_store.settings, "LOCAL_COMPACT_MIN_ENTRIES", 100)
+
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(3000, 8)).astype(np.float32)
+    index = LocalVectorIndex(tmp_path / "idx", dim=8)
+    index.upsert((f"c{i}", vecs[i], _meta("hf", "acta", f"doc-{i % 3}")) for i in range(3000))
+
+    # re-ingestas: se borran dos tercios y se sobrescribe parte del resto
+    index.delete([f"c{i}" for i in range(3000) if i % 3])
+    index.upsert((f"c{i}", vecs[i], _meta("hf", "correo", f"doc-{i % 3}")) for i in range(0, 300, 3))
+
+    assert index.generation > 0
+    assert index.size == index.count == 1000
+    assert not (tmp_path / "idx" / "vectors.f32").exists()
+    assert not (tmp_path / "idx" / "meta.jsonl").exists()
+
+    reopened = LocalVectorIndex(tmp_path / "idx")
+    assert reopened.count == 1000
+    for i in (0, 297, 2997):
+        match = reopened.query(vecs[i], top_k=1)["matches"][0]
+        assert match["id"] == f"c{i}"
+        assert match["metadata"]["doc_type"] == ("correo" if i < 300 else "acta")
+    assert reopened.query(vecs[1], top_k=1, filter={"document_id": "doc-1"}) == {"matches": []}
+
+
+def test_ivf_trains_off_lock_and_assigns_rows_written_meanwhile(tmp_path, monkeypatch):
+    import threading
+
+    from app.vectorstore import ivf as ivf_module
+    from app.vectorstore import local_store
+
+    monkeypatch.setattr(local_store.settings, "LOCAL_IVF_MIN_TRAIN", 500)
+    monkeypatch.setattr(local_store.settings, "LOCAL_IVF_NLIST", 16)
+    monkeypatch.setattr(ivf_module, "_SCORE_BUDGET", 16 * 100)   # bloques de 100 filas
+
+    rng = np.random.default_rng(3)
+    vecs = rng.normal(size=(1200, 8)).astype(np.float32)
+    index = LocalVectorIndex(tmp_path / "ivf", dim=8, ann="ivf")
+
+    release = threading.Event()
+    build = index.ann.build
+
+    def slow_build(matrix, rows):
+        release.wait(10)
+        return build(matrix, rows)
+
+    monkeypatch.setattr(index.ann, "build", slow_build)
+
+    index.upsert((f"c{i}", vecs[i], _meta("hf", "acta")) for i in range(600))
+    # entrenando en otro hilo: consultas y escrituras no esperan
+    assert not index.ann.trained
+    assert index.query(vecs[5], top_k=1)["matches"][0]["id"] == "c5"
+    index.upsert((f"c{i}", vecs[i], _meta("hf", "acta")) for i in range(600, 1200))
+
+    release.set()
+    index.wait_for_ann()
+    assert index.ann.trained and index.ann.trained_on == 600
+    assert (index.ann.assign[:index.size] >= 0).all()
+    for i in (5, 900):
+        assert index.query(vecs[i], top_k=1, nprobe=16)["matches"][0]["id"] == f"c{i}"
+
+
+def test_compaction_keeps_ivf_lists_aligned(tmp_path, monkeypatch):
+    from app.vectorstore import local_store
+
+    monkeypatch.setattr(local_store.settings, "LOCAL_IVF_MIN_TRAIN", 500)
+    monkeypatch.setattr(local_store.settings, "LOCAL_IVF_NLIST", 16)
+    monkeypatch.setattr(local_store.settings, "LOCAL_COMPACT_MIN_ENTRIES", 100)
+
+    rng = np.random.default_rng(4)
+    vecs = rng.normal(size=(1500, 8)).astype(np.float32)
+    index = LocalVectorIndex(tmp_path / "ivf", dim=8, ann="ivf")
+    index.upsert((f"c{i}", vecs[i], _meta("hf", "acta")) for i in range(1500))
+    index.wait_for_ann()
+
+    index.delete([f"c{i}" for i in range(1000)])
+    assert index.generation == 1 and index.size == 500
+
+    exact = LocalVectorIndex(tmp_path / "exact", dim=8)
+    exact.upsert((f"c{i}", vecs[i], _meta("hf", "acta")) for i in range(1000, 1500))
+    for reopened in (index, LocalVectorIndex(tmp_path / "ivf", ann="ivf")):
+        for q in vecs[1000:1020]:
+            ref = exact.query(q, top_k=5)["matches"]
+            got = reopened.query(q, top_k=5, nprobe=16)["matches"]
+            assert [m["id"] for m in got] == [m["id"] for m in ref]
+    assert not (tmp_path / "ivf" / "ivf_assign.i32").exists()
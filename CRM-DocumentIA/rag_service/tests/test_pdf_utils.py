@@ -0,0 +1,120 @@
+# tests/test_pdf_utils.py
+
+from pathlib import Path
+
+import pymupdf as fitz
+import pytest
+
+from app.rag.ingestion import iter_document
+from app.utils.pdf_utils import _text_blocks, analyze_pdf_images, process_pdf
+from app.utils.text_extract import clean_text
+
+
+REAL_PDF = Path(__file__).resolve().parents[1] / "storages" / "analyze" / "INCYTU_18-012.pdf"
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    path = tmp_path / "contrato.pdf"
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 20), False)
+    pix.clear_with(200)
+
+    doc = fitz.open()
+    for n in range(3):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"CONTRATO página {n + 1}\nCláusula primera: objeto.")
+        page.insert_image(fitz.Rect(72, 120, 232, 200), pixmap=pix)
+        page.insert_text((72, 215), f"Figura {n + 1}: firma del contratante")
+        page.insert_link({"kind": fitz.LINK_URI, "from": fitz.Rect(240, 120, 300, 140),
+                          "uri": "https://example.com"})
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _legacy_pages(path) -> list[str]:
+    """Extracción previa: get_text("text") y get_text("blocks") por separado."""
+    doc = fitz.open(path)
+    out = []
+    for page in doc:
+        text1 = page.get_text("text")
+        text2 = "\n".join(b[4] for b in page.get_text("blocks") if len(b) > 4)
+        out.append(text1 if len(text1) > len(text2) else text2)
+    doc.close()
+    return out
+
+
+def _legacy_text(path) -> str:
+    return "\n".join(_legacy_pages(path))
+
+
+def test_process_pdf_matches_separate_extraction(sample_pdf):
+    result = process_pdf(str(sample_pdf))
+
+    assert result["pages"] == 3
+    assert result["text"] == _legacy_text(sample_pdf)
+    assert {b[0] for b in result["blocks"]} == {1, 2, 3}
+    assert [link["page"] for link in result["links"]] == [1, 2, 3]
+
+
+def test_images_have_dimensions_captions_and_links(sample_pdf):
+    count, images = analyze_pdf_images(str(sample_pdf))
+
+    assert count == 3
+    first = images[0]
+    assert (first["width"], first["height"]) == (40, 20)
+    assert first["page"] == 1
+    assert "Figura 1" in first["caption"]
+    assert first["links"][0]["uri"] == "https://example.com"
+
+
+def test_iter_document_walks_pdf_once(sample_pdf, monkeypatch):
+    opened = []
+    real_open = fitz.open
+    monkeypatch.setattr(fitz, "open", lambda *a, **k: opened.append(a) or real_open(*a, **k))
+
+    segments = list(iter_document(str(sample_pdf)))
+
+    assert len(opened) == 1
+    assert len(segments) == 3        # una página por segmento
+    assert [len(images) for _, images in segments] == [1, 1, 1]
+    assert [text for text, _ in segments] == [clean_text(p) for p in _legacy_pages(sample_pdf)]
+
+
+def test_sharded_extraction_matches_serial(sample_pdf, monkeypatch):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from app.utils import pdf_utils
+
+    serial = process_pdf(str(sample_pdf))
+
+    monkeypatch.setattr(pdf_utils.settings, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(pdf_utils.settings, "PDF_PAGES_PER_TASK", 1)
+    monkeypatch.setattr(pdf_utils.settings, "PDF_PARALLEL_WORKERS", 2)
+    assert pdf_utils._page_workers(3) == 2
+
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        sharded = process_pdf(str(sample_pdf), executor=pool)
+
+    assert sharded == serial
+
+
+def test_short_pdf_stays_serial(monkeypatch):
+    from app.utils import pdf_utils
+
+    monkeypatch.setattr(pdf_utils.settings, "PDF_PARALLEL_MIN_PAGES", 64)
+    assert pdf_utils._page_workers(10) == 1
+
+
+@pytest.mark.skipif(not REAL_PDF.exists(), reason="PDF de ejemplo no disponible")
+def test_text_blocks_match_get_text_blocks_on_real_pdf():
+    # Líneas que ya terminan en "\n" (guiones de corte) no llevan un salto extra
+    doc = fitz.open(REAL_PDF)
+    for page in doc:
+        expected = [b for b in page.get_text("blocks") if b[6] == 0]
+        got = _text_blocks(page.get_textpage(flags=fitz.TEXTFLAGS_TEXT))
+        assert [b[4] for b in got] == [b[4] for b in expected], f"página {page.number + 1}"
+        assert [b[:4] for b in got] == pytest.approx([b[:4] for b in expected])
+    doc.close()
+
+    assert len(process_pdf(REAL_PDF)["text"]) == len("\n".join(_legacy_pages(REAL_PDF)))
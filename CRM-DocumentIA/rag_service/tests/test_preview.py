@@ -0,0 +1,76 @@
+# tests/test_preview.py
+
+import docx
+import openpyxl
+import pymupdf as fitz
+import pytest
+
+from app.utils import text_extract
+from app.utils.text_extract import extract_preview, extract_text
+
+
+@pytest.fixture(autouse=True)
+def small_limits(monkeypatch):
+    monkeypatch.setattr(text_extract.settings, "PREVIEW_MAX_PAGES", 2)
+    monkeypatch.setattr(text_extract.settings, "PREVIEW_MAX_PARAGRAPHS", 5)
+    monkeypatch.setattr(text_extract.settings, "PREVIEW_MAX_ROWS", 5)
+    monkeypatch.setattr(text_extract.settings, "PREVIEW_MAX_BYTES", 4096)
+
+
+def test_pdf_reads_only_first_pages(tmp_path):
+    path = tmp_path / "factura.pdf"
+    doc = fitz.open()
+    for n in range(6):
+        doc.new_page().insert_text((72, 72), f"FACTURA página {n + 1}")
+    doc.save(path)
+    doc.close()
+
+    preview = extract_preview(str(path))
+    assert "página 1" in preview["text"] and "página 2" in preview["text"]
+    assert "página 3" not in preview["text"] and preview["truncated"]
+
+
+def test_docx_stops_after_max_paragraphs(tmp_path):
+    path = tmp_path / "contrato.docx"
+    d = docx.Document()
+    for n in range(20):
+        d.add_paragraph(f"Cláusula {n + 1}")
+    d.save(path)
+
+    preview = extract_preview(str(path))
+    assert preview["text"].splitlines() == [f"Cláusula {n + 1}" for n in range(5)]
+    assert preview["truncated"]
+    # Mismo texto que la extracción completa para el inicio del documento
+    assert extract_text(str(path)).startswith(preview["text"])
+
+
+def test_excel_reads_first_rows_across_sheets(tmp_path):
+    path = tmp_path / "reporte.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.title = "Resumen"
+    wb.active.append(["total", 10])
+    other = wb.create_sheet("Detalle")
+    for n in range(50):
+        other.append([f"fila {n}", n])
+    wb.save(path)
+
+    preview = extract_preview(str(path))
+    assert "HOJA: Resumen" in preview["text"] and "total | 10" in preview["text"]
+    assert "fila 3 | 3" in preview["text"] and "fila 4" not in preview["text"]
+    assert preview["truncated"]
+
+
+def test_eml_headers_and_first_text_part(tmp_path):
+    path = tmp_path / "pqr.eml"
+    path.write_bytes(
+        b"From: cliente@example.com\r\nTo: soporte@example.com\r\nSubject: Queja servicio\r\n"
+        b"MIME-Version: 1.0\r\nContent-Type: multipart/mixed; boundary=XX\r\n\r\n"
+        b"--XX\r\nContent-Type: text/plain; charset=utf-8\r\n\r\nSolicito respuesta a mi queja.\r\n"
+        b"--XX\r\nContent-Type: application/octet-stream\r\n"
+        b"Content-Disposition: attachment; filename=a.bin\r\n\r\n" + b"A" * 20_000 + b"\r\n--XX--\r\n"
+    )
+
+    preview = extract_preview(str(path))
+    assert "ASUNTO: Queja servicio" in preview["text"]
+    assert "Solicito respuesta a mi queja." in preview["text"]
+    assert "AAAA" not in preview["text"] and preview["truncated"]
@@ -0,0 +1,44 @@
+# tests/test_query_cache.py
+
+import time
+
+from app.rag import query_cache
+from app.rag.query_cache import TTLCache
+
+
+def test_ttl_expiry_and_lru():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)           # expulsa "b" (menos usado)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_invalidation_by_provider_and_doc_type():
+    query_cache.retrieval_results.clear()
+    hits = [{"id": "1", "score": 0.9, "metadata": {}}]
+
+    k_contrato = query_cache.retrieval_key("¿Vigencia?", "hf", "contrato", 15)
+    k_factura = query_cache.retrieval_key("¿Total?", "hf", "factura", 15)
+    k_any = query_cache.retrieval_key("¿Total?", "hf", None, 15)
+    k_openai = query_cache.retrieval_key("¿Vigencia?", "openai", "contrato", 15)
+    for k in (k_contrato, k_factura, k_any, k_openai):
+        query_cache.cache_hits(k, hits)
+
+    removed = query_cache.invalidate_retrieval(provider="hf", doc_type="contrato")
+
+    assert removed == 2
+    assert query_cache.get_cached_hits(k_contrato) is None
+    assert query_cache.get_cached_hits(k_any) is None
+    assert query_cache.get_cached_hits(k_factura) == hits
+    assert query_cache.get_cached_hits(k_openai) == hits
+
+
+def test_question_normalization():
+    assert query_cache.retrieval_key("  Total  FACTURA ", "hf", None, 5) == \
+        query_cache.retrieval_key("total factura", "hf", None, 5)
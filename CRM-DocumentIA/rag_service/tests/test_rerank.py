@@ -0,0 +1,67 @@
+# tests/test_rerank.py
+
+import asyncio
+
+import pytest
+
+from app.rag import rerank_service, retriever
+
+
+class FakeCrossEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, **kwargs):
+        self.calls.append([len(q) + len(t) for q, t in pairs])
+        return [float(len(t)) for _, t in pairs]
+
+
+@pytest.fixture
+def fake_ce(monkeypatch):
+    ce = FakeCrossEncoder()
+    monkeypatch.setattr(rerank_service.settings, "RERANK_BATCH_WAIT", 0.05)
+    monkeypatch.setattr(rerank_service, "_models", {rerank_service.settings.CROSS_ENCODER_MODEL: ce})
+    monkeypatch.setattr(rerank_service, "_service", None)
+    return ce
+
+
+def _hits(texts, prefix="c"):
+    return [{"id": f"{prefix}{i}", "score": 0.5, "metadata": {"text_excerpt": t}} for i, t in enumerate(texts)]
+
+
+def test_rerank_orders_by_score_and_sorts_pairs_by_length(fake_ce):
+    hits = _hits(["corto", "un texto bastante más largo", "mediano texto"])
+
+    ranked = retriever.rerank("¿pregunta?", hits, top_k=2)
+
+    assert [h["id"] for h in ranked] == ["c1", "c2"]
+    assert fake_ce.calls[0] == sorted(fake_ce.calls[0])   # length bucketing
+
+
+def test_scores_are_cached_per_query_and_chunk(fake_ce):
+    retriever.rerank("Hola mundo", _hits(["a", "bb"]), top_k=2)
+    retriever.rerank("hola   MUNDO", _hits(["a", "bb", "ccc"]), top_k=3)
+
+    # segunda consulta (misma pregunta normalizada): solo el chunk nuevo
+    assert [len(c) for c in fake_ce.calls] == [2, 1]
+
+
+def test_concurrent_queries_share_one_model_call(fake_ce):
+    async def run():
+        return await asyncio.gather(*[
+            retriever.rerank_async(f"pregunta {n}", _hits(["x" * n, "y"], prefix=f"q{n}-"), top_k=1)
+            for n in range(1, 9)
+        ])
+
+    results = asyncio.run(run())
+
+    assert [r[0]["id"] for r in results] == [f"q{n}-0" for n in range(1, 9)]
+    assert sum(len(c) for c in fake_ce.calls) == 16 and len(fake_ce.calls) < 8
+
+
+def test_missing_model_falls_back_to_vector_order(monkeypatch):
+    monkeypatch.setattr(rerank_service, "_models", {rerank_service.settings.CROSS_ENCODER_MODEL: None})
+    monkeypatch.setattr(rerank_service, "_service", None)
+
+    hits = _hits(["a", "b", "c"])
+    assert retriever.rerank("q", hits, top_k=2) == hits[:2]
@@ -0,0 +1,83 @@
+# tests/test_startup.py
+
+import importlib
+
+import pytest
+
+from app.core import startup
+from app.rag import rerank_service
+
+
+class FakeCrossEncoder:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, pairs, **kwargs):
+        self.calls += 1
+        return [0.0 for _ in pairs]
+
+
+@pytest.fixture
+def fresh_startup(monkeypatch, tmp_path):
+    mod = importlib.reload(startup)
+    monkeypatch.setattr(mod.settings, "EMB_PROVIDER", "hf")
+    monkeypatch.setattr(mod.settings, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(mod.settings, "LOCAL_VECTOR_DIR", tmp_path / "vectors")
+    monkeypatch.setattr(mod.settings, "HYBRID_SEARCH", False)
+    monkeypatch.setattr(mod, "_EXTRACTOR_MODULES", ())
+    monkeypatch.setattr(rerank_service, "_service", None)
+    yield mod
+    if mod._thread is not None:
+        mod._thread.join(timeout=5)
+
+
+def test_preload_warms_reranker_and_becomes_ready(fresh_startup, monkeypatch):
+    ce = FakeCrossEncoder()
+    monkeypatch.setattr(rerank_service, "_models", {rerank_service.settings.CROSS_ENCODER_MODEL: ce})
+
+    assert fresh_startup.readiness()["status"] == "starting"
+    fresh_startup.start_preload().join(timeout=5)
+
+    state = fresh_startup.readiness()
+    assert state["ready"] and state["errors"] == {}
+    assert ce.calls == 1                                   # warm-up
+    assert {"rerank_load", "rerank_warmup", "preload_total"} <= set(state["timings"])
+
+
+def test_required_step_failure_keeps_service_not_ready(fresh_startup, monkeypatch):
+    monkeypatch.setattr(rerank_service, "_models", {rerank_service.settings.CROSS_ENCODER_MODEL: None})
+    monkeypatch.setattr(fresh_startup.settings, "EMB_PROVIDER", "sentence_transformers")
+    from app.rag import embeddings
+    monkeypatch.setattr(embeddings, "_load_local_model", lambda: None)
+
+    fresh_startup.start_preload().join(timeout=5)
+
+    state = fresh_startup.readiness()
+    assert state["status"] == "failed" and not state["ready"]
+    assert "embeddings" in state["errors"]
+    assert "rerank_warmup" not in state["timings"]         # sin modelo no hay warm-up
+
+
+def test_without_preload_service_is_ready_immediately(fresh_startup, monkeypatch):
+    monkeypatch.setattr(fresh_startup.settings, "STARTUP_PRELOAD", False)
+
+    assert fresh_startup.start_preload() is None
+    assert fresh_startup.readiness()["ready"]
+
+
+def test_backend_fallback_is_reported_in_readiness(fresh_startup, monkeypatch):
+    from app.rag import local_models
+
+    monkeypatch.setattr(local_models, "_resolved", {})
+
+    def load(backend):
+        if backend == "onnx":
+            raise ImportError("optimum no instalado")
+        return object()
+
+    local_models._load_with_fallback("modelo-x", "onnx", load)
+
+    assert local_models.resolved_backend("modelo-x") == "torch"
+    report = fresh_startup.readiness()["inference_backends"]["modelo-x"]
+    assert report["requested"] == "onnx" and report["fallback"]
+    assert "optimum" in report["error"]
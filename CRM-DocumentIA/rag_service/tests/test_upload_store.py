@@ -0,0 +1,51 @@
+# tests/test_upload_store.py
+
+import asyncio
+import hashlib
+import io
+
+from app.rag import doc_registry, ingest_jobs
+from app.rag.ingest_jobs import JobStore
+from app.rag.upload_store import UploadStore
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = UploadStore(tmp_path / "uploads", chunk_size=4096)
+    data = b"factura 001\n" * 10_000
+
+    first = store.save(io.BytesIO(data), "Factura.PDF")
+    second = store.save(io.BytesIO(data), "copia de factura.pdf")
+    other = store.save(io.BytesIO(b"otro"), "Factura.PDF")
+
+    assert first["sha256"] == hashlib.sha256(data).hexdigest() and first["size"] == len(data)
+    assert not first["duplicate"] and second["duplicate"]
+    assert first["path"] == second["path"] and first["path"].suffix == ".pdf"
+    assert first["path"].read_bytes() == data
+    assert other["path"] != first["path"]
+    assert list((tmp_path / "uploads" / "tmp").iterdir()) == []   # sin temporales huérfanos
+
+
+def test_cached_ingest_requires_current_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_jobs, "_store", JobStore(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(ingest_jobs.settings, "DOC_REGISTRY_DB", tmp_path / "documents.sqlite3")
+    monkeypatch.setattr(doc_registry, "_registry", None)
+    monkeypatch.setattr(
+        ingest_jobs, "ingest_file_to_pinecone",
+        lambda *a, **k: {"status": "ok", "document_id": "doc-1", "filename": k["filename"]}
+    )
+    registry = doc_registry.get_document_registry()
+
+    doc = tmp_path / "abc.txt"
+    doc.write_text("hola")
+    job_id = ingest_jobs.submit_ingest_job(str(doc), "a.txt", "hf", "upload", file_hash="h1")
+    job = asyncio.run(ingest_jobs.wait_for_job(job_id))
+    assert job["result"]["filename"] == "a.txt"   # nombre lógico, no el del store
+
+    registry.save("doc-1", "a.txt", "hf", "h1", "documento", 3, "p", "r", ["c1"])
+    assert ingest_jobs.find_cached_ingest("h1", "hf", "upload")["job_id"] == job_id
+    assert ingest_jobs.find_cached_ingest("h1", "openai", "upload") is None
+    assert ingest_jobs.find_cached_ingest("h1", "hf", "upload", include_text=True) is None
+
+    # Otro archivo con el mismo nombre reemplazó al documento: el resultado ya no vale
+    registry.save("doc-1", "a.txt", "hf", "h2", "documento", 3, "p", "r", ["c2"])
+    assert ingest_jobs.find_cached_ingest("h1", "hf", "upload") is None